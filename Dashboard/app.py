@@ -15,8 +15,23 @@ import os
 # Add src directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src/core'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src/engines'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src/utils'))
 
 from data_processor import DataProcessor
+from loyalty_engine import LoyaltyPointsEngine
+from customer_profile_index import CustomerProfileIndex, csv_source
+from promo_effectiveness_engine import PromoEffectivenessEngine
+from recommendation_engine import ProductRecommendationEngine
+from market_basket_engine import MarketBasketEngine
+from churn_engine import ChurnRiskEngine
+from lifetime_value_engine import CustomerLifetimeValueEngine
+from cohort_engine import CohortRetentionEngine, month_labels
+from promotion_calendar import load_special_day_names
+from engine_registry import EngineRegistry
+from table_view import paginated_table
+from chart_utils import render_chart
+from atomic_io import atomic_write_csv, locked_append_csv
+import instrumentation
 
 # Page configuration
 st.set_page_config(
@@ -44,19 +59,178 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state and load data
-@st.cache_resource
+# Engine factories (no Streamlit calls and no file writes or changes to other
+# engines: they may run on the warm-up thread; pages save results explicitly)
 def load_data():
+    # Full frames, not load_streaming(): the trend, store/category, ingest and
+    # history pages and the other engines' loaders read the raw sales rows;
+    # the aggregate-only consumer (the API's LoyaltyStore) streams instead
     processor = DataProcessor(data_path='data/input')
     processor.load_all_data()
     return processor
 
-try:
-    processor = load_data()
-    data_loaded = True
-except Exception as e:
-    st.error(f"Error loading data: {e}")
-    data_loaded = False
+def load_promo_effectiveness():
+    # Segments come from the current RFM table, loyalty balances and churn
+    # scores, not saved outputs; without the churn model the least active
+    # customers fall back to the RFM at-risk list, as in the Admin Panel
+    processor = engines.get('processor')
+    try:
+        risk = engines.get('churn').risk_df
+    except Exception:
+        risk = processor.get_at_risk_customers()
+    rfm = processor.get_rfm_analysis(copy=False)
+    segments = PromoEffectivenessEngine.customer_segments(
+        rfm_df=rfm,
+        balances_df=engines.get('loyalty').customer_balances_df,
+        risk_df=risk
+    )
+    engine = PromoEffectivenessEngine(data_path='data/input', output_path='data/output')
+    if engine.load_data(customer_segments_df=segments):
+        engine.calculate_effectiveness()
+    else:
+        engine.effectiveness_df = pd.read_csv('data/output/promo_effectiveness_after_bonus.csv')
+    return engine
+
+def load_loyalty():
+    engine = LoyaltyPointsEngine(data_path='data/input')
+    if not engine.load_loyalty_data():
+        raise RuntimeError("Unable to load loyalty data")
+    engine.calculate_customer_balances()
+    return engine
+
+def load_recommender():
+    engine = ProductRecommendationEngine(data_path='data/input', output_path='data/output')
+    engine.load_data(engines.get('processor').get_interaction_matrix())
+    if not engine.load_or_fit():
+        raise RuntimeError("Unable to load sales data for recommendations")
+    return engine
+
+def load_market_basket():
+    engine = MarketBasketEngine(data_path='data/input', output_path='data/output')
+    if not engine.count_pairs():
+        raise RuntimeError("Unable to load line items for basket analysis")
+    return engine
+
+def load_churn():
+    processor = engines.get('processor')
+    engine = ChurnRiskEngine(data_path='data/input', output_path='data/output')
+    engine.load_data(processor.sales_header_df, processor.products_df,
+                     processor.get_interaction_matrix(), engines.get('loyalty'))
+    if not engine.load_or_fit():
+        raise RuntimeError("Unable to load sales data for churn scoring")
+    engine.score()
+    engine.risk_customers(processor.get_rfm_analysis())
+    return engine
+
+def load_customer_value():
+    processor = engines.get('processor')
+    engine = CustomerLifetimeValueEngine(data_path='data/input', output_path='data/output')
+    if not engine.load_data(processor.get_rfm_analysis(), processor.customers_df):
+        raise RuntimeError("No customer purchases to fit lifetime value on")
+    engine.fit()
+    engine.predict()
+    return engine
+
+def load_cohorts():
+    processor = engines.get('processor')
+    engine = CohortRetentionEngine(data_path='data/input', output_path='data/output')
+    engine.load_data(processor.customers_df)
+    if not engine.load_or_build(processor.sales_header_df):
+        raise RuntimeError("Unable to load customers for cohort analysis")
+    return engine
+
+def load_customer_profiles():
+    # Sources resolve the engines lazily, so the index itself is cheap to build
+    index = CustomerProfileIndex()
+    index.register('rfm', lambda: engines.get('processor').get_rfm_analysis(copy=False), key_col='Customer_ID')
+    index.register('balances', lambda: engines.get('loyalty').customer_balances_df)
+    index.register('recommendations', csv_source('data/output/customer_recommendations_dynamic.csv'))
+    index.register('offers', csv_source('data/output/personalized_recommendations_with_discounts.csv'), key_col='Customer_ID')
+    return index
+
+# Shared across sessions; each engine is built lazily on first use
+@st.cache_resource
+def get_engine_registry():
+    registry = EngineRegistry()
+    registry.register('processor', load_data)
+    registry.register('promo_effectiveness', load_promo_effectiveness)
+    registry.register('loyalty', load_loyalty)
+    registry.register('customer_profiles', load_customer_profiles)
+    registry.register('recommender', load_recommender)
+    registry.register('market_basket', load_market_basket)
+    registry.register('churn', load_churn)
+    registry.register('customer_value', load_customer_value)
+    registry.register('cohorts', load_cohorts)
+    return registry
+
+engines = get_engine_registry()
+
+def get_customer_value():
+    """Lifetime value engine, with its predictions attached to the RFM table"""
+    engine = engines.get('customer_value')
+    processor = engines.get('processor')
+    if processor.customer_value_df is not engine.clv_df:
+        processor.set_customer_value(engine.clv_df)
+    return engine
+
+# Engines built from the sales tickets that have no incremental update;
+# they are rebuilt on next use after an ingest
+SALES_DERIVED_ENGINES = ['recommender', 'market_basket', 'churn', 'customer_value', 'promo_effectiveness']
+
+def ingest_sales(new_header_df, new_line_items_df, data_path='data/input'):
+    """
+    Append uploaded tickets to the sales files and record them in the loaded
+    engines incrementally; tickets already on file are skipped
+    New Ticket_IDs must be above every ticket on file, so the files stay in
+    Ticket_ID order for streaming ingestion
+    Returns the number of new tickets
+    """
+    processor = engines.get('processor')
+    new_header_df = new_header_df[~new_header_df['Ticket_ID'].isin(processor.sales_header_df['Ticket_ID'])]
+    new_line_items_df = new_line_items_df[new_line_items_df['Ticket_ID'].isin(new_header_df['Ticket_ID'])]
+    if new_header_df.empty:
+        return 0
+    
+    last_ticket = processor.sales_header_df['Ticket_ID'].max()
+    out_of_order = new_header_df['Ticket_ID'] <= last_ticket
+    if out_of_order.any():
+        raise ValueError(
+            f"{int(out_of_order.sum())} uploaded tickets have a Ticket_ID at or below the last ticket on file "
+            f"({last_ticket}); new tickets must be numbered above it"
+        )
+    new_header_df = new_header_df.sort_values('Ticket_ID', kind='stable')
+    new_line_items_df = new_line_items_df.sort_values('Ticket_ID', kind='stable')
+    
+    files = [(new_header_df, 'sales_header.csv'), (new_line_items_df, 'sales_line_items.csv')]
+    for df, filename in files:
+        missing = set(pd.read_csv(os.path.join(data_path, filename), nrows=0).columns) - set(df.columns)
+        if missing:
+            raise ValueError(f"Upload for {filename} is missing columns: {', '.join(sorted(missing))}")
+    for df, filename in files:
+        path = os.path.join(data_path, filename)
+        locked_append_csv(df[pd.read_csv(path, nrows=0).columns], path)
+    
+    processor.record_sales(new_header_df, new_line_items_df)
+    if engines.is_ready('loyalty'):
+        engines.get('loyalty').record_sales(new_header_df, new_line_items_df)
+    if engines.is_ready('cohorts'):
+        engines.get('cohorts').refresh(processor.sales_header_df)
+    for name in SALES_DERIVED_ENGINES:
+        engines.clear(name)
+    return len(new_header_df)
+
+# Pages that need the core data processor
+PROCESSOR_PAGES = [
+    "Dashboard Overview",
+    "RFM Analysis",
+    "Customer Segmentation",
+    "Customer 360",
+    "Cohort Retention",
+    "Sales Analytics",
+    "Product Performance",
+    "Admin Panel",
+    "Data Summary"
+]
 
 # Sidebar navigation
 st.sidebar.markdown("# 📊 Navigation")
@@ -66,6 +240,9 @@ page = st.sidebar.radio(
         "Dashboard Overview",
         "RFM Analysis",
         "Customer Segmentation",
+        "Customer 360",
+        "Loyalty Points",
+        "Cohort Retention",
         "Sales Analytics",
         "Product Performance",
         "Promotional Effectiveness",
@@ -74,6 +251,22 @@ page = st.sidebar.radio(
     ]
 )
 
+# Hidden diagnostics page, opened with ?page=performance
+if st.query_params.get('page') == 'performance':
+    page = "Performance"
+
+# Engine warm-up status (filled in after the page renders)
+warmup_status = st.sidebar.empty()
+
+# Only build the engines this page needs
+data_loaded = True
+if page in PROCESSOR_PAGES:
+    try:
+        processor = engines.get('processor')
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        data_loaded = False
+
 # Title
 st.markdown("<div class='header-title'>🏪 Retail Loyalty Analytics Platform</div>", unsafe_allow_html=True)
 st.markdown("---")
@@ -124,7 +317,7 @@ if page == "Dashboard Overview":
         height=400,
         hovermode='x unified'
     )
-    st.plotly_chart(fig_trend, use_container_width=True)
+    render_chart(fig_trend)
     
     st.markdown("---")
     
@@ -141,7 +334,7 @@ if page == "Dashboard Overview":
             title="Store-wise Sales",
             labels={'Sales': 'Total Sales ($)'}
         )
-        st.plotly_chart(fig_store, use_container_width=True)
+        render_chart(fig_store)
     
     with col2:
         st.subheader("📦 Sales by Category")
@@ -153,7 +346,7 @@ if page == "Dashboard Overview":
                 names='Category',
                 title="Category Distribution"
             )
-            st.plotly_chart(fig_cat, use_container_width=True)
+            render_chart(fig_cat)
         else:
             st.info("No category data available")
     
@@ -184,7 +377,7 @@ elif page == "RFM Analysis":
             labels={'Recency': 'Days Since Last Purchase', 'Frequency': 'Purchase Count'},
             height=500
         )
-        st.plotly_chart(fig_rfm, use_container_width=True)
+        render_chart(fig_rfm)
         
         st.markdown("---")
         
@@ -200,7 +393,7 @@ elif page == "RFM Analysis":
                 names='Segment',
                 title="Customer Segments"
             )
-            st.plotly_chart(fig_seg, use_container_width=True)
+            render_chart(fig_seg)
         
         with col2:
             st.dataframe(segment_dist, use_container_width=True)
@@ -223,6 +416,12 @@ elif page == "RFM Analysis":
 elif page == "Customer Segmentation":
     st.subheader("👥 Customer Segmentation Analysis")
     
+    try:
+        clv_engine = get_customer_value()
+    except Exception as e:
+        st.warning(f"Lifetime value model unavailable: {e}")
+        clv_engine = None
+    
     rfm_data = processor.get_rfm_analysis()
     
     if rfm_data is not None and len(rfm_data) > 0:
@@ -255,6 +454,36 @@ elif page == "Customer Segmentation":
             
             st.markdown("---")
         
+        # Predicted lifetime value
+        if clv_engine is not None and clv_engine.clv_df is not None:
+            st.subheader(f"💎 Predicted Customer Lifetime Value (next {clv_engine.horizon_months} months)")
+            clv_df = clv_engine.clv_df
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Predicted CLV", f"${clv_df['Predicted_CLV'].sum():,.0f}")
+            with col2:
+                st.metric("Avg Predicted CLV", f"${clv_df['Predicted_CLV'].mean():,.2f}")
+            with col3:
+                st.metric("Avg P(Active)", f"{clv_df['P_Alive'].mean():.0%}")
+            
+            clv_by_segment = rfm_data.groupby('RFM_Segment')['Predicted_CLV'].agg(['mean', 'sum']).reset_index()
+            clv_by_segment.columns = ['Segment', 'Avg_CLV', 'Total_CLV']
+            fig_clv = px.bar(
+                clv_by_segment.sort_values('Total_CLV', ascending=False),
+                x='Segment',
+                y='Total_CLV',
+                title="Predicted CLV by Segment",
+                labels={'Total_CLV': 'Predicted CLV ($)'}
+            )
+            render_chart(fig_clv)
+            paginated_table(clv_df, key='clv_table')
+            
+            if st.button("💾 Save Lifetime Values", key="save_clv"):
+                st.success(f"✅ Saved {len(clv_df)} predictions to {clv_engine.update_clv_csv()}")
+            
+            st.markdown("---")
+        
         # At-risk customers
         st.subheader("⚠️ At-Risk Customers")
         at_risk = processor.get_at_risk_customers()
@@ -281,7 +510,8 @@ elif page == "Sales Analytics":
         labels={'Sales': 'Total Sales ($)', 'Date': 'Date'},
         height=400
     )
-    st.plotly_chart(fig_trend, use_container_width=True)
+    # Keep each bucket's peak and trough so sale-day spikes survive downsampling
+    render_chart(fig_trend, method='minmax')
     
     st.markdown("---")
     st.subheader("Store Performance")
@@ -296,7 +526,7 @@ elif page == "Sales Analytics":
             title="Sales by Store",
             labels={'Sales': 'Total Sales ($)'}
         )
-        st.plotly_chart(fig_store, use_container_width=True)
+        render_chart(fig_store)
     
     with col2:
         fig_trans = px.bar(
@@ -306,7 +536,7 @@ elif page == "Sales Analytics":
             title="Transactions by Store",
             labels={'Transactions': 'Count'}
         )
-        st.plotly_chart(fig_trans, use_container_width=True)
+        render_chart(fig_trans)
     
     st.markdown("---")
     st.subheader("Category Analysis")
@@ -319,7 +549,7 @@ elif page == "Sales Analytics":
             title="Sales by Category",
             labels={'Sales': 'Total Sales ($)'}
         )
-        st.plotly_chart(fig_cat, use_container_width=True)
+        render_chart(fig_cat)
 
 # PAGE 5: PROMOTIONAL EFFECTIVENESS
 elif page == "Promotional Effectiveness":
@@ -328,7 +558,8 @@ elif page == "Promotional Effectiveness":
     
     # Load promo effectiveness data
     try:
-        promo_df = pd.read_csv('data/output/promo_effectiveness_after_bonus.csv')
+        promo_engine = engines.get('promo_effectiveness')
+        promo_df = promo_engine.effectiveness_df
         
         # Key Metrics
         st.markdown("### 📈 Overall Performance Metrics")
@@ -466,7 +697,7 @@ elif page == "Promotional Effectiveness":
             color='Sales_Uplift_Percent',
             color_continuous_scale='Greens'
         )
-        st.plotly_chart(fig_uplift, use_container_width=True)
+        render_chart(fig_uplift)
         
         st.markdown("---")
         
@@ -491,7 +722,7 @@ elif page == "Promotional Effectiveness":
                 color='Sales_Uplift_Percent',
                 color_continuous_scale='Blues'
             )
-            st.plotly_chart(fig_store_sales, use_container_width=True)
+            render_chart(fig_store_sales)
         
         with col2:
             fig_store_roi = px.bar(
@@ -503,7 +734,7 @@ elif page == "Promotional Effectiveness":
                 color='ROI_Percent',
                 color_continuous_scale='Purples'
             )
-            st.plotly_chart(fig_store_roi, use_container_width=True)
+            render_chart(fig_store_roi)
         
         st.markdown("---")
         
@@ -560,7 +791,7 @@ elif page == "Promotional Effectiveness":
             title='Effectiveness Score vs Sales Uplift',
             labels={'Sales_Uplift_Percent': 'Sales Uplift %', 'Effectiveness_Score': 'Effectiveness Score'}
         )
-        st.plotly_chart(fig_effectiveness, use_container_width=True)
+        render_chart(fig_effectiveness)
         
         st.markdown("---")
         
@@ -571,12 +802,17 @@ elif page == "Promotional Effectiveness":
                        'Bonus_Points_Offered', 'Sales_Uplift_Percent', 'Transaction_Uplift_Percent',
                        'Effectiveness_Score', 'ROI_Percent', 'Status']
         
-        st.dataframe(
-            promo_df[display_cols].sort_values('ROI_Percent', ascending=False),
-            use_container_width=True,
+        paginated_table(
+            promo_df[display_cols],
+            key='promo_details',
+            sort_by='ROI_Percent',
+            ascending=False,
             height=400
         )
         
+        if st.button("💾 Save Effectiveness Results", key="save_promo_effectiveness"):
+            st.success(f"✅ Saved {len(promo_df)} promotions to {promo_engine.update_effectiveness_csv()}")
+        
         st.markdown("---")
         
         # Top Performing Promos
@@ -595,8 +831,8 @@ elif page == "Admin Panel":
     st.subheader("⚙️ Admin Control Panel")
     st.markdown("Manage promotions, discounts, loyalty points, and special offers")
     
-    admin_tab1, admin_tab2, admin_tab3, admin_tab4 = st.tabs(
-        ["Least Sold Products", "Least Active Customers", "Special Day Promotions", "Promotional Rates"]
+    admin_tab1, admin_tab2, admin_tab3, admin_tab4, admin_tab5 = st.tabs(
+        ["Least Sold Products", "Least Active Customers", "Special Day Promotions", "Promotional Rates", "Ingest Sales"]
     )
     
     # TAB 1: LEAST SOLD PRODUCTS
@@ -636,7 +872,7 @@ elif page == "Admin Panel":
             ])
             
             if not bonus_df.empty:
-                bonus_df.to_csv('data/output/product_bonus_points.csv', index=False)
+                atomic_write_csv(bonus_df, 'data/output/product_bonus_points.csv', snapshot_versions=10)
                 st.success(f"✅ Saved {len(bonus_df)} products with bonus points!")
                 st.dataframe(bonus_df)
     
@@ -645,15 +881,25 @@ elif page == "Admin Panel":
         st.subheader("👥 Least Active Customers - Add Loyalty Points")
         st.markdown("Re-engage inactive customers by adding loyalty points")
         
-        at_risk = processor.get_at_risk_customers()
-        if not at_risk.empty:
+        try:
+            churn = engines.get('churn')
+            at_risk = churn.risk_df
+            at_risk_sorted = at_risk.head(15)
+            list_title = "**15 Customers Most Likely to Churn:**"
+        except Exception as e:
+            # Without a churn model fall back to the RFM at-risk segments
+            st.warning(f"Churn model unavailable ({e}); showing RFM at-risk customers")
+            churn = None
+            at_risk = processor.get_at_risk_customers()
             at_risk_sorted = at_risk.sort_values('Monetary', ascending=True).head(15)
-            
-            st.write("**15 Least Active/Valuable Customers:**")
+            list_title = "**15 Least Active/Valuable Customers:**"
+        
+        if not at_risk.empty:
+            st.write(list_title)
             
             loyalty_points_dict = {}
             for idx, (i, row) in enumerate(at_risk_sorted.iterrows()):
-                col1, col2, col3, col4 = st.columns(4)
+                col1, col2, col3, col4, col5 = st.columns(5)
                 
                 with col1:
                     st.write(f"**ID: {row['Customer_ID']}**")
@@ -662,6 +908,11 @@ elif page == "Admin Panel":
                 with col3:
                     st.write(f"Last Visit: {row['Recency']} days ago")
                 with col4:
+                    if 'Churn_Probability' in row:
+                        st.write(f"Churn Risk: {row['Churn_Probability']:.0%}")
+                    else:
+                        st.write(f"Segment: {row['RFM_Segment']}")
+                with col5:
                     loyalty_pts = st.number_input(
                         f"Add Points for {row['Customer_ID']}",
                         min_value=0,
@@ -678,31 +929,27 @@ elif page == "Admin Panel":
                 ])
                 
                 if not loyalty_df.empty:
-                    loyalty_df.to_csv('data/output/customer_bonus_loyalty_points.csv', index=False)
+                    atomic_write_csv(loyalty_df, 'data/output/customer_bonus_loyalty_points.csv', snapshot_versions=10)
                     st.success(f"✅ Saved loyalty points for {len(loyalty_df)} customers!")
                     st.dataframe(loyalty_df)
+        
+        if not at_risk.empty and st.button("📥 Export Points Histories of Listed Customers", key="export_timelines"):
+            try:
+                csv_path = engines.get('loyalty').export_customer_timelines(at_risk_sorted['Customer_ID'].to_numpy())
+            except Exception as e:
+                st.error(f"Error exporting points histories: {e}")
+            else:
+                st.success(f"✅ Exported the points histories of {len(at_risk_sorted)} customers to {csv_path}")
+        
+        if churn is not None and st.button("💾 Save Churn Risk Scores", key="save_churn"):
+            st.success(f"✅ Saved {len(churn.risk_df)} at-risk customers to {churn.update_risk_csv()}")
     
     # TAB 3: SPECIAL DAY PROMOTIONS
     with admin_tab3:
         st.subheader("🎉 Special Day Promotions - Apply Category Discounts")
         st.markdown("Create special promotions for specific days and categories")
         
-        special_days = [
-            "New Year (Jan 1)",
-            "Valentine's Day (Feb 14)",
-            "St. Patrick's Day (Mar 17)",
-            "Easter",
-            "Mother's Day",
-            "Father's Day",
-            "Independence Day (Jul 4)",
-            "Back to School (Aug-Sep)",
-            "Halloween (Oct 31)",
-            "Black Friday (Nov)",
-            "Cyber Monday (Nov)",
-            "Christmas (Dec 25)",
-            "Boxing Day (Dec 26)",
-            "New Year's Eve (Dec 31)"
-        ]
+        special_days = load_special_day_names()
         
         col1, col2 = st.columns(2)
         
@@ -714,24 +961,41 @@ elif page == "Admin Panel":
         with col2:
             selected_category = st.selectbox("📦 Select Category", categories if categories else ["General"])
         
-        discount_rate = st.slider(
-            "💰 Discount Rate (%)",
-            min_value=0,
-            max_value=100,
-            value=15,
-            step=1
-        )
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            discount_rate = st.slider(
+                "💰 Discount Rate (%)",
+                min_value=0,
+                max_value=100,
+                value=15,
+                step=1
+            )
+        
+        with col2:
+            bonus_multiplier = st.number_input(
+                "⭐ Bonus Points Multiplier",
+                min_value=1.0,
+                max_value=5.0,
+                value=1.0,
+                step=0.5,
+                help="Points earned on the category during the special day are multiplied by this"
+            )
         
         if st.button("🎊 Apply Special Day Promotion", key="apply_special"):
             promo_df = pd.DataFrame([{
                 'Special_Day': selected_day,
                 'Category': selected_category,
                 'Discount_Rate': discount_rate,
-                'Applied_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'Applied_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'Bonus_Points_Multiplier': bonus_multiplier
             }])
             
-            promo_df.to_csv('data/output/special_day_promotions.csv', mode='a', header=False, index=False)
-            st.success(f"✅ Applied {discount_rate}% discount to {selected_category} for {selected_day}!")
+            locked_append_csv(promo_df, 'data/output/special_day_promotions.csv', header=False)
+            # The loyalty engine reloads the calendar with the new promotion on next use
+            if engines.is_ready('loyalty'):
+                engines.get('loyalty').promotion_calendar = None
+            st.success(f"✅ Applied {discount_rate}% discount and {bonus_multiplier:g}x points to {selected_category} for {selected_day}!")
             st.dataframe(promo_df)
     
     # TAB 4: PROMOTIONAL RATES
@@ -788,84 +1052,223 @@ elif page == "Admin Panel":
                 'Configured_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }])
             
-            rates_df.to_csv('data/output/promotional_rates_config.csv', index=False)
+            atomic_write_csv(rates_df, 'data/output/promotional_rates_config.csv', snapshot_versions=10)
             st.success("✅ Promotional rates saved successfully!")
             st.dataframe(rates_df)
+        
+        st.markdown("---")
+        st.subheader("🧪 What-If: Points Liability Under Proposed Rates")
+        st.caption("Replays every purchase under the proposed rates and compares outstanding points and tiers with the current rules")
+        
+        try:
+            loyalty = engines.get('loyalty')
+        except Exception as e:
+            st.error(f"Error loading loyalty data: {e}")
+            loyalty = None
+        
+        if loyalty is not None:
+            rules = loyalty.loyalty_rules_df
+            rule_categories = [c for c in rules['Trigger_Category'].unique() if c != 'All']
+            category_multipliers = {}
+            for col, category in zip(st.columns(max(len(rule_categories), 1)), rule_categories):
+                with col:
+                    current = float(rules.loc[rules['Trigger_Category'] == category, 'Multiplier'].iloc[0])
+                    category_multipliers[category] = st.number_input(
+                        f"{category} Points Multiplier",
+                        min_value=0.0,
+                        max_value=10.0,
+                        value=current,
+                        step=0.1,
+                        key=f"scenario_{category}"
+                    )
+            
+            if st.button("▶️ Run Scenarios", key="run_scenarios"):
+                # Base rate scales all earning (current rules earn 1 point per $1)
+                results = loyalty.simulate_rule_scenarios([
+                    {'name': 'Proposed Base Rate', 'promo_multiplier': base_points_per_dollar},
+                    {'name': 'Proposed Category Rates', 'category_multipliers': category_multipliers},
+                    {
+                        'name': 'All Proposed',
+                        'promo_multiplier': base_points_per_dollar,
+                        'category_multipliers': category_multipliers
+                    },
+                ])
+                st.dataframe(results['summary'], use_container_width=True)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_tiers = px.bar(
+                        results['tier_distribution'],
+                        x='Loyalty_Tier',
+                        y='Customers',
+                        color='Scenario',
+                        barmode='group',
+                        title='Customers per Tier by Scenario'
+                    )
+                    render_chart(fig_tiers)
+                with col2:
+                    category_costs = results['category_costs']
+                    fig_costs = px.bar(
+                        category_costs[category_costs['Scenario'] != 'Baseline'],
+                        x='Category',
+                        y='Points_Delta',
+                        color='Scenario',
+                        barmode='group',
+                        title='Points Change vs Current Rules by Category'
+                    )
+                    render_chart(fig_costs)
+    
+    # TAB 5: INGEST SALES
+    with admin_tab5:
+        st.subheader("🧾 Ingest New Sales")
+        st.markdown("Upload new tickets with the same columns as sales_header.csv and sales_line_items.csv")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            header_file = st.file_uploader("Sales Header CSV", type='csv', key='ingest_header')
+        with col2:
+            line_items_file = st.file_uploader("Sales Line Items CSV", type='csv', key='ingest_line_items')
+        
+        if st.button("📥 Ingest Sales", key="ingest_sales", disabled=header_file is None or line_items_file is None):
+            try:
+                new_tickets = ingest_sales(pd.read_csv(header_file), pd.read_csv(line_items_file))
+            except Exception as e:
+                st.error(f"Error ingesting sales: {e}")
+            else:
+                if new_tickets:
+                    st.success(f"✅ Recorded {new_tickets} new tickets")
+                else:
+                    st.info("No new tickets - every uploaded Ticket_ID is already on file")
     
     st.markdown("---")
     
     # GENERATE RECOMMENDATIONS WITH DISCOUNTS
     st.subheader("🎯 Generate User Recommendations with Discounts")
     
+    products_per_customer = st.number_input(
+        "Products per Customer",
+        min_value=1,
+        max_value=10,
+        value=3,
+        step=1,
+        key="recs_per_customer"
+    )
+    
     if st.button("📧 Generate Personalized Recommendations", key="gen_recs"):
-        recs_data = []
+        try:
+            get_customer_value()
+        except Exception as e:
+            st.warning(f"Lifetime value model unavailable ({e}); offers use RFM segments only")
         rfm_data = processor.get_rfm_analysis()
         
-        for idx, row in rfm_data.head(20).iterrows():
-            cust_id = row['Customer_ID']
-            segment = row['RFM_Segment']
-            
-            # Determine discount based on segment
-            if segment == "Champions":
-                discount = vip_discount
-                rec = "Premium products with VIP discount"
-            elif segment == "Loyal Customers":
-                discount = standard_discount
-                rec = "Continue with preferred categories"
-            elif segment == "At-Risk Customers":
-                discount = vip_discount
-                rec = "Re-engagement offer - exclusive discount"
-            else:
-                discount = standard_discount
-                rec = "Personalized recommendations"
-            
-            # Get recommended product
-            if not processor.products_df.empty:
-                rec_product = processor.products_df.sample(1).iloc[0]
-                product_id = rec_product['SKU'] if 'SKU' in rec_product.index else "N/A"
-            else:
-                product_id = "N/A"
-            
-            recs_data.append({
-                'Customer_ID': cust_id,
-                'Segment': segment,
-                'Product_ID': product_id,
-                'Discount_Percentage': discount,
-                'Recommendation': rec,
-                'Generated_Date': datetime.now().strftime('%Y-%m-%d')
-            })
-        
-        recs_df = pd.DataFrame(recs_data)
-        recs_df.to_csv('data/output/personalized_recommendations_with_discounts.csv', index=False)
+        # Discount and message by segment (VIP discount for high predicted lifetime value)
+        with st.spinner("Scoring products for every customer..."):
+            recs_df = engines.get('recommender').personalized_offers(
+                rfm_data, n=int(products_per_customer),
+                standard_discount=standard_discount, vip_discount=vip_discount
+            )
+        recs_df['Generated_Date'] = datetime.now().strftime('%Y-%m-%d')
+        atomic_write_csv(recs_df, 'data/output/personalized_recommendations_with_discounts.csv', snapshot_versions=10)
         
-        st.success(f"✅ Generated {len(recs_df)} personalized recommendations!")
-        st.dataframe(recs_df)
+        st.success(f"✅ Generated {len(recs_df)} personalized recommendations for {recs_df['Customer_ID'].nunique()} customers!")
+        paginated_table(recs_df, key='generated_recs')
 
 # PAGE 6: PRODUCT PERFORMANCE
 elif page == "Product Performance":
     st.subheader("🎯 Product Performance")
     
-    product_perf = processor.get_product_performance(limit=20)
+    products_tab, basket_tab = st.tabs(["📊 Top Products", "🧺 Market Basket"])
     
-    if not product_perf.empty:
-        st.markdown("---")
-        st.subheader("Top Products by Revenue")
-        
-        fig_prod = px.bar(
-            product_perf,
-            x='SKU',
-            y='Revenue',
-            title="Top 20 Products by Revenue",
-            labels={'Revenue': 'Total Revenue ($)'},
-            height=500
-        )
-        st.plotly_chart(fig_prod, use_container_width=True)
+    with products_tab:
+        product_perf = processor.get_product_performance(limit=20)
         
-        st.markdown("---")
-        st.subheader("Product Details")
-        st.dataframe(product_perf, use_container_width=True)
-    else:
-        st.info("No product performance data available")
+        if not product_perf.empty:
+            st.markdown("---")
+            st.subheader("Top Products by Revenue")
+            
+            fig_prod = px.bar(
+                product_perf,
+                x='SKU',
+                y='Revenue',
+                title="Top 20 Products by Revenue",
+                labels={'Revenue': 'Total Revenue ($)'},
+                height=500
+            )
+            render_chart(fig_prod)
+            
+            st.markdown("---")
+            st.subheader("Product Details")
+            st.dataframe(product_perf, use_container_width=True)
+        else:
+            st.info("No product performance data available")
+    
+    with basket_tab:
+        st.markdown("Products (or categories) bought together in the same ticket - candidates for bundle promotions")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            basket_level = st.selectbox("Level", ["SKU", "Category"], key="basket_level")
+        with col2:
+            min_support = st.number_input(
+                "Min Support (%)", min_value=0.0, max_value=100.0,
+                value=MarketBasketEngine.DEFAULT_MIN_SUPPORT * 100, step=0.1, key="basket_support"
+            )
+        with col3:
+            min_confidence = st.number_input(
+                "Min Confidence (%)", min_value=0.0, max_value=100.0,
+                value=MarketBasketEngine.DEFAULT_MIN_CONFIDENCE * 100, step=1.0, key="basket_confidence"
+            )
+        with col4:
+            min_lift = st.number_input(
+                "Min Lift", min_value=0.0, value=MarketBasketEngine.DEFAULT_MIN_LIFT, step=0.1, key="basket_lift"
+            )
+        
+        try:
+            basket = engines.get('market_basket')
+            rules_df = basket.rules(min_support / 100, min_confidence / 100, min_lift, level=basket_level)
+        except Exception as e:
+            st.error(f"Error mining basket rules: {e}")
+            rules_df = None
+        
+        if rules_df is not None and not rules_df.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Tickets Analysed", f"{basket.ticket_count:,}")
+            with col2:
+                st.metric("Rules Found", f"{len(rules_df):,}")
+            with col3:
+                st.metric("Best Lift", f"{rules_df['Lift'].max():.2f}")
+            
+            top_rules = rules_df.head(20).assign(Rule=lambda df: df['Antecedent'] + ' → ' + df['Consequent'])
+            fig_rules = px.scatter(
+                rules_df,
+                x='Support',
+                y='Confidence',
+                size='Lift',
+                color='Antecedent_Category',
+                hover_data=['Antecedent', 'Consequent', 'Lift'],
+                title="Association Rules: Support vs Confidence (size = Lift)",
+                height=450
+            )
+            render_chart(fig_rules)
+            
+            fig_top = px.bar(
+                top_rules.iloc[::-1],
+                x='Lift',
+                y='Rule',
+                orientation='h',
+                title="Top 20 Rules by Lift",
+                height=500
+            )
+            render_chart(fig_top)
+            
+            paginated_table(rules_df, key='basket_rules', sort_by='Lift')
+            
+            if st.button("💾 Save Rules", key="save_basket_rules"):
+                basket.rules_df = rules_df
+                st.success(f"✅ Saved {len(rules_df)} rules to {basket.update_rules_csv()}")
+        elif rules_df is not None:
+            st.info("No rules meet these thresholds - try lowering min support or confidence")
 
 # PAGE 7: DATA SUMMARY
 elif page == "Data Summary":
@@ -876,7 +1279,7 @@ elif page == "Data Summary":
     with st.expander("View Customer Data"):
         st.write(f"Total Records: {len(processor.customers_df)}")
         st.write(f"Columns: {processor.customers_df.columns.tolist()}")
-        st.dataframe(processor.customers_df.head(20), use_container_width=True)
+        paginated_table(processor.customers_df, key='summary_customers')
         
         if 'Enrollment_Date' in processor.customers_df.columns:
             date_range = processor.customers_df['Enrollment_Date'].max() - processor.customers_df['Enrollment_Date'].min()
@@ -887,14 +1290,14 @@ elif page == "Data Summary":
     with st.expander("View Product Data"):
         st.write(f"Total Records: {len(processor.products_df)}")
         st.write(f"Columns: {processor.products_df.columns.tolist()}")
-        st.dataframe(processor.products_df.head(20), use_container_width=True)
+        paginated_table(processor.products_df, key='summary_products')
     
     st.markdown("---")
     st.subheader("Sales Header")
     with st.expander("View Sales Transactions"):
         st.write(f"Total Records: {len(processor.sales_header_df)}")
         st.write(f"Columns: {processor.sales_header_df.columns.tolist()}")
-        st.dataframe(processor.sales_header_df.head(20), use_container_width=True)
+        paginated_table(processor.sales_header_df, key='summary_sales', sort_by='Date')
         
         if 'Date' in processor.sales_header_df.columns:
             st.write(f"Date Range: {processor.sales_header_df['Date'].min().date()} to {processor.sales_header_df['Date'].max().date()}")
@@ -914,6 +1317,341 @@ elif page == "Data Summary":
         st.write(f"- Missing Values: {processor.sales_header_df.isnull().sum().sum()}")
         st.write(f"- Duplicates: {processor.sales_header_df.duplicated().sum()}")
 
+# PAGE 8: CUSTOMER 360
+elif page == "Customer 360":
+    st.subheader("🧑 Customer 360")
+    
+    try:
+        profiles = engines.get('customer_profiles')
+        customer_ids = profiles.customers()
+    except Exception as e:
+        st.error(f"Error loading customer profiles: {e}")
+        st.stop()
+    
+    cust_id = st.selectbox("Customer", customer_ids, key='customer_360_id')
+    profile = profiles.profile(cust_id)
+    
+    balance = profile['balances']
+    rfm = profile['rfm']
+    
+    st.markdown("---")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Loyalty Tier", balance['Loyalty_Tier'].iloc[0] if balance is not None and len(balance) else "—")
+    with col2:
+        st.metric("Current Balance", f"{balance['Current_Balance'].iloc[0]:,.2f}" if balance is not None and len(balance) else "—")
+    with col3:
+        st.metric("RFM Segment", rfm['RFM_Segment'].iloc[0] if rfm is not None and len(rfm) else "—")
+    with col4:
+        st.metric("Total Spent", f"${balance['Total_Spent'].iloc[0]:,.2f}" if balance is not None and len(balance) else "—")
+    
+    if rfm is not None and len(rfm):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Recency", f"{rfm['Recency'].iloc[0]} days", help=f"R score {rfm['R_Score'].iloc[0]}")
+        with col2:
+            st.metric("Frequency", f"{rfm['Frequency'].iloc[0]}", help=f"F score {rfm['F_Score'].iloc[0]}")
+        with col3:
+            st.metric("Monetary", f"${rfm['Monetary'].iloc[0]:,.2f}", help=f"M score {rfm['M_Score'].iloc[0]}")
+    
+    st.markdown("---")
+    st.subheader("💡 Recommendations")
+    recommendation = profile['recommendations']
+    if recommendation is not None and len(recommendation):
+        row = recommendation.iloc[0]
+        st.write(f"**{row['Recommendation']}**")
+        st.write(f"Action: {row['Action']} | Bonus Points: {row['Bonus_Points']} | Discount: {row['Discount_Offer']:.0%}")
+    else:
+        st.info("No recommendation generated for this customer")
+    
+    offers = profile['offers']
+    if offers is not None and len(offers):
+        st.dataframe(offers, use_container_width=True)
+    
+    st.markdown("---")
+    st.subheader("📜 Points History")
+    try:
+        # Date-ordered slice of the loyalty engine's indexed timelines
+        history = engines.get('loyalty').get_customer_timeline(cust_id)
+    except Exception as e:
+        st.error(f"Error loading points history: {e}")
+        history = None
+    if history is not None and len(history):
+        fig_history = px.line(
+            history,
+            x='Date',
+            y='Cumulative_Points',
+            markers=True,
+            title=f"Cumulative Points - {cust_id}",
+            height=350
+        )
+        render_chart(fig_history)
+        paginated_table(history, key='customer_360_history', sort_by='Date')
+    else:
+        st.info("No points history for this customer")
+
+# PAGE 9: COHORT RETENTION
+elif page == "Cohort Retention":
+    st.subheader("📅 Cohort Retention by Enrollment Month")
+    
+    try:
+        cohorts = engines.get('cohorts')
+    except Exception as e:
+        st.error(f"Error building cohorts: {e}")
+        cohorts = None
+    
+    if cohorts is not None:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            metric_labels = {
+                'Retention_Rate': 'Retention Rate (% of cohort active)',
+                'Active_Customers': 'Active Customers',
+                'Revenue': 'Revenue ($)',
+                'Revenue_Per_Customer': 'Revenue per Active Customer ($)',
+                'Orders': 'Orders'
+            }
+            metric = st.selectbox(
+                "📊 Metric",
+                list(metric_labels),
+                format_func=metric_labels.get,
+                key="cohort_metric"
+            )
+        with col2:
+            st.write("")
+            if st.button("🔄 Refresh & Save", key="cohort_refresh"):
+                months = cohorts.refresh(processor.sales_header_df)
+                cohorts.update_cohort_csv()
+                st.success(f"✅ Recomputed {months} month(s)")
+        
+        cohort_table = cohorts.cohort_table()
+        if not cohort_table.empty:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Cohorts", f"{cohort_table['Cohort'].nunique():,}")
+            with col2:
+                st.metric("Enrolled Customers", f"{int(cohorts.cohort_sizes.sum()):,}")
+            with col3:
+                st.metric("Latest Sales Month", month_labels([cohorts.last_month])[0])
+            
+            matrix = cohorts.matrix(metric)
+            fig_cohort = px.imshow(
+                matrix,
+                aspect='auto',
+                color_continuous_scale='Blues',
+                labels={'x': 'Months Since Enrollment', 'y': 'Enrollment Cohort', 'color': metric_labels[metric]},
+                title=f"{metric_labels[metric]} by Cohort",
+                height=max(400, 22 * len(matrix))
+            )
+            render_chart(fig_cohort)
+            
+            paginated_table(cohort_table, key='cohort_table')
+        else:
+            st.info("No purchases by enrolled customers yet")
+
+# PAGE 10: LOYALTY POINTS
+elif page == "Loyalty Points":
+    st.subheader("💰 Loyalty Points")
+    
+    try:
+        loyalty = engines.get('loyalty')
+    except Exception as e:
+        st.error(f"Error loading loyalty data: {e}")
+        st.stop()
+    
+    balances = loyalty.customer_balances_df
+    latest_date = loyalty.sales_header_df['Date'].max().date()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Members with Points", f"{len(balances):,}")
+    with col2:
+        st.metric("Points Earned", f"{balances['Total_Points_Earned'].sum():,.0f}")
+    with col3:
+        st.metric("Active Balance", f"{balances['Current_Balance'].sum():,.0f}")
+    with col4:
+        earned = balances['Total_Points_Earned'].sum()
+        st.metric("Redemption Rate", f"{balances['Redeemed_Points'].sum() / earned * 100:.1f}%" if earned else "—")
+    
+    if st.button("💾 Save Balances & Tier Changes", key="save_balances"):
+        tier_changes = loyalty.save_balances()
+        st.success(f"✅ Saved balances; {len(tier_changes)} customers changed tier since the last save")
+        if len(tier_changes) > 0:
+            paginated_table(tier_changes, key='tier_changes', sort_by='Current_Balance', ascending=False)
+    
+    st.markdown("---")
+    st.subheader("🎁 Record Redemption")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        redeem_cust = st.selectbox("Customer", balances['Cust_ID'].sort_values().tolist(), key='redeem_cust')
+        available = float(balances.loc[balances['Cust_ID'] == redeem_cust, 'Current_Balance'].iloc[0])
+    with col2:
+        redeem_points = st.number_input(
+            f"Points to Redeem (available {available:,.2f})",
+            min_value=0.0,
+            max_value=max(available, 0.0),
+            value=0.0,
+            step=50.0,
+            key='redeem_points'
+        )
+    with col3:
+        redeem_date = st.date_input("Redemption Date", value=latest_date, key='redeem_date')
+        # Back-dated redemptions are limited by the balance from that date on
+        redeemable = loyalty.redeemable_points(redeem_cust, redeem_date)
+        if redeemable < available:
+            st.caption(f"Redeemable on {redeem_date}: {redeemable:,.2f} points")
+    
+    if st.button("🎁 Record Redemption", key="record_redemption", disabled=redeem_points <= 0):
+        try:
+            recorded = loyalty.append_redemptions(pd.DataFrame([{
+                'Cust_ID': redeem_cust,
+                'Date': redeem_date,
+                'Points_Redeemed': redeem_points
+            }]), 'data/input/points_redemptions.csv')
+        except ValueError as e:
+            st.error(f"Error recording redemption: {e}")
+        else:
+            new_balance = recorded.loc[recorded['Cust_ID'] == redeem_cust, 'Current_Balance'].iloc[0]
+            st.success(f"✅ Redeemed {redeem_points:,.0f} points for {redeem_cust}; new balance {new_balance:,.2f}")
+    
+    st.markdown("---")
+    st.subheader("🕒 Balance & Tier History")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        history_cust = st.selectbox("Customer", balances['Cust_ID'].sort_values().tolist(), key='tier_history_cust')
+        as_of_date = st.date_input("Balance as of", value=latest_date, key='tier_history_date')
+        as_of = loyalty.get_balance_as_of(history_cust, as_of_date)
+        st.metric("Balance", f"{as_of['Balance']:,.2f}")
+        st.metric("Tier", as_of['Loyalty_Tier'])
+    
+    with col2:
+        if loyalty.points_ledger is None:
+            loyalty.build_points_ledger()
+        timeline = loyalty.points_ledger.timeline(history_cust)
+        fig_balance = px.line(
+            timeline,
+            x='Date',
+            y='Balance',
+            markers=True,
+            hover_data=['Points_Change', 'Loyalty_Tier'],
+            title=f"Balance History - {history_cust}",
+            line_shape='hv',
+            height=350
+        )
+        render_chart(fig_balance)
+    
+    st.markdown("---")
+    st.subheader("⏳ Points Expiring in 30 Days")
+    st.caption(f"Points expire {loyalty.expiry_months} months after they are earned; redemptions use the oldest points first")
+    
+    expiry_date = st.date_input("As of", value=latest_date, key='expiry_as_of')
+    expiry = loyalty.get_expiring_points(expiry_date, window_days=30)
+    expiring = expiry[expiry['Expiring_Soon'] > 0]
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Expiring in 30 Days", f"{expiry['Expiring_Soon'].sum():,.0f}")
+    with col2:
+        st.metric("Members Affected", f"{len(expiring):,}")
+    with col3:
+        st.metric("Expired to Date", f"{expiry['Expired'].sum():,.0f}")
+    
+    if len(expiring) > 0:
+        paginated_table(
+            expiring[['Cust_ID', 'Available_Balance', 'Expiring_Soon', 'Next_Expiry_Date']],
+            key='expiring_points',
+            sort_by='Expiring_Soon',
+            ascending=False
+        )
+    else:
+        st.info("No points expire in the next 30 days")
+    
+    st.markdown("---")
+    st.subheader("🎉 Points with Promotion Bonuses")
+    st.caption("Every purchase re-scored with the bonus multipliers of the promotions active on its date, including special days added in the Admin Panel")
+    
+    promo_history = loyalty.calculate_promo_points_history()
+    promo_points = promo_history.groupby('Cust_ID', as_index=False).agg(
+        Points_Earned=('Points_Earned', 'sum'),
+        Promo_Points_Earned=('Promo_Points_Earned', 'sum')
+    )
+    promo_points['Bonus_Points'] = (promo_points['Promo_Points_Earned'] - promo_points['Points_Earned']).round(2)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Base Points", f"{promo_history['Points_Earned'].sum():,.0f}")
+    with col2:
+        st.metric("With Promotions", f"{promo_history['Promo_Points_Earned'].sum():,.0f}")
+    with col3:
+        st.metric("Purchases with a Bonus", f"{(promo_history['Promo_Multiplier'] > 1).sum():,}")
+    
+    paginated_table(promo_points, key='promo_points', sort_by='Bonus_Points', ascending=False)
+    st.download_button(
+        "📥 Export Promotion Points History",
+        promo_history.to_csv(index=False),
+        file_name='promo_points_history.csv',
+        mime='text/csv',
+        key='export_promo_points'
+    )
+
+# HIDDEN PAGE: PERFORMANCE
+elif page == "Performance":
+    st.subheader("⏱️ Performance")
+    st.markdown("Timing of DataProcessor and LoyaltyPointsEngine calls (most recent calls in a ring buffer)")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        enabled = st.toggle("Record calls", value=instrumentation.is_enabled())
+    with col2:
+        track_memory = st.checkbox("Track peak memory (slower)", value=False)
+    with col3:
+        if st.button("Clear buffer"):
+            instrumentation.clear()
+    
+    if enabled:
+        instrumentation.enable(track_memory=track_memory)
+    else:
+        instrumentation.disable()
+    
+    build_times = pd.DataFrame(
+        sorted(engines.timings().items(), key=lambda item: -item[1]),
+        columns=['Engine', 'Build_Seconds']
+    )
+    if not build_times.empty:
+        st.subheader("🏗️ Engine Build Times")
+        st.dataframe(build_times.round(3), use_container_width=True)
+    
+    calls = instrumentation.records_frame()
+    if calls.empty:
+        st.info("No calls recorded yet. Enable recording and open other pages.")
+    else:
+        st.markdown("---")
+        st.subheader("📊 Time by Method")
+        summary = instrumentation.summary_frame()
+        fig_perf = px.bar(
+            summary.head(20),
+            x='total_ms',
+            y='name',
+            orientation='h',
+            title='Total Wall Time by Method (ms)',
+            labels={'total_ms': 'Total (ms)', 'name': 'Method'}
+        )
+        fig_perf.update_layout(yaxis={'categoryorder': 'total ascending'})
+        render_chart(fig_perf)
+        st.dataframe(summary, use_container_width=True)
+        
+        st.markdown("---")
+        st.subheader("📋 Recorded Calls")
+        paginated_table(calls, key='perf_calls', sort_by='timestamp', ascending=False)
+    
+    st.download_button(
+        "⬇️ Export JSON",
+        data=instrumentation.export_json(),
+        file_name=f"performance_{datetime.now().strftime('%Y%m%dT%H%M%S')}.json",
+        mime='application/json'
+    )
+
 # Footer
 st.markdown("---")
 st.markdown(f"""
@@ -921,3 +1659,25 @@ st.markdown(f"""
 Data Source: data/ folder | Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 </p>
 """, unsafe_allow_html=True)
+
+def show_warmup_status():
+    """Sidebar warm-up progress, with a retry for engines that failed to load"""
+    ready, total, status = engines.progress()
+    if ready < total:
+        st.progress(ready / total, text=f"⏳ Warming up engines: {ready}/{total}")
+    else:
+        st.caption(f"✅ All {total} engines ready")
+    failed = [name for name, state in status.items() if state == 'failed']
+    if failed:
+        st.caption(f"⚠️ Failed to load: {', '.join(failed)}")
+        if st.button("🔁 Retry", key="retry_engines"):
+            for name in failed:
+                engines.clear(name)
+            engines.start_warmup(failed)
+
+# Warm up the other pages' engines in the background after first paint;
+# the status polls while engines are still loading
+engines.start_warmup()
+ready, total, _ = engines.progress()
+with warmup_status.container():
+    st.fragment(run_every=1.0 if ready < total else None)(show_warmup_status)()
@@ -0,0 +1,88 @@
+"""
+Loyalty API Load Test
+Fires random by-ID lookups (and optionally conditional re-requests) at a
+running server from many concurrent clients and reports throughput and
+latency percentiles
+
+    python src/api/server.py &
+    python src/api/load_test.py --requests 20000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import aiohttp
+import numpy as np
+
+RESOURCES = ['balances', 'tiers', 'rfm', 'recommendations', 'discounts']
+
+
+async def _collect_ids(session, base_url, resource):
+    """Every ID of a resource, walking the paginated bulk endpoint"""
+    ids, offset = [], 0
+    while offset is not None:
+        async with session.get(f"{base_url}/api/v1/{resource}", params={'offset': offset, 'limit': 1000}) as response:
+            page = await response.json()
+        ids.extend(str(item[page['key']]) for item in page['items'])
+        offset = page['next_offset']
+    return ids
+
+
+async def _worker(session, base_url, targets, count, conditional, latencies, statuses):
+    etags = {}
+    for _ in range(count):
+        resource, record_id = random.choice(targets)
+        url = f"{base_url}/api/v1/{resource}/{record_id}"
+        headers = {'If-None-Match': etags[url]} if conditional and url in etags else {}
+        started = time.perf_counter()
+        async with session.get(url, headers=headers) as response:
+            await response.read()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if 'ETag' in response.headers:
+                etags[url] = response.headers['ETag']
+
+
+async def run(base_url, total_requests, concurrency, conditional, resources):
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        targets = []
+        for resource in resources:
+            targets.extend((resource, record_id) for record_id in await _collect_ids(session, base_url, resource))
+        if not targets:
+            raise SystemExit("No IDs to look up; is the server loaded?")
+
+        latencies, statuses = [], {}
+        per_worker, extra = divmod(total_requests, concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(session, base_url, targets, per_worker + (i < extra), conditional, latencies, statuses)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    print(f"Requests:    {len(latencies):,} over {len(targets):,} IDs ({concurrency} concurrent clients)")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"Latency ms:  p50 {np.percentile(latencies_ms, 50):.2f}  "
+          f"p95 {np.percentile(latencies_ms, 95):.2f}  p99 {np.percentile(latencies_ms, 99):.2f}")
+    print(f"Statuses:    {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the loyalty API')
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--conditional', action='store_true',
+                        help='Re-send ETags so repeated lookups are answered with 304')
+    parser.add_argument('--resources', nargs='+', default=RESOURCES, choices=RESOURCES)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.conditional, args.resources))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Loyalty API Store
+Precomputed loyalty results held as per-resource in-memory indexes of
+serialized JSON, so a lookup by ID is a dict access and never touches pandas
+"""
+
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'core'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'engines'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'utils'))
+
+from data_processor import DataProcessor
+from loyalty_engine import LoyaltyPointsEngine
+from dynamic_rules_engine import DynamicRulesEngine
+from lifetime_value_engine import CustomerLifetimeValueEngine
+from recommendation_engine import ProductRecommendationEngine
+from engine_registry import EngineRegistry
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+PAGE_CACHE_SIZE = 256
+
+# Personalized products per customer, and the offer discounts (%) used until
+# rates are saved in the Admin Panel (promotional_rates_config.csv)
+OFFERS_PER_CUSTOMER = 3
+DEFAULT_DISCOUNTS = {'Standard_Discount': 10, 'VIP_Discount': 20}
+
+
+def _etag(payload):
+    return '"' + hashlib.sha1(payload).hexdigest()[:20] + '"'
+
+
+def _json_records(df):
+    """Frame rows as JSON-safe dicts (NaN -> null, dates -> ISO strings)"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+        elif isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype(object)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return str(value)
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode()
+
+
+class ResourceIndex:
+    """
+    One API resource: records sorted by ID, each serialized once with its ETag
+    - get(id) is a dict lookup returning (body, etag)
+    - page(offset, limit) serializes a page on first request and keeps the
+      most recent pages in a small LRU cache
+    - the collection ETag changes only when some record changes
+    """
+
+    def __init__(self, name, records, key):
+        self.name = name
+        self.key = key
+        records = sorted(records, key=lambda record: str(record[key]))
+        self.ids = [str(record[key]) for record in records]
+        self.bodies = [_dumps(record) for record in records]
+        self.etags = [_etag(body) for body in self.bodies]
+        self.positions = {record_id: i for i, record_id in enumerate(self.ids)}
+        self.version = _etag(''.join(self.etags).encode())
+        self._pages = OrderedDict()
+
+    @classmethod
+    def from_frame(cls, name, df, key):
+        return cls(name, _json_records(df), key)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, record_id):
+        """(body, etag) for one ID, or None"""
+        position = self.positions.get(record_id)
+        if position is None:
+            return None
+        return self.bodies[position], self.etags[position]
+
+    def page(self, offset=0, limit=DEFAULT_PAGE_SIZE):
+        """(body, etag) for a page of records in ID order"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        cache_key = (offset, limit)
+        cached = self._pages.get(cache_key)
+        if cached is not None:
+            self._pages.move_to_end(cache_key)
+            return cached
+
+        end = min(offset + limit, len(self.ids))
+        next_offset = end if end < len(self.ids) else None
+        # Records are already serialized; append them to the envelope object
+        # (whatever its keys, it ends with its closing brace)
+        items = b','.join(self.bodies[offset:end])
+        envelope = _dumps({'resource': self.name, 'key': self.key, 'total': len(self.ids), 'offset': offset,
+                           'limit': limit, 'next_offset': next_offset})
+        body = envelope[:-1] + b',"items":[' + items + b']}'
+        result = (body, _etag(self.version.encode() + repr(cache_key).encode()))
+
+        self._pages[cache_key] = result
+        if len(self._pages) > PAGE_CACHE_SIZE:
+            self._pages.popitem(last=False)
+        return result
+
+
+class LoyaltyStore:
+    """
+    All API resources, built from the engines so they agree with each other:
+    - balances: loyalty balances per customer (LoyaltyPointsEngine)
+    - tiers: tier, next tier and points still needed per customer
+    - rfm: RFM scores and segment per customer (DataProcessor)
+    - recommendations: rule-based recommendation per customer over the
+      current balances and predicted lifetime values (DynamicRulesEngine,
+      CustomerLifetimeValueEngine), with personalized products
+      (ProductRecommendationEngine)
+    - discounts: current product discounts (DynamicRulesEngine)
+    """
+
+    def __init__(self, data_path='data/input', output_path='data/output', chunk_rows=500_000):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.chunk_rows = chunk_rows
+        self.resources = {}
+
+        self.engines = EngineRegistry()
+        self.engines.register('processor', self._load_processor)
+        self.engines.register('loyalty', self._load_loyalty)
+        self.engines.register('customer_value', self._load_customer_value)
+        self.engines.register('dynamic_rules', self._load_dynamic_rules)
+        self.engines.register('recommender', self._load_recommender)
+
+    def _load_processor(self):
+        processor = DataProcessor(data_path=self.data_path, output_path=self.output_path)
+        processor.load_streaming(chunk_rows=self.chunk_rows)
+        return processor
+
+    def _load_loyalty(self):
+        engine = LoyaltyPointsEngine(data_path=self.data_path)
+        if not engine.load_streaming(chunk_rows=self.chunk_rows):
+            raise RuntimeError(f"Unable to load loyalty data from {self.data_path}")
+        return engine
+
+    def _load_dynamic_rules(self):
+        engine = DynamicRulesEngine(data_path=self.data_path, output_path=self.output_path)
+        if not engine.load_data():
+            raise RuntimeError(f"Unable to load dynamic rules data from {self.data_path}")
+        # Rules run on the balances served by this store, not the saved balances file
+        engine.customer_balances_df = self.engines.get('loyalty').customer_balances_df
+        engine.set_customer_value(self.engines.get('customer_value').clv_df)
+        return engine
+
+    def _load_customer_value(self):
+        processor = self.engines.get('processor')
+        engine = CustomerLifetimeValueEngine(data_path=self.data_path, output_path=self.output_path)
+        if not engine.load_data(processor.get_rfm_analysis(), processor.customers_df):
+            raise RuntimeError(f"No customer purchases to fit lifetime value on in {self.data_path}")
+        engine.fit()
+        engine.predict()
+        return engine
+
+    def _load_recommender(self):
+        engine = ProductRecommendationEngine(data_path=self.data_path, output_path=self.output_path)
+        engine.load_data(self.engines.get('processor').get_interaction_matrix())
+        if not engine.load_or_fit():
+            raise RuntimeError(f"Unable to load sales data for recommendations from {self.data_path}")
+        return engine
+
+    def _offer_discounts(self):
+        """Standard and VIP discounts (%) last saved in the Admin Panel, else the defaults"""
+        path = os.path.join(self.output_path, 'promotional_rates_config.csv')
+        discounts = dict(DEFAULT_DISCOUNTS)
+        if os.path.exists(path):
+            rates = pd.read_csv(path)
+            discounts.update({k: rates[k].iloc[-1] for k in DEFAULT_DISCOUNTS if k in rates.columns and len(rates)})
+        return discounts
+
+    def build(self):
+        """Build every resource index; returns self"""
+        loyalty = self.engines.get('loyalty')
+        processor = self.engines.get('processor')
+
+        balances = loyalty.customer_balances_df
+        self.resources['balances'] = ResourceIndex.from_frame('balances', balances, 'Cust_ID')
+        self.resources['tiers'] = ResourceIndex.from_frame('tiers', self._tiers(loyalty, balances), 'Cust_ID')
+
+        rfm = processor.get_rfm_analysis().rename(columns={'Customer_ID': 'Cust_ID'})
+        self.resources['rfm'] = ResourceIndex.from_frame('rfm', rfm, 'Cust_ID')
+
+        rules = self.engines.get('dynamic_rules')
+        discounts = self._offer_discounts()
+        offers = self.engines.get('recommender').personalized_offers(
+            processor.get_rfm_analysis(copy=False), n=OFFERS_PER_CUSTOMER,
+            standard_discount=discounts['Standard_Discount'], vip_discount=discounts['VIP_Discount']
+        )
+        recommendations = self._recommendations(rules.generate_customer_recommendations(), offers)
+        self.resources['recommendations'] = ResourceIndex('recommendations', recommendations, 'Cust_ID')
+
+        self.resources['discounts'] = ResourceIndex.from_frame('discounts', rules.apply_dynamic_discounts(), 'SKU')
+        return self
+
+    @staticmethod
+    def _tiers(loyalty, balances):
+        """Current tier plus the next tier and the points still needed for it"""
+        balance = balances['Current_Balance'].to_numpy(dtype='float64')
+        position = np.searchsorted(loyalty.tier_minimums, balance, side='right')
+        has_next = position < len(loyalty.tier_names)
+        next_position = np.minimum(position, len(loyalty.tier_names) - 1)
+
+        tiers = balances[['Cust_ID', 'Loyalty_Tier', 'Current_Balance']].copy()
+        tiers['Next_Tier'] = np.where(has_next, loyalty.tier_names[next_position], None)
+        tiers['Points_To_Next_Tier'] = np.where(
+            has_next, np.round(loyalty.tier_minimums[next_position] - balance, 2), None
+        )
+        return tiers
+
+    @staticmethod
+    def _recommendations(customers, products):
+        """Customer recommendation rows with their personalized product offers nested"""
+        products = products.rename(columns={'Customer_ID': 'Cust_ID'})
+
+        offers = {}
+        for record in _json_records(products):
+            offers.setdefault(str(record.pop('Cust_ID')), []).append(record)
+
+        records = _json_records(customers)
+        for record in records:
+            record['Products'] = offers.pop(str(record['Cust_ID']), [])
+        # Customers with personalized offers but no rule-based recommendation
+        records.extend({'Cust_ID': cust_id, 'Products': items} for cust_id, items in offers.items())
+        return records
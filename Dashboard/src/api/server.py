@@ -0,0 +1,141 @@
+"""
+Loyalty API Server
+Local HTTP/JSON service over the loyalty engines' results, for internal
+systems (CRM, email campaigns) that would otherwise scrape data/output
+
+Run from the Dashboard directory:
+    python src/api/server.py --port 8080
+
+Endpoints (every GET supports If-None-Match and answers 304 when unchanged):
+    GET  /health
+    GET  /api/v1/{resource}?offset=0&limit=100   paginated bulk, in ID order
+    GET  /api/v1/{resource}/{id}                 one record by ID
+    POST /api/v1/reload                          rebuild from current data
+resources: balances, tiers, rfm, recommendations, discounts
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loyalty_store import LoyaltyStore, DEFAULT_PAGE_SIZE
+
+# Mutable holder: the application is frozen once started, but reload swaps the store
+STATE_KEY = web.AppKey('state', dict)
+
+
+def _matches(if_none_match, etag):
+    """Whether an If-None-Match header (a list of tags, maybe weak, or *) covers etag"""
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def _respond(request, body, etag):
+    """JSON response, or 304 if the client already has this version"""
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _matches(request.headers.get('If-None-Match', ''), etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type='application/json', headers=headers)
+
+
+def _error(status, message):
+    """JSON error response (names from the URL are encoded, never spliced)"""
+    return web.json_response({'error': message}, status=status)
+
+
+def _resource(request):
+    """The requested resource index, or None if there is no such resource"""
+    return request.app[STATE_KEY]['store'].resources.get(request.match_info['resource'])
+
+
+def _int_param(request, name, default):
+    """Integer query parameter, or None if it is not an integer"""
+    try:
+        return int(request.query.get(name, default))
+    except ValueError:
+        return None
+
+
+async def get_record(request):
+    resource = _resource(request)
+    if resource is None:
+        return _error(404, f"unknown resource {request.match_info['resource']}")
+    found = resource.get(request.match_info['record_id'])
+    if found is None:
+        return _error(404, 'not found')
+    return _respond(request, *found)
+
+
+async def get_page(request):
+    resource = _resource(request)
+    if resource is None:
+        return _error(404, f"unknown resource {request.match_info['resource']}")
+    offset = _int_param(request, 'offset', 0)
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE)
+    if offset is None or limit is None:
+        return _error(400, 'offset and limit must be integers')
+    return _respond(request, *resource.page(offset, limit))
+
+
+async def health(request):
+    store = request.app[STATE_KEY]['store']
+    return web.json_response({
+        'status': 'ok',
+        'resources': {name: len(resource) for name, resource in store.resources.items()}
+    })
+
+
+def _build_store(settings):
+    return LoyaltyStore(**settings).build()
+
+
+async def reload(request):
+    """Rebuild every index off the event loop, then swap the store in"""
+    state = request.app[STATE_KEY]
+    loop = asyncio.get_running_loop()
+    state['store'] = await loop.run_in_executor(None, _build_store, state['settings'])
+    return await health(request)
+
+
+def create_app(data_path='data/input', output_path='data/output', chunk_rows=500_000, store=None):
+    """aiohttp application; the store is built at startup unless one is given"""
+    app = web.Application()
+    app[STATE_KEY] = {
+        'settings': {'data_path': data_path, 'output_path': output_path, 'chunk_rows': chunk_rows},
+        'store': store
+    }
+
+    async def on_startup(app):
+        state = app[STATE_KEY]
+        if state['store'] is None:
+            loop = asyncio.get_running_loop()
+            state['store'] = await loop.run_in_executor(None, _build_store, state['settings'])
+
+    app.on_startup.append(on_startup)
+    app.router.add_get('/health', health)
+    app.router.add_post('/api/v1/reload', reload)
+    app.router.add_get('/api/v1/{resource}', get_page)
+    app.router.add_get('/api/v1/{resource}/{record_id}', get_record)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve precomputed loyalty results over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--data-path', default='data/input')
+    parser.add_argument('--output-path', default='data/output')
+    parser.add_argument('--chunk-rows', type=int, default=500_000)
+    args = parser.parse_args()
+
+    app = create_app(args.data_path, args.output_path, args.chunk_rows)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,20 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
+import sys
+import os
+
+# Add sibling source directories to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'core'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'engines'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'utils'))
+
 from data_processor import DataProcessor
 from loyalty_engine import LoyaltyPointsEngine
+from engine_registry import EngineRegistry
+from table_view import paginated_table
+from chart_utils import render_chart
+import instrumentation
 from datetime import datetime, timedelta
 
 # Page configuration
@@ -39,14 +51,69 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state and load data
-@st.cache_resource
+# Engine factories (no Streamlit calls: they may run on the warm-up thread)
 def load_data():
     processor = DataProcessor()
     processor.load_all_data()
     return processor
 
-processor = load_data()
+def load_loyalty_engine():
+    engine = LoyaltyPointsEngine()
+    engine.load_loyalty_data()
+    balances = engine.calculate_customer_balances()
+    return engine, balances
+
+def load_customer_value():
+    from lifetime_value_engine import CustomerLifetimeValueEngine
+    processor = engines.get('processor')
+    engine = CustomerLifetimeValueEngine()
+    if not engine.load_data(processor.get_rfm_analysis(), processor.customers_df):
+        raise RuntimeError("No customer purchases to fit lifetime value on")
+    engine.fit()
+    engine.predict()
+    return engine
+
+def load_dynamic_rules_engine():
+    from dynamic_rules_engine import DynamicRulesEngine
+    engine = DynamicRulesEngine()
+    engine.load_data()
+    # Recommendations use predicted lifetime values when they can be fitted
+    try:
+        engine.set_customer_value(engines.get('customer_value').clv_df)
+    except Exception as e:
+        print(f"Lifetime values unavailable for recommendations: {e}")
+    engine.update_all_dynamic_rules()
+    return engine
+
+def load_promo_data():
+    engine = LoyaltyPointsEngine()
+    engine.load_loyalty_data()
+    promo_eff = engine.calculate_promo_effectiveness()
+    uplift = engine.calculate_sales_uplift_by_product()
+    return promo_eff, uplift
+
+# Shared across sessions; each engine is built lazily on first use
+@st.cache_resource
+def get_engine_registry():
+    registry = EngineRegistry()
+    registry.register('processor', load_data)
+    registry.register('loyalty', load_loyalty_engine)
+    registry.register('customer_value', load_customer_value)
+    registry.register('dynamic_rules', load_dynamic_rules_engine)
+    registry.register('promo', load_promo_data)
+    return registry
+
+engines = get_engine_registry()
+
+# Pages that need the core data processor
+PROCESSOR_PAGES = [
+    "Dashboard Overview",
+    "RFM Analysis",
+    "Customer Segmentation",
+    "Sales Analytics",
+    "Product Performance",
+    "Data Summary"
+]
 
 # Sidebar navigation
 st.sidebar.markdown("# 📊 Navigation")
@@ -65,6 +132,17 @@ page = st.sidebar.radio(
     ]
 )
 
+# Hidden diagnostics page, opened with ?page=performance
+if st.query_params.get('page') == 'performance':
+    page = "Performance"
+
+# Engine warm-up status (filled in after the page renders)
+warmup_status = st.sidebar.empty()
+
+# Only build the engines this page needs
+if page in PROCESSOR_PAGES:
+    processor = engines.get('processor')
+
 # Title
 st.markdown("<div class='header-title'>🏪 Retail Loyalty Analytics Platform</div>", unsafe_allow_html=True)
 st.markdown("---")
@@ -113,7 +191,7 @@ if page == "Dashboard Overview":
         hovermode='x unified',
         height=400
     )
-    st.plotly_chart(fig_trend, use_container_width=True)
+    render_chart(fig_trend)
     
     # Sales by store and category
     col1, col2 = st.columns(2)
@@ -129,7 +207,7 @@ if page == "Dashboard Overview":
             hover_data=['Store_ID', 'Transactions'],
             title='Sales Revenue by Store Location'
         )
-        st.plotly_chart(fig_store, use_container_width=True)
+        render_chart(fig_store)
     
     with col2:
         st.subheader("🛍️ Sales by Category")
@@ -140,7 +218,7 @@ if page == "Dashboard Overview":
             names='Category',
             title='Sales Distribution by Product Category'
         )
-        st.plotly_chart(fig_category, use_container_width=True)
+        render_chart(fig_category)
     
     # Top customers
     st.subheader("⭐ Top 10 Customers")
@@ -154,7 +232,7 @@ if page == "Dashboard Overview":
         hover_data=['Transaction_Count', 'Total_Points'],
         title='Top 10 Customers by Total Spend'
     )
-    st.plotly_chart(fig_top, use_container_width=True)
+    render_chart(fig_top)
 
 # PAGE 2: RFM ANALYSIS
 elif page == "RFM Analysis":
@@ -199,7 +277,7 @@ elif page == "RFM Analysis":
             'Frequency': 'Number of Transactions'
         }
     )
-    st.plotly_chart(fig_rfm, use_container_width=True)
+    render_chart(fig_rfm)
     
     # Segment distribution
     st.subheader("📈 Customer Segment Distribution")
@@ -214,7 +292,7 @@ elif page == "RFM Analysis":
             names='Segment',
             title='Customer Segment Distribution'
         )
-        st.plotly_chart(fig_segment_pie, use_container_width=True)
+        render_chart(fig_segment_pie)
     
     with col2:
         fig_segment_bar = px.bar(
@@ -224,7 +302,7 @@ elif page == "RFM Analysis":
             color='Segment',
             title='Customer Count by Segment'
         )
-        st.plotly_chart(fig_segment_bar, use_container_width=True)
+        render_chart(fig_segment_bar)
     
     # RFM data table
     st.subheader("📋 RFM Data")
@@ -252,7 +330,7 @@ elif page == "Customer Segmentation":
                 y='Monetary',
                 title='Top 15 At-Risk Customers by Historical Spend'
             )
-            st.plotly_chart(fig_at_risk, use_container_width=True)
+            render_chart(fig_at_risk)
     
     st.markdown("---")
     
@@ -277,7 +355,7 @@ elif page == "Customer Segmentation":
         go.Bar(name='Avg Spend ($)', x=segment_stats['Segment'], y=segment_stats['Avg Spend'])
     ])
     fig_stats.update_layout(barmode='group', title='Segment Characteristics Comparison')
-    st.plotly_chart(fig_stats, use_container_width=True)
+    render_chart(fig_stats)
     
     st.markdown("---")
     
@@ -325,7 +403,7 @@ elif page == "Sales Analytics":
             hover_data=['Transactions', 'Store_ID'],
             title='Store Performance by Location and Tier'
         )
-        st.plotly_chart(fig_store_tier, use_container_width=True)
+        render_chart(fig_store_tier)
     
     with col2:
         st.subheader("Sales by Category")
@@ -337,7 +415,7 @@ elif page == "Sales Analytics":
             hover_data=['Transactions', 'Quantity'],
             title='Category Sales Performance'
         )
-        st.plotly_chart(fig_category, use_container_width=True)
+        render_chart(fig_category)
     
     st.markdown("---")
     
@@ -373,7 +451,7 @@ elif page == "Sales Analytics":
         hovermode='x unified',
         height=400
     )
-    st.plotly_chart(fig_combined, use_container_width=True)
+    render_chart(fig_combined)
     
     st.markdown("---")
     
@@ -415,7 +493,7 @@ elif page == "Product Performance":
             hover_data=['Quantity_Sold', 'Transactions'],
             title='Top 15 Products by Revenue'
         )
-        st.plotly_chart(fig_products, use_container_width=True)
+        render_chart(fig_products)
     
     with col2:
         st.subheader("Product Category Distribution")
@@ -431,7 +509,7 @@ elif page == "Product Performance":
             names='Category',
             title='Revenue Distribution by Category'
         )
-        st.plotly_chart(fig_cat_dist, use_container_width=True)
+        render_chart(fig_cat_dist)
     
     st.markdown("---")
     
@@ -445,7 +523,7 @@ elif page == "Product Performance":
         hover_data=['Transactions'],
         title='Total Points Earned by Loyalty Rule'
     )
-    st.plotly_chart(fig_points, use_container_width=True)
+    render_chart(fig_points)
     
     st.markdown("---")
     
@@ -463,7 +541,7 @@ elif page == "Data Summary":
     with tab1:
         st.subheader("Customers Master")
         st.write(f"Total Records: {len(processor.customers_df)}")
-        st.dataframe(processor.customers_df.head(20), use_container_width=True)
+        paginated_table(processor.customers_df, key='summary_customers')
         
         # Customer statistics
         st.subheader("Customer Statistics")
@@ -474,7 +552,7 @@ elif page == "Data Summary":
     with tab2:
         st.subheader("Products Master")
         st.write(f"Total Products: {len(processor.products_df)}")
-        st.dataframe(processor.products_df.head(20), use_container_width=True)
+        paginated_table(processor.products_df, key='summary_products')
         
         # Product statistics
         st.subheader("Product Statistics")
@@ -489,7 +567,7 @@ elif page == "Data Summary":
     with tab4:
         st.subheader("Sales Header")
         st.write(f"Total Transactions: {len(processor.sales_header_df)}")
-        st.dataframe(processor.sales_header_df.head(20), use_container_width=True)
+        paginated_table(processor.sales_header_df, key='summary_sales', sort_by='Date')
         
         # Sales statistics
         st.subheader("Sales Statistics")
@@ -541,14 +619,7 @@ elif page == "Loyalty Points Engine":
     st.subheader("💰 Loyalty Points Engine")
     st.markdown("Real-time customer balance tracking, dynamic rules, and tier management")
     
-    @st.cache_resource
-    def load_loyalty_engine():
-        engine = LoyaltyPointsEngine()
-        engine.load_loyalty_data()
-        balances = engine.calculate_customer_balances()
-        return engine, balances
-    
-    engine, balances = load_loyalty_engine()
+    engine, balances = engines.get('loyalty')
     
     st.markdown("---")
     st.subheader("📊 Loyalty Metrics Summary")
@@ -564,7 +635,7 @@ elif page == "Loyalty Points Engine":
     with col4:
         st.metric("Avg Balance/Customer", f"{balances['Current_Balance'].mean():,.0f}")
     with col5:
-        st.metric("Redemption Rate", f"{(balances['Estimated_Redeemed_Points'].sum() / balances['Total_Points_Earned'].sum() * 100):.1f}%")
+        st.metric("Redemption Rate", f"{(balances['Redeemed_Points'].sum() / balances['Total_Points_Earned'].sum() * 100):.1f}%")
     
     st.markdown("---")
     st.subheader("🏆 Loyalty Tier Distribution")
@@ -590,13 +661,13 @@ elif page == "Loyalty Points Engine":
                 'Bronze': '#CD7F32'
             }
         )
-        st.plotly_chart(fig_tier, use_container_width=True)
+        render_chart(fig_tier)
     
     st.markdown("---")
     st.subheader("👑 Top 15 Loyalty Members")
     
-    top_members = balances.nlargest(15, 'Current_Balance')[
-        ['Cust_ID', 'Total_Points_Earned', 'Estimated_Redeemed_Points', 'Current_Balance', 'Loyalty_Tier', 'Days_As_Member']
+    top_members = engine.get_top_balances(15)[
+        ['Cust_ID', 'Total_Points_Earned', 'Redeemed_Points', 'Current_Balance', 'Loyalty_Tier', 'Days_As_Member']
     ].reset_index(drop=True)
     
     fig_top = go.Figure()
@@ -609,27 +680,76 @@ elif page == "Loyalty Points Engine":
         textposition='auto',
     ))
     fig_top.update_layout(title='Top 15 Customers by Loyalty Balance', xaxis_title='Current Balance', yaxis_title='Customer ID')
-    st.plotly_chart(fig_top, use_container_width=True)
+    render_chart(fig_top)
     
     st.markdown("---")
     st.subheader("📋 Loyalty Member Details")
-    st.dataframe(top_members, use_container_width=True)
+    paginated_table(
+        balances[['Cust_ID', 'Total_Points_Earned', 'Redeemed_Points', 'Current_Balance', 'Loyalty_Tier', 'Days_As_Member']],
+        key='loyalty_members',
+        sort_by='Current_Balance',
+        ascending=False
+    )
+    
+    st.markdown("---")
+    st.subheader("🕒 Balance & Tier History")
+    
+    col1, col2 = st.columns([1, 3])
+    
+    with col1:
+        history_cust = st.selectbox("Customer:", balances['Cust_ID'].sort_values().tolist(), key='tier_history_cust')
+        as_of_date = st.date_input("Balance as of:", value=balances['Last_Purchase_Date'].max().date(), key='tier_history_date')
+        as_of = engine.get_balance_as_of(history_cust, as_of_date)
+        st.metric("Balance", f"{as_of['Balance']:,.2f}")
+        st.metric("Tier", as_of['Loyalty_Tier'])
+    
+    with col2:
+        if engine.points_ledger is None:
+            engine.build_points_ledger()
+        timeline = engine.points_ledger.timeline(history_cust)
+        fig_history = px.line(
+            timeline,
+            x='Date',
+            y='Balance',
+            markers=True,
+            hover_data=['Points_Change', 'Loyalty_Tier'],
+            title=f'Balance History for {history_cust}',
+            line_shape='hv'
+        )
+        render_chart(fig_history)
+
+    st.markdown("---")
+    st.subheader("⏳ Points Expiring in 30 Days")
+    st.caption(f"Points expire {engine.expiry_months} months after they are earned; redemptions use the oldest points first")
+
+    expiry_date = st.date_input("As of:", value=balances['Last_Purchase_Date'].max().date(), key='expiry_as_of')
+    expiry = engine.get_expiring_points(expiry_date, window_days=30)
+    expiring = expiry[expiry['Expiring_Soon'] > 0]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Expiring in 30 Days", f"{expiry['Expiring_Soon'].sum():,.0f}")
+    with col2:
+        st.metric("Members Affected", len(expiring))
+    with col3:
+        st.metric("Expired to Date", f"{expiry['Expired'].sum():,.0f}")
+
+    if len(expiring) > 0:
+        paginated_table(
+            expiring[['Cust_ID', 'Available_Balance', 'Expiring_Soon', 'Next_Expiry_Date']],
+            key='expiring_points',
+            sort_by='Expiring_Soon',
+            ascending=False
+        )
+    else:
+        st.info("No points expire in the next 30 days")
 
 # PAGE 5: DYNAMIC RULES & RECOMMENDATIONS
 elif page == "Dynamic Rules & Recommendations":
     st.subheader("🎯 Dynamic Rules & Smart Recommendations")
     st.markdown("Real-time business rules, product discounts, and personalized customer recommendations")
     
-    from dynamic_rules_engine import DynamicRulesEngine
-    
-    @st.cache_resource
-    def load_dynamic_rules_engine():
-        engine = DynamicRulesEngine()
-        engine.load_data()
-        engine.update_all_dynamic_rules()
-        return engine
-    
-    rules_engine = load_dynamic_rules_engine()
+    rules_engine = engines.get('dynamic_rules')
     
     # Load generated CSV data
     products_dynamic = pd.read_csv('SampleData/products_master_dynamic.csv')
@@ -685,7 +805,7 @@ elif page == "Dynamic Rules & Recommendations":
                 labels={'Discount_Percent': 'Discount %'}
             )
             fig_discount.update_xaxes(tickformat='.0%')
-            st.plotly_chart(fig_discount, use_container_width=True)
+            render_chart(fig_discount)
         
         with col2:
             st.subheader("💵 Savings Analysis")
@@ -698,7 +818,7 @@ elif page == "Dynamic Rules & Recommendations":
                 hover_data=['Base_Price', 'Discounted_Price', 'Discount_Percent'],
                 title='Top 10 Products by Maximum Customer Savings'
             )
-            st.plotly_chart(fig_savings, use_container_width=True)
+            render_chart(fig_savings)
         
         st.markdown("---")
         
@@ -726,7 +846,7 @@ elif page == "Dynamic Rules & Recommendations":
                 hover_data=['Cust_ID'],
                 title='Bonus Points Offered by Loyalty Tier'
             )
-            st.plotly_chart(fig_bonus, use_container_width=True)
+            render_chart(fig_bonus)
         
         with col2:
             st.subheader("💳 Discount Offers Distribution")
@@ -738,7 +858,7 @@ elif page == "Dynamic Rules & Recommendations":
                 title='Discount Offers by Loyalty Tier'
             )
             fig_discount_off.update_yaxes(tickformat='.0%')
-            st.plotly_chart(fig_discount_off, use_container_width=True)
+            render_chart(fig_discount_off)
         
         st.markdown("---")
         
@@ -835,7 +955,7 @@ elif page == "Dynamic Rules & Recommendations":
                 color_continuous_scale='Viridis'
             )
             fig_mult.add_hline(y=1.0, line_dash="dash", line_color="red", annotation_text="Base Multiplier")
-            st.plotly_chart(fig_mult, use_container_width=True)
+            render_chart(fig_mult)
         
         with col2:
             st.subheader("🎁 Earning Potential")
@@ -859,15 +979,7 @@ elif page == "Promotional Effectiveness":
     st.subheader("🎯 Promotional Effectiveness Analysis")
     st.markdown("Track promotional performance across products and stores")
     
-    @st.cache_resource
-    def load_promo_data():
-        engine = LoyaltyPointsEngine()
-        engine.load_loyalty_data()
-        promo_eff = engine.calculate_promo_effectiveness()
-        uplift = engine.calculate_sales_uplift_by_product()
-        return promo_eff, uplift
-    
-    promo_eff, uplift = load_promo_data()
+    promo_eff, uplift = engines.get('promo')
     
     st.markdown("---")
     st.subheader("📈 Promotional Effectiveness by Store")
@@ -898,7 +1010,7 @@ elif page == "Promotional Effectiveness":
         colorscale='RdYlGn'
     ))
     fig_heatmap.update_layout(title='Promotion Effectiveness Score Heatmap (by Store)', xaxis_title='Store ID', yaxis_title='Promotion')
-    st.plotly_chart(fig_heatmap, use_container_width=True)
+    render_chart(fig_heatmap)
     
     st.markdown("---")
     st.subheader("💲 Sales Uplift by Promotion")
@@ -910,7 +1022,7 @@ elif page == "Promotional Effectiveness":
         title='Total Sales Uplift by Promotion',
         labels={'Sales_Uplift': 'Sales Value ($)'}
     )
-    st.plotly_chart(fig_uplift, use_container_width=True)
+    render_chart(fig_uplift)
     
     st.markdown("---")
     st.subheader("📊 Points Activity vs Sales")
@@ -927,11 +1039,11 @@ elif page == "Promotional Effectiveness":
             title='Sales Uplift vs Points Activity',
             labels={'Sales_Uplift': 'Sales ($)', 'Points_Activity': 'Points Earned'}
         )
-        st.plotly_chart(fig_points, use_container_width=True)
+        render_chart(fig_points)
     
     with col2:
         st.subheader("📋 Promo Effectiveness Metrics")
-        st.dataframe(promo_eff.sort_values('Effectiveness_Score', ascending=False), use_container_width=True)
+        paginated_table(promo_eff, key='promo_effectiveness', sort_by='Effectiveness_Score', ascending=False)
     
     st.markdown("---")
     st.subheader("🛍️ Top Products by Promotion Sales")
@@ -944,12 +1056,61 @@ elif page == "Promotional Effectiveness":
         title='Top 10 Products by Promotion Sales',
         labels={'Sales_Value': 'Sales Value ($)'}
     )
-    st.plotly_chart(fig_products, use_container_width=True)
+    render_chart(fig_products)
     
     st.markdown("---")
     st.subheader("📈 Product Details")
     st.dataframe(uplift.head(15), use_container_width=True)
 
+# HIDDEN PAGE: PERFORMANCE
+elif page == "Performance":
+    st.subheader("⏱️ Performance")
+    st.markdown("Timing of DataProcessor, LoyaltyPointsEngine and DynamicRulesEngine calls (most recent calls in a ring buffer)")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        enabled = st.toggle("Record calls", value=instrumentation.is_enabled())
+    with col2:
+        track_memory = st.checkbox("Track peak memory (slower)", value=False)
+    with col3:
+        if st.button("Clear buffer"):
+            instrumentation.clear()
+    
+    if enabled:
+        instrumentation.enable(track_memory=track_memory)
+    else:
+        instrumentation.disable()
+    
+    calls = instrumentation.records_frame()
+    if calls.empty:
+        st.info("No calls recorded yet. Enable recording and open other pages.")
+    else:
+        st.markdown("---")
+        st.subheader("📊 Time by Method")
+        summary = instrumentation.summary_frame()
+        fig_perf = px.bar(
+            summary.head(20),
+            x='total_ms',
+            y='name',
+            orientation='h',
+            title='Total Wall Time by Method (ms)',
+            labels={'total_ms': 'Total (ms)', 'name': 'Method'}
+        )
+        fig_perf.update_layout(yaxis={'categoryorder': 'total ascending'})
+        render_chart(fig_perf)
+        st.dataframe(summary, use_container_width=True)
+        
+        st.markdown("---")
+        st.subheader("📋 Recorded Calls")
+        paginated_table(calls, key='perf_calls', sort_by='timestamp', ascending=False)
+    
+    st.download_button(
+        "⬇️ Export JSON",
+        data=instrumentation.export_json(),
+        file_name=f"performance_{datetime.now().strftime('%Y%m%dT%H%M%S')}.json",
+        mime='application/json'
+    )
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -958,3 +1119,15 @@ st.markdown("""
     <p>Data Source: SampleData folder | Last Updated: {}</p>
     </div>
 """.format(datetime.now().strftime("%Y-%m-%d %H:%M:%S")), unsafe_allow_html=True)
+
+# Warm up the other pages' engines in the background after first paint
+engines.start_warmup()
+ready, total, status = engines.progress()
+with warmup_status.container():
+    if ready < total:
+        st.progress(ready / total, text=f"⏳ Warming up engines: {ready}/{total}")
+    else:
+        st.caption(f"✅ All {total} engines ready")
+    failed = [name for name, state in status.items() if state == 'failed']
+    if failed:
+        st.caption(f"⚠️ Failed to load: {', '.join(failed)}")
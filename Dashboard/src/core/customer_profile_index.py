@@ -0,0 +1,112 @@
+"""
+Customer Profile Index
+Maps each customer code to its row positions in the RFM, balances,
+recommendation and offer tables, so a single customer's profile is
+assembled with dict lookups instead of boolean filtering over full frames
+(date-ordered points history comes from LoyaltyPointsEngine's timelines)
+"""
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+class TablePositions:
+    """
+    Row positions per customer for one table (CSR layout):
+    rows of customer c are order[offsets[c]:offsets[c + 1]]
+    """
+
+    def __init__(self, df, key_col):
+        self.frame = df
+        self.length = len(df)
+        codes, uniques = pd.factorize(df[key_col].to_numpy())
+        known = codes >= 0
+
+        self.codes = {customer: code for code, customer in enumerate(uniques)}
+        self.order = np.flatnonzero(known)[np.argsort(codes[known], kind='stable')]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[known], minlength=len(uniques)))])
+
+    def is_current(self, df):
+        """Same frame object with the same number of rows"""
+        return df is self.frame and len(df) == self.length
+
+    def positions(self, cust_id):
+        code = self.codes.get(cust_id)
+        if code is None:
+            return self.order[:0]
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+
+def csv_source(path):
+    """
+    Source function for an output CSV: re-reads the file only when its
+    modification time changes, so the index sees an unchanged frame otherwise
+    """
+    state = {'mtime': None, 'frame': None}
+
+    def load():
+        if not os.path.exists(path):
+            return None
+        mtime = os.path.getmtime(path)
+        if mtime != state['mtime']:
+            state['frame'] = pd.read_csv(path)
+            state['mtime'] = mtime
+        return state['frame']
+    return load
+
+
+class CustomerProfileIndex:
+    """
+    Customer -> row positions across registered tables
+    - Each table comes from a source function returning the current frame
+      (or None when unavailable)
+    - refresh() re-indexes only tables whose frame was replaced or resized;
+      engines replace their frames when the data changes
+    - profile(cust_id) returns every table's rows for one customer
+    """
+
+    def __init__(self):
+        self.sources = {}
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, source, key_col='Cust_ID'):
+        """Register a table by a zero-argument source function and its customer column"""
+        self.sources[name] = (source, key_col)
+        self.tables.pop(name, None)
+
+    def refresh(self):
+        """Re-index tables whose source frame changed; returns the names re-indexed"""
+        refreshed = []
+        with self._lock:
+            for name, (source, key_col) in self.sources.items():
+                df = source()
+                table = self.tables.get(name)
+                if df is None:
+                    self.tables.pop(name, None)
+                elif table is None or not table.is_current(df):
+                    self.tables[name] = TablePositions(df, key_col)
+                    refreshed.append(name)
+        return refreshed
+
+    def rows(self, name, cust_id):
+        """One table's rows for a customer (empty frame if none)"""
+        table = self.tables.get(name)
+        if table is None:
+            return None
+        return table.frame.iloc[table.positions(cust_id)]
+
+    def profile(self, cust_id):
+        """Every registered table's rows for a customer, after a refresh"""
+        self.refresh()
+        return {name: self.rows(name, cust_id) for name in self.sources}
+
+    def customers(self):
+        """All customer IDs present in any table, sorted"""
+        self.refresh()
+        ids = set()
+        for table in self.tables.values():
+            ids.update(table.codes)
+        return sorted(ids, key=str)
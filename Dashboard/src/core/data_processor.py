@@ -7,13 +7,19 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+from leaderboard import TopKLeaderboard
+from streaming_ingest import StreamingIngestor, rfm_aggregate, store_spend_aggregate, sku_sales_aggregate
+from interaction_matrix import InteractionMatrix, INTERACTION_MATRIX_FILENAME, load_interaction_matrix
+from instrumentation import instrument_class
 
+@instrument_class
 class DataProcessor:
     """Process and analyze retail loyalty data"""
     
-    def __init__(self, data_path="data/input"):
-        """Initialize data processor with path to data files"""
+    def __init__(self, data_path="data/input", output_path="data/output"):
+        """Initialize data processor with paths to data files and derived artifacts"""
         self.data_path = data_path
+        self.output_path = output_path
         
         # Initialize dataframes
         self.customers_df = None
@@ -23,6 +29,20 @@ class DataProcessor:
         self.stores_df = None
         self.loyalty_rules_df = None
         self.rfm_data = None
+        
+        # Maintained aggregates for leaderboard views
+        self.product_sales_df = None
+        self.customer_leaderboard = None
+        self.customer_store_leaderboard = None
+        self.product_leaderboard = None
+        self.product_category_leaderboard = None
+        
+        # Persisted customer x SKU interaction matrix (built on first use)
+        self.interaction_matrix = None
+        self.interaction_matrix_path = os.path.join(output_path, INTERACTION_MATRIX_FILENAME)
+        
+        # Predicted lifetime value per customer (set by the CLV engine)
+        self.customer_value_df = None
     
     def load_all_data(self):
         """Load all required data files"""
@@ -58,44 +78,76 @@ class DataProcessor:
             # Calculate RFM analysis
             self._calculate_rfm()
             
+            # Build top-K leaderboards
+            self._build_leaderboards()
+            
+        except FileNotFoundError as e:
+            print(f"Error loading data: {e}")
+            raise
+    
+    def load_streaming(self, chunk_rows=500_000):
+        """
+        Bounded-memory alternative to load_all_data
+        Sales files are read in chunks and folded into the RFM, store spend and
+        SKU aggregates; the raw sales frames are not kept, so views built on
+        them (sales trend, store/category breakdowns) need load_all_data()
+        """
+        try:
+            self.customers_df = pd.read_csv(f"{self.data_path}/customers_master.csv")
+            if 'Enrollment_Date' in self.customers_df.columns:
+                self.customers_df['Enrollment_Date'] = pd.to_datetime(self.customers_df['Enrollment_Date'])
+            self.products_df = pd.read_csv(f"{self.data_path}/products_master.csv")
+            try:
+                self.stores_df = pd.read_csv(f"{self.data_path}/stores_master.csv")
+            except:
+                self.stores_df = pd.DataFrame()
+            try:
+                self.loyalty_rules_df = pd.read_csv(f"{self.data_path}/loyalty_rules_master.csv")
+            except:
+                self.loyalty_rules_df = pd.DataFrame()
+            
+            results = StreamingIngestor(self.data_path, chunk_rows=chunk_rows).run(
+                header_aggregates={'rfm': rfm_aggregate(), 'store_spend': store_spend_aggregate()},
+                line_aggregates={'sku_sales': sku_sales_aggregate()}
+            )
         except FileNotFoundError as e:
             print(f"Error loading data: {e}")
             raise
+        
+        self._score_rfm(results['rfm'])
+        self._build_leaderboards_from(
+            results['rfm'][['Cust_ID', 'Monetary']].rename(columns={'Monetary': 'Total_Value'}),
+            results['store_spend'],
+            results['sku_sales'].set_index('SKU')
+        )
     
     def _calculate_rfm(self):
         """Calculate RFM (Recency, Frequency, Monetary) analysis"""
+        self._score_rfm(rfm_aggregate().update(self.sales_header_df).result())
+    
+    def _score_rfm(self, customer_rfm):
+        """
+        RFM scores and segments from per-customer aggregates
+        customer_rfm: Cust_ID, Last_Purchase_Date, Frequency, Monetary
+        """
         reference_date = datetime.now()
         
         # Determine correct column names
         cust_col = 'Cust_ID' if 'Cust_ID' in self.customers_df.columns else 'Customer_ID'
         
-        # Create RFM data
-        rfm_data = []
+        # Customers in master order that have purchases
+        customer_ids = pd.Series(self.customers_df[cust_col].unique(), name='Cust_ID')
+        customer_rfm = customer_rfm.merge(customer_ids, on='Cust_ID', how='right').dropna(subset=['Last_Purchase_Date'])
         
-        for customer_id in self.customers_df[cust_col].unique():
-            customer_sales = self.sales_header_df[self.sales_header_df[cust_col] == customer_id]
-            
-            if len(customer_sales) == 0:
-                continue
-            
+        self.rfm_data = pd.DataFrame({
+            'Customer_ID': customer_rfm['Cust_ID'].to_numpy(),
             # Recency: days since last purchase
-            last_purchase = customer_sales['Date'].max()
-            recency = (reference_date - last_purchase).days
-            
+            'Recency': (reference_date - customer_rfm['Last_Purchase_Date']).dt.days.to_numpy(),
             # Frequency: number of purchases
-            frequency = len(customer_sales)
-            
+            'Frequency': customer_rfm['Frequency'].astype('int64').to_numpy(),
             # Monetary: total spend
-            monetary = customer_sales['Total_Value'].sum()
-            
-            rfm_data.append({
-                'Customer_ID': customer_id,
-                'Recency': recency,
-                'Frequency': frequency,
-                'Monetary': monetary
-            })
-        
-        self.rfm_data = pd.DataFrame(rfm_data)
+            'Monetary': customer_rfm['Monetary'].to_numpy()
+        })
         
         if len(self.rfm_data) > 0:
             # Calculate RFM scores (1-5, where 5 is best)
@@ -111,6 +163,134 @@ class DataProcessor:
             
             # Calculate RFM Segment
             self.rfm_data['RFM_Segment'] = self._assign_rfm_segment(self.rfm_data)
+        
+        self._attach_customer_value()
+    
+    def set_customer_value(self, clv_df):
+        """
+        Use predicted lifetime values (Cust_ID, Predicted_CLV, P_Alive,
+        CLV_Tier) alongside the RFM scores for segmentation
+        """
+        self.customer_value_df = clv_df
+        if self.rfm_data is not None:
+            self._attach_customer_value()
+    
+    def _attach_customer_value(self):
+        """Add the predicted CLV columns to rfm_data (NaN for customers not scored)"""
+        if self.customer_value_df is None:
+            return
+        value = self.customer_value_df.set_index('Cust_ID').reindex(self.rfm_data['Customer_ID'])
+        for column in ['Predicted_CLV', 'P_Alive', 'CLV_Tier']:
+            self.rfm_data[column] = value[column].to_numpy()
+    
+    def _build_leaderboards(self, k=50):
+        """Build maintained top-K leaderboards for customers and products"""
+        # Customer spend: overall and per store
+        customer_spend = self.sales_header_df.groupby('Cust_ID', as_index=False)['Total_Value'].sum()
+        store_spend = self.sales_header_df.groupby(['Store_ID', 'Cust_ID'], as_index=False)['Total_Value'].sum()
+        
+        # Product revenue: per-SKU aggregate is small, keep it for incremental updates
+        product_sales = self.sales_line_items_df.groupby('SKU').agg({
+            'Qty': 'sum',
+            'Line_Total': 'sum'
+        })
+        product_sales.columns = ['Units_Sold', 'Revenue']
+        
+        self._build_leaderboards_from(customer_spend, store_spend, product_sales, k=k)
+    
+    def _build_leaderboards_from(self, customer_spend, store_spend, product_sales, k=50):
+        """Leaderboards from customer, store/customer and per-SKU aggregates"""
+        self.customer_leaderboard = TopKLeaderboard.from_frame(customer_spend, 'Cust_ID', 'Total_Value', k=k)
+        self.customer_store_leaderboard = TopKLeaderboard.from_frame(
+            store_spend, 'Cust_ID', 'Total_Value', k=k, group_col='Store_ID'
+        )
+        
+        self.product_sales_df = product_sales
+        product_revenue = self.product_sales_df['Revenue'].reset_index()
+        self.product_leaderboard = TopKLeaderboard.from_frame(product_revenue, 'SKU', 'Revenue', k=k)
+        
+        if 'Category' in self.products_df.columns:
+            product_revenue = product_revenue.merge(self.products_df[['SKU', 'Category']], on='SKU', how='left')
+            self.product_category_leaderboard = TopKLeaderboard.from_frame(
+                product_revenue.dropna(subset=['Category']), 'SKU', 'Revenue', k=k, group_col='Category'
+            )
+    
+    def record_sales(self, new_header_df, new_line_items_df):
+        """
+        Append new tickets and update aggregates incrementally
+        Leaderboards only touch the customers/products in the new tickets
+        Tickets must be numbered above every recorded ticket; otherwise
+        ValueError is raised before anything changes
+        """
+        if self.sales_header_df is not None and len(self.sales_header_df):
+            last_ticket = self.sales_header_df['Ticket_ID'].max()
+            old = new_header_df['Ticket_ID'] <= last_ticket
+            if old.any():
+                raise ValueError(
+                    f"{int(old.sum())} new tickets have a Ticket_ID at or below the last recorded ticket ({last_ticket})"
+                )
+        if 'Date' in new_header_df.columns:
+            new_header_df = new_header_df.assign(Date=pd.to_datetime(new_header_df['Date']))
+        
+        if self.interaction_matrix is not None:
+            self.interaction_matrix.update_from_sales(new_header_df, new_line_items_df)
+            self.interaction_matrix.save(self.interaction_matrix_path)
+        
+        self.sales_header_df = pd.concat([self.sales_header_df, new_header_df], ignore_index=True)
+        self.sales_line_items_df = pd.concat([self.sales_line_items_df, new_line_items_df], ignore_index=True)
+        
+        if self.customer_leaderboard is None:
+            self._build_leaderboards()
+        else:
+            self.customer_leaderboard.increment_many(
+                new_header_df['Cust_ID'].to_numpy(), new_header_df['Total_Value'].to_numpy()
+            )
+            self.customer_store_leaderboard.increment_many(
+                new_header_df['Cust_ID'].to_numpy(), new_header_df['Total_Value'].to_numpy(),
+                groups=new_header_df['Store_ID'].to_numpy()
+            )
+            
+            new_product_sales = new_line_items_df.groupby('SKU').agg({'Qty': 'sum', 'Line_Total': 'sum'})
+            new_product_sales.columns = ['Units_Sold', 'Revenue']
+            self.product_sales_df = self.product_sales_df.add(new_product_sales, fill_value=0)
+            self.product_sales_df['Units_Sold'] = self.product_sales_df['Units_Sold'].astype('int64')
+            
+            self.product_leaderboard.increment_many(
+                new_product_sales.index.to_numpy(), new_product_sales['Revenue'].to_numpy()
+            )
+            if self.product_category_leaderboard is not None:
+                categories = self.products_df.set_index('SKU')['Category'].reindex(new_product_sales.index)
+                known = categories.notna().to_numpy()
+                self.product_category_leaderboard.increment_many(
+                    new_product_sales.index.to_numpy()[known],
+                    new_product_sales['Revenue'].to_numpy()[known],
+                    groups=categories.to_numpy()[known]
+                )
+        
+        # RFM depends on every ticket; rescore so rfm_data is never stale
+        self._calculate_rfm()
+    
+    def get_interaction_matrix(self):
+        """
+        Customer x SKU interaction matrix (qty, spend, last purchase)
+        Loaded from its .npz and brought up to date with tickets it has not
+        seen, from the loaded sales frames or by streaming the sales files;
+        rebuilt if the tickets it was built from have changed since
+        """
+        if self.interaction_matrix is None:
+            if self.sales_header_df is None:
+                self.interaction_matrix = load_interaction_matrix(
+                    self.data_path, self.output_path, self.interaction_matrix_path
+                )
+            else:
+                exists = os.path.exists(self.interaction_matrix_path)
+                matrix = InteractionMatrix.load(self.interaction_matrix_path) if exists else InteractionMatrix()
+                saved_hash = matrix.source_hash
+                touched = matrix.update_from_sales(self.sales_header_df, self.sales_line_items_df, verify=True)
+                if touched > 0 or not exists or matrix.source_hash != saved_hash:
+                    matrix.save(self.interaction_matrix_path)
+                self.interaction_matrix = matrix
+        return self.interaction_matrix
     
     def _assign_rfm_segment(self, rfm_df):
         """Assign customer segments based on RFM scores"""
@@ -208,21 +388,24 @@ class DataProcessor:
         else:
             return pd.DataFrame()
     
-    def get_top_customers(self, limit=10):
-        """Get top customers by spend"""
-        top_customers = self.sales_header_df.groupby('Cust_ID').agg({
-            'Total_Value': 'sum'
-        }).reset_index()
-        top_customers.columns = ['Cust_ID', 'Total_Spend']
+    def get_top_customers(self, limit=10, store_id=None):
+        """Get top customers by spend (optionally within one store)"""
+        if self.customer_leaderboard is None:
+            self._build_leaderboards()
         
-        return top_customers.nlargest(limit, 'Total_Spend')
+        board = self.customer_leaderboard if store_id is None else self.customer_store_leaderboard
+        return board.top_frame(limit, group=store_id, key_col='Cust_ID', value_col='Total_Spend')
     
-    def get_rfm_analysis(self):
-        """Get full RFM analysis"""
+    def get_rfm_analysis(self, copy=True):
+        """
+        Get full RFM analysis
+        copy=False returns the maintained frame itself (replaced whenever
+        sales are recorded) for read-only callers
+        """
         if self.rfm_data is None or len(self.rfm_data) == 0:
             self._calculate_rfm()
         
-        return self.rfm_data.copy()
+        return self.rfm_data.copy() if copy else self.rfm_data
     
     def get_segment_distribution(self):
         """Get distribution of customers by RFM segment"""
@@ -234,20 +417,26 @@ class DataProcessor:
         return segment_dist
     
     def get_at_risk_customers(self):
-        """Get at-risk customers (low recency, high frequency/monetary)"""
+        """
+        Get at-risk customers (low recency, high frequency/monetary), most
+        valuable first: by predicted CLV when available, else by spend
+        """
         if self.rfm_data is None or len(self.rfm_data) == 0:
             self._calculate_rfm()
         
         at_risk = self.rfm_data[self.rfm_data['RFM_Segment'].isin(['At-Risk Customers', 'At-Risk Lost'])]
-        return at_risk.sort_values('Monetary', ascending=False)
+        sort_col = 'Predicted_CLV' if 'Predicted_CLV' in at_risk.columns else 'Monetary'
+        return at_risk.sort_values(sort_col, ascending=False)
     
-    def get_product_performance(self, limit=20):
-        """Get product performance metrics"""
-        product_perf = self.sales_line_items_df.groupby('SKU').agg({
-            'Qty': 'sum',
-            'Line_Total': 'sum'
-        }).reset_index()
-        product_perf.columns = ['SKU', 'Units_Sold', 'Revenue']
+    def get_product_performance(self, limit=20, category=None):
+        """Get product performance metrics (optionally within one category)"""
+        if self.product_leaderboard is None:
+            self._build_leaderboards()
+        
+        board = self.product_leaderboard if category is None else self.product_category_leaderboard
+        top_skus = [sku for sku, _ in board.top(limit, group=category)] if board is not None else []
+        
+        product_perf = self.product_sales_df.loc[top_skus, ['Units_Sold', 'Revenue']].reset_index()
         product_perf['Avg_Price'] = product_perf['Revenue'] / product_perf['Units_Sold']
         
         # Merge with product details
@@ -257,7 +446,7 @@ class DataProcessor:
             how='left'
         )
         
-        return product_perf.nlargest(limit, 'Revenue')
+        return product_perf
     
     def get_loyalty_points_distribution(self):
         """Get loyalty points distribution"""
@@ -0,0 +1,254 @@
+"""
+Customer x SKU Interaction Matrix
+Sparse per customer/SKU quantity, spend and last purchase day with integer
+coded IDs, persisted as .npz and updated incrementally with new tickets, so
+basket, recommendation and churn analytics never re-merge the raw tables.
+A hash of the folded-in line items is kept with it, so replaced or edited
+sales files trigger a rebuild instead of leaving the matrix stale
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from ticket_join import TicketIndex
+from atomic_io import atomic_write_npz
+from streaming_ingest import StreamingIngestor, interaction_aggregate
+
+INTERACTION_MATRIX_FILENAME = 'interaction_matrix.npz'
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+_MATRICES = ['qty', 'spend', 'last_purchase']
+_HASH_MODULUS = 2 ** 64
+
+
+def rows_hash(joined):
+    """
+    Order-independent hash of joined line items (Ticket_ID, Cust_ID, Date,
+    SKU, Qty, Line_Total): the sum of the per-row hashes modulo 2**64, so
+    hashes of chunks or appended tickets add up to the hash of all rows
+    """
+    if len(joined) == 0:
+        return 0
+    columns = pd.DataFrame({
+        'Ticket_ID': joined['Ticket_ID'].to_numpy(dtype='int64'),
+        'Cust_ID': joined['Cust_ID'].astype(str).to_numpy(),
+        'Day': pd.to_datetime(joined['Date']).to_numpy(dtype='datetime64[D]').astype(np.int64),
+        'SKU': joined['SKU'].astype(str).to_numpy(),
+        'Qty': joined['Qty'].to_numpy(dtype='float64'),
+        'Line_Total': joined['Line_Total'].to_numpy(dtype='float64'),
+    })
+    return int(pd.util.hash_pandas_object(columns, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+class InteractionMatrix:
+    """
+    Customer x SKU CSR matrices sharing one pair of ID vocabularies:
+    - qty / spend: units and line totals summed per customer and SKU
+    - last_purchase: last purchase day per pair as days since 1970-01-01
+      plus one, so every purchased pair is a stored entry
+    - customers / skus: code -> ID; new IDs are appended, so existing
+      codes stay valid across incremental updates
+    - last_ticket: highest Ticket_ID folded in; updates skip older tickets
+    - source_hash: rows_hash of the line items folded in; updates that see
+      the complete sales verify it and rebuild from scratch on a mismatch
+    """
+
+    def __init__(self, customers=None, skus=None, qty=None, spend=None, last_purchase=None, last_ticket=-1,
+                 source_hash=0):
+        self.customers = pd.Index([] if customers is None else customers, dtype=object)
+        self.skus = pd.Index([] if skus is None else skus, dtype=object)
+        shape = self.shape
+        self.qty = qty if qty is not None else sparse.csr_matrix(shape, dtype='float64')
+        self.spend = spend if spend is not None else sparse.csr_matrix(shape, dtype='float64')
+        self.last_purchase = last_purchase if last_purchase is not None else sparse.csr_matrix(shape, dtype='int64')
+        self.last_ticket = int(last_ticket)
+        self.source_hash = int(source_hash)
+
+    @property
+    def shape(self):
+        return len(self.customers), len(self.skus)
+
+    @classmethod
+    def from_sales(cls, header_df, line_items_df):
+        """Build from in-memory sales header and line item frames"""
+        matrix = cls()
+        matrix.update_from_sales(header_df, line_items_df)
+        return matrix
+
+    @classmethod
+    def from_files(cls, data_path, chunk_rows=500_000):
+        """Build by streaming the sales files in chunks"""
+        matrix = cls()
+        matrix.update_from_files(data_path, chunk_rows)
+        return matrix
+
+    def version(self):
+        """last_ticket and source_hash as an int64 array, for fingerprints of derived models"""
+        return np.array([self.last_ticket, self.source_hash >> 1], dtype=np.int64)
+
+    def reset(self):
+        """Drop everything folded in so far"""
+        self.__init__()
+
+    def update_from_sales(self, header_df, line_items_df, verify=False):
+        """
+        Fold in tickets newer than last_ticket; returns the number of pairs touched
+        verify: the frames hold all sales (not just new tickets), so the
+        tickets already folded in are checked against source_hash and the
+        matrices are rebuilt from every ticket if they no longer match
+        Without verify the frames must hold only new tickets; a ticket at or
+        below last_ticket raises ValueError rather than being skipped
+        """
+        header = header_df[['Ticket_ID', 'Cust_ID', 'Date']]
+        if not verify:
+            old = header['Ticket_ID'].to_numpy() <= self.last_ticket
+            if old.any():
+                raise ValueError(
+                    f"{int(old.sum())} new tickets have a Ticket_ID at or below the last ticket "
+                    f"in the interaction matrix ({self.last_ticket})"
+                )
+        header = header.assign(Date=pd.to_datetime(header['Date']))
+        joined = TicketIndex(header).attach(line_items_df, ['Cust_ID', 'Date'])
+
+        new = joined['Ticket_ID'].to_numpy() > self.last_ticket
+        if verify and rows_hash(joined[~new]) != self.source_hash:
+            self.reset()
+            new = np.ones(len(joined), dtype=bool)
+        joined = joined[new]
+        self.source_hash = (self.source_hash + rows_hash(joined)) % _HASH_MODULUS
+        return self.update(interaction_aggregate().update(joined).result())
+
+    def update_from_files(self, data_path, chunk_rows=500_000):
+        """
+        Fold in tickets newer than last_ticket from the sales files; returns
+        the number of pairs touched. The older tickets streamed past are
+        checked against source_hash; on a mismatch the matrices are rebuilt
+        with a second pass over the files
+        """
+        last_ticket = self.last_ticket
+        hashes = {'seen': 0, 'new': 0}
+
+        def prepare(chunk):
+            new = chunk['Ticket_ID'].to_numpy() > last_ticket
+            hashes['seen'] = (hashes['seen'] + rows_hash(chunk[~new])) % _HASH_MODULUS
+            hashes['new'] = (hashes['new'] + rows_hash(chunk[new])) % _HASH_MODULUS
+            return chunk[new]
+
+        results = StreamingIngestor(data_path, chunk_rows=chunk_rows).run(
+            line_aggregates={'pairs': interaction_aggregate()},
+            prepare=prepare
+        )
+        if hashes['seen'] != self.source_hash:
+            self.reset()
+            return self.update_from_files(data_path, chunk_rows)
+        self.source_hash = (self.source_hash + hashes['new']) % _HASH_MODULUS
+        return self.update(results['pairs'])
+
+    @staticmethod
+    def _extend(index, values):
+        unique = pd.Index(pd.unique(np.asarray(values)), dtype=object)
+        return index.append(unique[~unique.isin(index)])
+
+    @staticmethod
+    def _resized(matrix, shape):
+        matrix = matrix.copy()
+        matrix.resize(shape)
+        return matrix
+
+    def update(self, pairs):
+        """
+        Fold per customer/SKU aggregates into the matrices
+        pairs: Cust_ID, SKU, Qty, Spend, Last_Purchase_Date, Last_Ticket_ID
+        Returns the number of pairs folded in
+        """
+        if len(pairs) == 0:
+            return 0
+
+        self.customers = self._extend(self.customers, pairs['Cust_ID'])
+        self.skus = self._extend(self.skus, pairs['SKU'])
+        shape = self.shape
+        rows = self.customers.get_indexer(pairs['Cust_ID'])
+        cols = self.skus.get_indexer(pairs['SKU'])
+
+        def delta(values):
+            return sparse.csr_matrix((values, (rows, cols)), shape=shape)
+
+        days = (pd.to_datetime(pairs['Last_Purchase_Date']).to_numpy(dtype='datetime64[D]') - _EPOCH).astype(np.int64) + 1
+        self.qty = (self._resized(self.qty, shape) + delta(pairs['Qty'].to_numpy(dtype='float64'))).tocsr()
+        self.spend = (self._resized(self.spend, shape) + delta(pairs['Spend'].to_numpy(dtype='float64'))).tocsr()
+        self.last_purchase = self._resized(self.last_purchase, shape).maximum(delta(days)).tocsr()
+        self.last_ticket = max(self.last_ticket, int(pairs['Last_Ticket_ID'].max()))
+        return len(pairs)
+
+    def customer_codes(self, cust_ids):
+        """Row codes of customers (-1 if unknown)"""
+        return self.customers.get_indexer(np.asarray(cust_ids))
+
+    def sku_codes(self, skus):
+        """Column codes of SKUs (-1 if unknown)"""
+        return self.skus.get_indexer(np.asarray(skus))
+
+    def purchased(self):
+        """0/1 matrix of customer/SKU pairs ever bought"""
+        bought = self.last_purchase.copy()
+        bought.data = np.ones(len(bought.data))
+        return bought
+
+    def customer_items(self, cust_id):
+        """One customer's SKUs with quantity, spend and last purchase date"""
+        code = self.customer_codes([cust_id])[0]
+        if code < 0:
+            return pd.DataFrame(columns=['SKU', 'Qty', 'Spend', 'Last_Purchase_Date'])
+        row = self.last_purchase[code]
+        return pd.DataFrame({
+            'SKU': self.skus.to_numpy()[row.indices],
+            'Qty': self.qty[code, row.indices].toarray().ravel(),
+            'Spend': self.spend[code, row.indices].toarray().ravel(),
+            'Last_Purchase_Date': _EPOCH + (row.data - 1).astype('timedelta64[D]')
+        })
+
+    def save(self, path):
+        """Persist matrices, vocabularies, last_ticket and source_hash as .npz (atomic replace)"""
+        arrays = {
+            'customers': self.customers.to_numpy().astype(str),
+            'skus': self.skus.to_numpy().astype(str),
+            'last_ticket': np.array(self.last_ticket),
+            'source_hash': np.array(self.source_hash, dtype=np.uint64),
+        }
+        for name in _MATRICES:
+            matrix = getattr(self, name)
+            arrays[f'{name}_data'] = matrix.data
+            arrays[f'{name}_indices'] = matrix.indices
+            arrays[f'{name}_indptr'] = matrix.indptr
+        return atomic_write_npz(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load a persisted matrix; archives saved without source_hash fail verification and get rebuilt"""
+        with np.load(path, allow_pickle=False) as archive:
+            customers, skus = archive['customers'].astype(object), archive['skus'].astype(object)
+            shape = (len(customers), len(skus))
+            matrices = {
+                name: sparse.csr_matrix(
+                    (archive[f'{name}_data'], archive[f'{name}_indices'], archive[f'{name}_indptr']), shape=shape
+                )
+                for name in _MATRICES
+            }
+            source_hash = int(archive['source_hash']) if 'source_hash' in archive.files else -1
+            return cls(customers, skus, last_ticket=int(archive['last_ticket']), source_hash=source_hash, **matrices)
+
+
+def load_interaction_matrix(data_path, output_path='data/output', path=None, chunk_rows=500_000):
+    """
+    Persisted interaction matrix brought up to date with the sales files:
+    loads the .npz from output_path if present, folds in any newer tickets
+    (rebuilding if the older ones changed) and saves it back when changed
+    """
+    path = path or os.path.join(output_path, INTERACTION_MATRIX_FILENAME)
+    exists = os.path.exists(path)
+    matrix = InteractionMatrix.load(path) if exists else InteractionMatrix()
+    saved_hash = matrix.source_hash
+    if matrix.update_from_files(data_path, chunk_rows) > 0 or not exists or matrix.source_hash != saved_hash:
+        matrix.save(path)
+    return matrix
@@ -8,7 +8,38 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 import json
+from ticket_join import TicketIndex
+from leaderboard import TopKLeaderboard
+from atomic_io import atomic_write_csv, file_lock, locked_append_csv
+from points_history import PointsHistoryBuilder, CustomerTimelines, HISTORY_COLUMNS
+from points_ledger import PointsLedger
+from points_events import (
+    load_redemptions, empty_redemptions, next_redemption_ids, build_point_events, net_points_by_customer
+)
+from points_expiry import PointsExpiry
+from promotion_calendar import load_promotion_calendar
+from rule_simulation import ScenarioReplay
+from streaming_ingest import StreamingIngestor, rfm_aggregate, customer_points_aggregate, promo_metrics_aggregate
+from instrumentation import instrument_class
 
+LOYALTY_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'loyalty_config.json')
+
+DEFAULT_TIER_THRESHOLDS = [
+    ('Bronze', 0),
+    ('Silver', 1000),
+    ('Gold', 3000),
+    ('Platinum', 5000),
+]
+
+DEFAULT_EXPIRY_MONTHS = 12
+
+# (minimum quantity, points multiplier) per line item
+DEFAULT_QUANTITY_BONUSES = [
+    (5, 1.25),
+    (10, 1.5),
+]
+
+@instrument_class
 class LoyaltyPointsEngine:
     """
     Comprehensive loyalty points engine with:
@@ -19,8 +50,15 @@ class LoyaltyPointsEngine:
     - Customer balance history
     """
     
-    def __init__(self, data_path="SampleData"):
+    def __init__(self, data_path="SampleData", tier_thresholds=None, config_path=LOYALTY_CONFIG_PATH,
+                 output_path="data/output"):
         self.data_path = data_path
+        self.output_path = output_path
+        self.config_path = config_path
+        self.config = self._load_config()
+        self.tier_names, self.tier_minimums = self._load_tier_thresholds(tier_thresholds)
+        self.expiry_months = int(self.config.get('points_expiry_months', DEFAULT_EXPIRY_MONTHS))
+        self.quantity_bonuses = self._load_quantity_bonuses()
         self.loyalty_rules_df = None
         self.sales_header_df = None
         self.sales_line_items_df = None
@@ -28,7 +66,70 @@ class LoyaltyPointsEngine:
         self.customer_balances_df = None
         self.points_history_df = None
         self.promo_effectiveness_df = None
-        
+        self._ticket_index = None
+        self.balance_leaderboard = None
+        # Sales date Days_As_Member is measured to
+        self.balances_as_of = None
+        self.history_builder = PointsHistoryBuilder()
+        self.customer_timelines = None
+        self.points_ledger = None
+        self.tier_changes_df = None
+        self.redemptions_df = empty_redemptions()
+        self.point_events_df = None
+        self.points_expiry = None
+        self.promotion_calendar = None
+        self._scenario_replay = None
+        
+    def _load_config(self):
+        """Program settings from config/loyalty_config.json (empty if unavailable)"""
+        try:
+            with open(self.config_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Using default loyalty settings: {e}")
+            return {}
+    
+    def _load_tier_thresholds(self, tier_thresholds=None):
+        """
+        Tier names and minimum balances, ascending
+        Taken from the argument, else config/loyalty_config.json, else the defaults
+        """
+        if tier_thresholds is None:
+            tier_thresholds = DEFAULT_TIER_THRESHOLDS
+            try:
+                tiers = self.config.get('tiers', [])
+                if tiers:
+                    tier_thresholds = [(tier['name'], tier['min_points']) for tier in tiers]
+            except (KeyError, TypeError) as e:
+                print(f"Using default loyalty tiers: {e}")
+        
+        tier_thresholds = sorted(tier_thresholds, key=lambda tier: tier[1])
+        names = np.array([name for name, _ in tier_thresholds], dtype=object)
+        minimums = np.array([minimum for _, minimum in tier_thresholds], dtype='float64')
+        return names, minimums
+    
+    def _load_quantity_bonuses(self):
+        """Quantity bonus tiers from config (minimum quantity -> multiplier), ascending"""
+        bonuses = DEFAULT_QUANTITY_BONUSES
+        try:
+            configured = self.config.get('quantity_bonuses', [])
+            if configured:
+                bonuses = [(bonus['min_qty'], bonus['multiplier']) for bonus in configured]
+        except (KeyError, TypeError) as e:
+            print(f"Using default quantity bonuses: {e}")
+        return sorted(bonuses)
+    
+    @staticmethod
+    def quantity_multipliers(quantity, quantity_bonuses):
+        """Vectorized quantity bonus: multiplier of the highest tier reached, else 1.0"""
+        quantity = np.asarray(quantity, dtype='float64')
+        if not quantity_bonuses:
+            return np.ones(len(quantity))
+        thresholds = np.array([min_qty for min_qty, _ in quantity_bonuses], dtype='float64')
+        multipliers = np.array([multiplier for _, multiplier in quantity_bonuses], dtype='float64')
+        positions = np.searchsorted(thresholds, quantity, side='right') - 1
+        return np.where(positions >= 0, multipliers[np.maximum(positions, 0)], 1.0)
+    
     def load_loyalty_data(self):
         """Load all loyalty-related data"""
         try:
@@ -36,6 +137,7 @@ class LoyaltyPointsEngine:
             self.sales_header_df = pd.read_csv(os.path.join(self.data_path, 'sales_header.csv'))
             self.sales_line_items_df = pd.read_csv(os.path.join(self.data_path, 'sales_line_items.csv'))
             self.customers_df = pd.read_csv(os.path.join(self.data_path, 'customers_master.csv'))
+            self.redemptions_df = load_redemptions(os.path.join(self.data_path, 'points_redemptions.csv'))
             
             # Convert dates
             self.sales_header_df['Date'] = pd.to_datetime(self.sales_header_df['Date'])
@@ -46,6 +148,49 @@ class LoyaltyPointsEngine:
             print(f"Error loading loyalty data: {e}")
             return False
     
+    def load_streaming(self, chunk_rows=500_000):
+        """
+        Bounded-memory alternative to load_loyalty_data + balance/promo calculation
+        Sales files are streamed in chunks into mergeable per-customer and
+        per-rule/store aggregates; the raw sales frames are not kept, so
+        history, ledger and scenario features need load_loyalty_data()
+        """
+        try:
+            self.loyalty_rules_df = pd.read_csv(os.path.join(self.data_path, 'loyalty_rules_master.csv'))
+            self.customers_df = pd.read_csv(os.path.join(self.data_path, 'customers_master.csv'))
+            self.customers_df['Enrollment_Date'] = pd.to_datetime(self.customers_df['Enrollment_Date'])
+            self.redemptions_df = load_redemptions(os.path.join(self.data_path, 'points_redemptions.csv'))
+        except Exception as e:
+            print(f"Error loading loyalty data: {e}")
+            return False
+        
+        rules = self.loyalty_rules_df[['Rule_ID', 'Rule_Name', 'Multiplier']]
+        
+        def score(chunk):
+            chunk = chunk.merge(rules, on='Rule_ID')
+            chunk['Points_Earned'] = self.calculate_points_vectorized(chunk)
+            return chunk
+        
+        results = StreamingIngestor(self.data_path, chunk_rows=chunk_rows).run(
+            header_aggregates={'rfm': rfm_aggregate()},
+            line_aggregates={'customers': customer_points_aggregate(), 'promos': promo_metrics_aggregate()},
+            prepare=score
+        )
+        
+        latest_date = results['rfm']['Last_Purchase_Date'].max()
+        self._finalize_customer_balances(results['customers'], latest_date)
+        self._finalize_promo_metrics(results['promos'].rename(columns={'Rule_Name': 'Promotion'}))
+        return True
+    
+    def _join_sales_header(self, columns):
+        """
+        Attach sales header columns to line items on Ticket_ID
+        Uses a cached positional ticket index instead of a hash join
+        """
+        if self._ticket_index is None or not self._ticket_index.is_current(self.sales_header_df):
+            self._ticket_index = TicketIndex(self.sales_header_df)
+        return self._ticket_index.attach(self.sales_line_items_df, columns)
+    
     def calculate_dynamic_points(self, quantity, line_total, rule_id, category=None, is_promotion=False, promo_multiplier=1.0):
         """
         Calculate points with dynamic rules
@@ -54,7 +199,7 @@ class LoyaltyPointsEngine:
         - Base: 1 point per $1 spent
         - Category multipliers (Health=2x, Premium=1.5x)
         - Promotional boosts
-        - Quantity bonuses (10+ items = +0.5x)
+        - Quantity bonuses (configurable; default 5+ items = 1.25x, 10+ items = 1.5x)
         """
         
         # Get rule multiplier
@@ -70,56 +215,68 @@ class LoyaltyPointsEngine:
         # Apply promotional multiplier
         promo_points = rule_points * promo_multiplier
         
-        # Quantity bonus (10+ items = 1.5x)
-        if quantity >= 10:
-            quantity_multiplier = 1.5
-        elif quantity >= 5:
-            quantity_multiplier = 1.25
-        else:
-            quantity_multiplier = 1.0
+        # Quantity bonus
+        quantity_multiplier = float(self.quantity_multipliers([quantity], self.quantity_bonuses)[0])
         
         final_points = promo_points * quantity_multiplier
         
         return round(final_points, 2)
     
+    def calculate_points_vectorized(self, transactions, promo_multiplier=1.0):
+        """
+        Vectorized equivalent of calculate_dynamic_points over a transactions frame
+        Expects Qty, Line_Total and Multiplier (rule multiplier) columns
+        """
+        quantity_multiplier = self.quantity_multipliers(transactions['Qty'].to_numpy(), self.quantity_bonuses)
+        points = (
+            transactions['Line_Total'].to_numpy()
+            * transactions['Multiplier'].to_numpy()
+            * promo_multiplier
+            * quantity_multiplier
+        )
+        return np.round(points, 2)
+    
     def calculate_customer_balances(self):
         """
         Calculate real-time customer loyalty point balances
         Includes: earned points, redeemed points, current balance
         """
         
-        # Merge to get all transaction details with rules
-        transactions = self.sales_line_items_df.merge(
-            self.sales_header_df[['Ticket_ID', 'Cust_ID', 'Date', 'Store_ID']], 
-            on='Ticket_ID'
-        )
-        
-        transactions = transactions.merge(
-            self.loyalty_rules_df[['Rule_ID', 'Multiplier']], 
-            on='Rule_ID'
-        )
+        # Scored line items per customer (shared with the history views)
+        history = self.get_points_history()
         
-        # Calculate points for each transaction
-        transactions['Calculated_Points'] = transactions.apply(
-            lambda row: self.calculate_dynamic_points(
-                quantity=row['Qty'],
-                line_total=row['Line_Total'],
-                rule_id=row['Rule_ID'],
-                is_promotion=False,
-                promo_multiplier=1.0
-            ),
-            axis=1
-        )
+        # Earned and redeemed points netted in one pass over the signed event stream
+        events = self.get_point_events()
+        points = net_points_by_customer(events['Cust_ID'], events['Points'])
         
         # Aggregate by customer
-        customer_points = transactions.groupby('Cust_ID').agg({
-            'Calculated_Points': 'sum',
-            'Ticket_ID': 'count',
-            'Date': 'max',
-            'Line_Total': 'sum'
-        }).reset_index()
+        customer_points = history.groupby('Cust_ID').agg(
+            Transaction_Count=('Ticket_ID', 'count'),
+            Last_Purchase_Date=('Date', 'max'),
+            Total_Spent=('Line_Total', 'sum')
+        )
+        customer_points['Total_Points_Earned'] = points['Earned'].reindex(customer_points.index).round(2)
+        customer_points['Redeemed_Points'] = points['Redeemed'].reindex(customer_points.index).round(2)
+        customer_points = customer_points.reset_index()[[
+            'Cust_ID', 'Total_Points_Earned', 'Transaction_Count', 'Last_Purchase_Date', 'Total_Spent', 'Redeemed_Points'
+        ]]
         
-        customer_points.columns = ['Cust_ID', 'Total_Points_Earned', 'Transaction_Count', 'Last_Purchase_Date', 'Total_Spent']
+        return self._finalize_customer_balances(customer_points, self.sales_header_df['Date'].max())
+    
+    def _finalize_customer_balances(self, customer_points, latest_date):
+        """Balance rows for every customer, stored with a fresh leaderboard"""
+        customer_points = self._balance_rows(customer_points, latest_date)
+        self.customer_balances_df = customer_points
+        self.balances_as_of = latest_date
+        self.balance_leaderboard = TopKLeaderboard.from_frame(customer_points, 'Cust_ID', 'Current_Balance')
+        return customer_points
+    
+    def _balance_rows(self, customer_points, latest_date):
+        """
+        Membership, redemptions and tiers on top of per-customer earned points
+        Redeemed_Points is netted from the recorded redemptions when the
+        aggregates do not carry it (streaming loads)
+        """
         
         # Add membership info
         customer_points = customer_points.merge(
@@ -129,38 +286,163 @@ class LoyaltyPointsEngine:
         )
         
         # Calculate membership duration
-        latest_date = self.sales_header_df['Date'].max()
         customer_points['Days_As_Member'] = (latest_date - customer_points['Enrollment_Date']).dt.days
         
-        # Estimate redeemed points (assume 20% of earned are redeemed for purchases)
-        customer_points['Estimated_Redeemed_Points'] = (customer_points['Total_Points_Earned'] * 0.2).round(2)
-        customer_points['Current_Balance'] = (customer_points['Total_Points_Earned'] - customer_points['Estimated_Redeemed_Points']).round(2)
+        if 'Redeemed_Points' not in customer_points.columns:
+            redeemed = net_points_by_customer(
+                self.redemptions_df['Cust_ID'],
+                -self.redemptions_df['Points_Redeemed'].to_numpy(),
+                customers=customer_points['Cust_ID']
+            )
+            customer_points['Redeemed_Points'] = redeemed['Redeemed'].round(2).to_numpy()
+        # Keep Redeemed_Points next to the balance it is netted from
+        customer_points['Redeemed_Points'] = customer_points.pop('Redeemed_Points')
+        customer_points['Current_Balance'] = (customer_points['Total_Points_Earned'] - customer_points['Redeemed_Points']).round(2)
         
         # Determine loyalty tier based on balance
-        customer_points['Loyalty_Tier'] = customer_points['Current_Balance'].apply(self._assign_loyalty_tier)
-        
-        self.customer_balances_df = customer_points
+        customer_points['Loyalty_Tier'] = self.assign_loyalty_tiers(customer_points['Current_Balance'])
         return customer_points
     
+    def get_top_balances(self, limit=15):
+        """Get the top customers by current balance from the maintained leaderboard"""
+        if self.balance_leaderboard is None:
+            self.calculate_customer_balances()
+        
+        top_ids = [cust_id for cust_id, _ in self.balance_leaderboard.top(limit)]
+        balances = self.customer_balances_df.set_index('Cust_ID')
+        return balances.loc[top_ids].reset_index()
+    
+    def apply_balance_changes(self, cust_ids, point_deltas):
+        """
+        Apply point changes (accruals or adjustments) to existing balances
+        Only the affected customers and their leaderboard entries are updated
+        """
+        if self.customer_balances_df is None:
+            self.calculate_customer_balances()
+        
+        deltas = pd.Series(point_deltas, index=cust_ids).groupby(level=0).sum()
+        balances = self.customer_balances_df.set_index('Cust_ID')
+        deltas = deltas[deltas.index.isin(balances.index)]
+        
+        balances.loc[deltas.index, 'Current_Balance'] = (balances.loc[deltas.index, 'Current_Balance'] + deltas).round(2)
+        balances.loc[deltas.index, 'Loyalty_Tier'] = self.assign_loyalty_tiers(balances.loc[deltas.index, 'Current_Balance'])
+        self.customer_balances_df = balances.reset_index()
+        
+        for cust_id, balance in balances.loc[deltas.index, 'Current_Balance'].items():
+            self.balance_leaderboard.set(cust_id, balance)
+        return self.customer_balances_df
+    
+    def record_redemptions(self, new_redemptions_df):
+        """
+        Record new redemption events and update the affected balances
+        Only the redeeming customers are touched; ledger and event log are rebuilt lazily
+        """
+        if self.customer_balances_df is None:
+            self.calculate_customer_balances()
+        
+        new_redemptions_df = new_redemptions_df.assign(Date=pd.to_datetime(new_redemptions_df['Date']))
+        self._check_redeemable(new_redemptions_df)
+        if 'Redemption_ID' not in new_redemptions_df.columns:
+            new_redemptions_df['Redemption_ID'] = next_redemption_ids(
+                self.redemptions_df['Redemption_ID'], len(new_redemptions_df)
+            )
+        new_redemptions_df = new_redemptions_df[self.redemptions_df.columns]
+        frames = [df for df in [self.redemptions_df, new_redemptions_df] if len(df) > 0]
+        if frames:
+            self.redemptions_df = pd.concat(frames, ignore_index=True)
+        
+        redeemed = new_redemptions_df.groupby('Cust_ID')['Points_Redeemed'].sum()
+        balances = self.customer_balances_df.set_index('Cust_ID')
+        redeemed = redeemed[redeemed.index.isin(balances.index)]
+        balances.loc[redeemed.index, 'Redeemed_Points'] = (balances.loc[redeemed.index, 'Redeemed_Points'] + redeemed).round(2)
+        self.customer_balances_df = balances.reset_index()
+        
+        self.point_events_df = None
+        self.points_ledger = None
+        self.points_expiry = None
+        return self.apply_balance_changes(redeemed.index, -redeemed.to_numpy())
+    
+    def append_redemptions(self, new_redemptions_df, csv_path):
+        """
+        Record new redemptions and append them to the redemptions CSV
+        IDs are numbered after the highest one in memory or on file while the
+        file's lock is held, so concurrent sessions never write the same ID
+        """
+        new_redemptions_df = new_redemptions_df.assign(Date=pd.to_datetime(new_redemptions_df['Date']))
+        self._check_redeemable(new_redemptions_df)
+        with file_lock(csv_path):
+            existing_ids = pd.concat([load_redemptions(csv_path)['Redemption_ID'], self.redemptions_df['Redemption_ID']])
+            new_redemptions_df['Redemption_ID'] = next_redemption_ids(existing_ids, len(new_redemptions_df))
+            locked_append_csv(new_redemptions_df[self.redemptions_df.columns], csv_path, header=True)
+        return self.record_redemptions(new_redemptions_df)
+    
+    def redeemable_points(self, cust_id, as_of):
+        """
+        Points a customer can redeem on a date: the lowest balance they hold
+        from the end of that date on, so a back-dated redemption never leaves
+        a later balance negative (the FIFO expiry buckets assume it cannot)
+        """
+        if self.points_ledger is None:
+            self.build_points_ledger()
+        return max(self.points_ledger.min_balance_from(cust_id, as_of), 0.0)
+    
+    def _check_redeemable(self, new_redemptions_df):
+        """Raise ValueError if a customer's new redemptions exceed what they can redeem from the earliest one's date"""
+        requested = new_redemptions_df.groupby('Cust_ID').agg(
+            Points_Redeemed=('Points_Redeemed', 'sum'), Date=('Date', 'min')
+        )
+        for cust_id, row in requested.iterrows():
+            available = self.redeemable_points(cust_id, row['Date'])
+            if row['Points_Redeemed'] > available + 0.005:
+                raise ValueError(
+                    f"{cust_id} can redeem at most {available:,.2f} points on {row['Date'].date()}"
+                )
+    
     def _assign_loyalty_tier(self, points):
         """Assign loyalty tier based on points"""
-        if points >= 5000:
-            return 'Platinum'
-        elif points >= 3000:
-            return 'Gold'
-        elif points >= 1000:
-            return 'Silver'
-        else:
-            return 'Bronze'
+        return self.assign_loyalty_tiers([points])[0]
+    
+    def assign_loyalty_tiers(self, balances):
+        """
+        Vectorized tier assignment: one searchsorted over the tier minimums
+        Balances below the lowest minimum (or missing) get the lowest tier
+        """
+        balances = np.nan_to_num(np.asarray(balances, dtype='float64'), nan=-np.inf)
+        positions = np.searchsorted(self.tier_minimums, balances, side='right') - 1
+        return self.tier_names[np.clip(positions, 0, len(self.tier_names) - 1)]
+    
+    def detect_tier_changes(self, previous_df, current_df=None):
+        """
+        Customers whose tier moved between two balance runs
+        previous_df holds the earlier run's Cust_ID and Loyalty_Tier (customers
+        without a previous tier are reported as new); current_df defaults to
+        the in-memory balances
+        """
+        if current_df is None:
+            current_df = self.customer_balances_df
+        
+        changes = current_df[['Cust_ID', 'Loyalty_Tier', 'Current_Balance']].merge(
+            previous_df[['Cust_ID', 'Loyalty_Tier']].rename(columns={'Loyalty_Tier': 'Previous_Tier'}),
+            on='Cust_ID',
+            how='left'
+        )
+        changes = changes[changes['Loyalty_Tier'] != changes['Previous_Tier']]
+        
+        # Rank tiers by position in the threshold list to tell upgrades from downgrades
+        tier_rank = pd.Series(np.arange(len(self.tier_names)), index=self.tier_names)
+        delta = changes['Loyalty_Tier'].map(tier_rank) - changes['Previous_Tier'].map(tier_rank)
+        changes['Direction'] = np.select(
+            [changes['Previous_Tier'].isna(), delta > 0, delta < 0],
+            ['New', 'Upgrade', 'Downgrade'],
+            default='Changed'
+        )
+        return changes[['Cust_ID', 'Previous_Tier', 'Loyalty_Tier', 'Current_Balance', 'Direction']].reset_index(drop=True)
     
     def calculate_points_history(self):
         """Track points accrual over time"""
         
         # Merge all necessary data
-        transactions = self.sales_line_items_df.merge(
-            self.sales_header_df[['Ticket_ID', 'Cust_ID', 'Date']], 
-            on='Ticket_ID'
-        )
+        transactions = self._join_sales_header(['Ticket_ID', 'Cust_ID', 'Date'])
         
         transactions = transactions.merge(
             self.loyalty_rules_df[['Rule_ID', 'Multiplier', 'Rule_Name']], 
@@ -168,14 +450,7 @@ class LoyaltyPointsEngine:
         )
         
         # Calculate points
-        transactions['Points_Earned'] = transactions.apply(
-            lambda row: self.calculate_dynamic_points(
-                quantity=row['Qty'],
-                line_total=row['Line_Total'],
-                rule_id=row['Rule_ID']
-            ),
-            axis=1
-        )
+        transactions['Points_Earned'] = self.calculate_points_vectorized(transactions)
         
         # Sort by date
         transactions = transactions.sort_values(['Cust_ID', 'Date'])
@@ -184,22 +459,365 @@ class LoyaltyPointsEngine:
         transactions['Cumulative_Points'] = transactions.groupby('Cust_ID')['Points_Earned'].cumsum()
         
         # Select relevant columns
-        history = transactions[[
-            'Cust_ID', 'Ticket_ID', 'Date', 'Rule_Name', 'Qty', 
-            'Line_Total', 'Points_Earned', 'Cumulative_Points'
-        ]].reset_index(drop=True)
+        history = transactions[HISTORY_COLUMNS].reset_index(drop=True)
+        
+        # Seed the incremental builder with each customer's last cumulative total
+        self.history_builder.initialize(history)
+        self.customer_timelines = None
         
         self.points_history_df = history
         return history
     
+    def append_points_history(self, new_header_df, new_line_items_df):
+        """
+        Append new tickets to the points history incrementally
+        Only the new rows are joined, scored and sorted; cumulative totals
+        continue from each customer's stored state (customers with
+        back-dated tickets are re-accumulated in date order)
+        """
+        if self.points_history_df is None:
+            self.calculate_points_history()
+        
+        new_header_df = new_header_df.assign(Date=pd.to_datetime(new_header_df['Date']))
+        transactions = TicketIndex(new_header_df).attach(new_line_items_df, ['Ticket_ID', 'Cust_ID', 'Date'])
+        transactions = transactions.merge(
+            self.loyalty_rules_df[['Rule_ID', 'Multiplier', 'Rule_Name']], 
+            on='Rule_ID'
+        )
+        transactions['Points_Earned'] = self.calculate_points_vectorized(transactions)
+        
+        new_rows = self.history_builder.append(transactions)
+        if self.customer_timelines is not None:
+            self.customer_timelines = self.customer_timelines.merged(
+                self.history_builder.last_batch, self.history_builder.last_replaced
+            )
+        self.points_history_df = None
+        self.point_events_df = None
+        self.points_ledger = None
+        self.points_expiry = None
+        return new_rows
+    
+    def record_sales(self, new_header_df, new_line_items_df):
+        """
+        Record new tickets: the points history is appended incrementally and
+        only the new rows' points are netted into the stored balances
+        """
+        new_header_df = new_header_df.assign(Date=pd.to_datetime(new_header_df['Date']))
+        had_balances = self.customer_balances_df is not None
+        new_rows = self.append_points_history(new_header_df, new_line_items_df)
+        self.sales_header_df = pd.concat([self.sales_header_df, new_header_df], ignore_index=True)
+        self.sales_line_items_df = pd.concat([self.sales_line_items_df, new_line_items_df], ignore_index=True)
+        self._scenario_replay = None
+        if had_balances:
+            self._record_earnings(new_rows, new_header_df['Date'].max())
+        else:
+            self.calculate_customer_balances()
+        return new_rows
+    
+    def _record_earnings(self, new_rows, latest_date):
+        """
+        Net new points history rows into the stored balances: customers with
+        balances move by the new rows' totals (apply_balance_changes), first
+        time buyers get balance rows of their own
+        """
+        if len(new_rows) == 0:
+            return self.customer_balances_df
+        earned = net_points_by_customer(new_rows['Cust_ID'], new_rows['Points_Earned'])['Earned']
+        new_points = new_rows.groupby('Cust_ID').agg(
+            Transaction_Count=('Ticket_ID', 'count'),
+            Last_Purchase_Date=('Date', 'max'),
+            Total_Spent=('Line_Total', 'sum')
+        )
+        
+        balances = self.customer_balances_df.set_index('Cust_ID')
+        known = new_points.index.isin(balances.index)
+        customers = new_points.index[known]
+        balances.loc[customers, 'Total_Points_Earned'] = (
+            balances.loc[customers, 'Total_Points_Earned'] + earned[customers]
+        ).round(2)
+        balances.loc[customers, 'Transaction_Count'] += new_points.loc[customers, 'Transaction_Count']
+        balances.loc[customers, 'Total_Spent'] += new_points.loc[customers, 'Total_Spent']
+        balances.loc[customers, 'Last_Purchase_Date'] = np.maximum(
+            balances.loc[customers, 'Last_Purchase_Date'], new_points.loc[customers, 'Last_Purchase_Date']
+        )
+        if self.balances_as_of is None or latest_date > self.balances_as_of:
+            self.balances_as_of = latest_date
+            balances['Days_As_Member'] = (latest_date - balances['Enrollment_Date']).dt.days
+        self.customer_balances_df = balances.reset_index()
+        self.apply_balance_changes(customers, earned[customers].to_numpy())
+        
+        first_time = new_points[~known]
+        if len(first_time) > 0:
+            first_time = first_time.assign(Total_Points_Earned=earned[first_time.index].round(2)).reset_index()
+            rows = self._balance_rows(first_time[[
+                'Cust_ID', 'Total_Points_Earned', 'Transaction_Count', 'Last_Purchase_Date', 'Total_Spent'
+            ]], self.balances_as_of)
+            self.customer_balances_df = pd.concat(
+                [self.customer_balances_df, rows[self.customer_balances_df.columns]], ignore_index=True
+            )
+            for cust_id, balance in zip(rows['Cust_ID'], rows['Current_Balance']):
+                self.balance_leaderboard.set(cust_id, balance)
+        return self.customer_balances_df
+    
+    def get_points_history(self):
+        """Get the full points history, including incrementally appended rows"""
+        if self.points_history_df is None:
+            if not self.history_builder.initialized:
+                return self.calculate_points_history()
+            self.points_history_df = self.history_builder.history
+        return self.points_history_df
+    
+    def get_customer_timelines(self):
+        """CSR-indexed points history; appended tickets are merged in by append_points_history"""
+        if self.customer_timelines is None:
+            self.customer_timelines = CustomerTimelines(self.get_points_history())
+        return self.customer_timelines
+    
+    def get_customer_timeline(self, cust_id):
+        """One customer's points history in date order"""
+        return self.get_customer_timelines().timeline(cust_id)
+    
+    def get_customer_timelines_batch(self, cust_ids):
+        """Points histories of many customers at once, in the given order"""
+        return self.get_customer_timelines().timelines(cust_ids)
+    
+    def export_customer_timelines(self, cust_ids, filename='campaign_customer_timelines.csv'):
+        """Write the points histories of a campaign's customers to data/output"""
+        csv_path = os.path.join(self.output_path, filename)
+        atomic_write_csv(self.get_customer_timelines_batch(cust_ids), csv_path)
+        return csv_path
+    
+    def get_point_events(self):
+        """
+        Earn and redemption events in customer/date order with the running
+        net Balance after each event
+        """
+        if self.point_events_df is None:
+            events = build_point_events(self.get_points_history(), self.redemptions_df)
+            events['Balance'] = events.groupby('Cust_ID', sort=False)['Points'].cumsum().round(2)
+            self.point_events_df = events
+        return self.point_events_df
+    
+    def build_points_ledger(self):
+        """
+        Build the time-indexed ledger used for point-in-time balance/tier queries
+        Balances net earn events against redemptions, matching Current_Balance
+        """
+        self.points_ledger = PointsLedger.from_history(
+            self.get_point_events(),
+            points_col='Points',
+            tier_assigner=self.assign_loyalty_tiers
+        )
+        return self.points_ledger
+    
+    def get_balance_as_of(self, cust_id, as_of):
+        """Balance and tier of a customer at the end of a given date"""
+        if self.points_ledger is None:
+            self.build_points_ledger()
+        balance = self.points_ledger.balance_as_of(cust_id, as_of)
+        return {
+            'Cust_ID': cust_id,
+            'As_Of': pd.Timestamp(as_of).date(),
+            'Balance': round(balance, 2),
+            'Loyalty_Tier': str(self._assign_loyalty_tier(balance))
+        }
+    
+    def build_points_expiry(self):
+        """Build the FIFO expiry buckets from earn history and redemptions"""
+        self.points_expiry = PointsExpiry.from_events(
+            self.get_points_history(),
+            self.redemptions_df,
+            expiry_months=self.expiry_months
+        )
+        return self.points_expiry
+    
+    def get_expiring_points(self, as_of=None, window_days=30):
+        """
+        Expired and soon-to-expire points for all customers at a date
+        (defaults to the latest sales date)
+        """
+        if self.points_expiry is None:
+            self.build_points_expiry()
+        if as_of is None:
+            as_of = self.sales_header_df['Date'].max()
+        return self.points_expiry.summary(as_of, window_days=window_days)
+    
+    def get_balances_as_of(self, cust_ids, as_of):
+        """Vectorized point-in-time balances and tiers for many customers"""
+        if self.points_ledger is None:
+            self.build_points_ledger()
+        balances = self.points_ledger.balances_as_of(cust_ids, as_of)
+        return pd.DataFrame({
+            'Cust_ID': cust_ids,
+            'Balance': balances.round(2),
+            'Loyalty_Tier': self.points_ledger.tier_assigner(balances)
+        })
+    
+    def get_promotion_calendar(self):
+        """Dated promotions from config plus admin-created special days"""
+        if self.promotion_calendar is None:
+            self.promotion_calendar = load_promotion_calendar(self.output_path)
+        return self.promotion_calendar
+    
+    def calculate_promo_points_history(self):
+        """
+        Re-score every transaction with the promotions active on its date
+        Multipliers for all transactions come from one calendar lookup, so
+        new or back-dated promotions can be applied retroactively
+        """
+        transactions = self._join_sales_header(['Ticket_ID', 'Cust_ID', 'Date'])
+        transactions = transactions.merge(
+            self.loyalty_rules_df[['Rule_ID', 'Multiplier', 'Rule_Name']], 
+            on='Rule_ID'
+        )
+        
+        # Item categories let category-specific promotions apply
+        categories = None
+        products_path = os.path.join(self.data_path, 'products_master.csv')
+        if os.path.exists(products_path):
+            products = pd.read_csv(products_path, usecols=['SKU', 'Category']).set_index('SKU')['Category']
+            categories = transactions['SKU'].map(products).to_numpy()
+        
+        transactions['Points_Earned'] = self.calculate_points_vectorized(transactions)
+        transactions['Promo_Multiplier'] = self.get_promotion_calendar().multipliers_for_dates(transactions['Date'], categories)
+        transactions['Promo_Points_Earned'] = self.calculate_points_vectorized(
+            transactions, promo_multiplier=transactions['Promo_Multiplier'].to_numpy()
+        )
+        return transactions[[
+            'Cust_ID', 'Ticket_ID', 'Date', 'Rule_Name', 'Qty', 'Line_Total',
+            'Points_Earned', 'Promo_Multiplier', 'Promo_Points_Earned'
+        ]].sort_values(['Cust_ID', 'Date'], kind='stable').reset_index(drop=True)
+    
+    def _build_scenario_replay(self):
+        """
+        Enriched fact table shared by all what-if scenarios: line items with
+        customer, rule, quantity and item category, encoded once
+        """
+        transactions = self._join_sales_header(['Ticket_ID', 'Cust_ID'])
+        transactions = transactions.merge(
+            self.loyalty_rules_df[['Rule_ID', 'Trigger_Category']], 
+            on='Rule_ID'
+        )
+        
+        # Product category where known, else the category the rule targets
+        categories = transactions['Trigger_Category']
+        products_path = os.path.join(self.data_path, 'products_master.csv')
+        if os.path.exists(products_path):
+            products = pd.read_csv(products_path, usecols=['SKU', 'Category']).set_index('SKU')['Category']
+            categories = transactions['SKU'].map(products).fillna(categories)
+        
+        cust_codes, self._scenario_customers = pd.factorize(transactions['Cust_ID'], sort=True)
+        qty_codes, self._scenario_quantities = pd.factorize(transactions['Qty'], sort=True)
+        category_codes, self._scenario_categories = pd.factorize(categories, sort=True)
+        self._scenario_rule_ids = self.loyalty_rules_df['Rule_ID'].to_numpy()
+        
+        self._scenario_replay = ScenarioReplay(
+            cust_codes,
+            transactions['Line_Total'].to_numpy(),
+            pd.Index(self._scenario_rule_ids).get_indexer(transactions['Rule_ID']),
+            qty_codes,
+            category_codes,
+            n_customers=len(self._scenario_customers),
+            n_categories=len(self._scenario_categories)
+        )
+        return self._scenario_replay
+    
+    def _scenario_rule_multipliers(self, scenario):
+        """
+        Rule multipliers under a scenario, aligned with loyalty_rules_df
+        category_multipliers override rules by Trigger_Category;
+        rule_multipliers override single rules by Rule_ID or Rule_Name
+        """
+        rules = self.loyalty_rules_df
+        multipliers = rules['Multiplier'].to_numpy(dtype='float64')
+        # One lookup per key column: each rule gets its override, NaN where there is none;
+        # rule names before IDs, so an override by Rule_ID wins
+        overrides = [
+            (scenario.get('category_multipliers', {}), rules['Trigger_Category']),
+            (scenario.get('rule_multipliers', {}), rules['Rule_Name']),
+            (scenario.get('rule_multipliers', {}), rules['Rule_ID']),
+        ]
+        for values, keys in overrides:
+            if values:
+                override = pd.Series(values, dtype='float64').reindex(keys.to_numpy()).to_numpy()
+                multipliers = np.where(np.isnan(override), multipliers, override)
+        return multipliers
+    
+    def simulate_rule_scenarios(self, scenarios, chunk_rows=1_000_000):
+        """
+        What-if replay of the full transaction history under alternative rule sets
+        
+        Each scenario is a dict with a 'name' and any of:
+        - category_multipliers: {'Health': 2.5}
+        - rule_multipliers: {rule_id or rule_name: multiplier}
+        - quantity_bonuses: [(min_qty, multiplier), ...]
+        - promo_multiplier: flat multiplier on all earning
+        
+        The current rules are always included as 'Baseline'. All scenarios are
+        evaluated together as columns; balances net actual redemptions.
+        Returns a dict of frames: summary (liability and deltas), 
+        tier_distribution and category_costs
+        """
+        if self._scenario_replay is None:
+            self._build_scenario_replay()
+        
+        scenarios = [{'name': 'Baseline'}] + [s for s in scenarios if s.get('name') != 'Baseline']
+        names = [scenario['name'] for scenario in scenarios]
+        rule_table = np.column_stack([self._scenario_rule_multipliers(s) for s in scenarios])
+        qty_table = np.column_stack([
+            self.quantity_multipliers(self._scenario_quantities, s.get('quantity_bonuses', self.quantity_bonuses))
+            for s in scenarios
+        ])
+        promo = np.array([s.get('promo_multiplier', 1.0) for s in scenarios], dtype='float64')
+        
+        customer_points, category_points = self._scenario_replay.evaluate(rule_table, qty_table, promo, chunk_rows)
+        
+        redeemed = net_points_by_customer(
+            self.redemptions_df['Cust_ID'],
+            -self.redemptions_df['Points_Redeemed'].to_numpy(),
+            customers=self._scenario_customers
+        )['Redeemed'].to_numpy()
+        balances = customer_points - redeemed[:, None]
+        liability = np.clip(balances, 0, None).sum(axis=0)
+        
+        tiers = self.assign_loyalty_tiers(balances.ravel()).reshape(balances.shape)
+        tier_counts = {tier: (tiers == tier).sum(axis=0) for tier in self.tier_names}
+        
+        summary = pd.DataFrame({
+            'Scenario': names,
+            'Total_Points_Earned': customer_points.sum(axis=0).round(2),
+            'Points_Liability': liability.round(2),
+            'Liability_Delta': (liability - liability[0]).round(2),
+            'Liability_Delta_Percent': np.where(liability[0] > 0, (liability - liability[0]) / liability[0] * 100, 0.0).round(2)
+        })
+        for tier in self.tier_names:
+            summary[f'{tier}_Customers'] = tier_counts[tier]
+        
+        tier_distribution = pd.DataFrame({
+            'Scenario': np.repeat(names, len(self.tier_names)),
+            'Loyalty_Tier': np.tile(self.tier_names, len(names)),
+            'Customers': np.column_stack([tier_counts[tier] for tier in self.tier_names]).ravel()
+        })
+        
+        category_costs = pd.DataFrame({
+            'Scenario': np.tile(names, len(self._scenario_categories)),
+            'Category': np.repeat(np.asarray(self._scenario_categories), len(names)),
+            'Points': category_points.ravel().round(2),
+            'Baseline_Points': np.repeat(category_points[:, 0], len(names)).round(2)
+        })
+        category_costs['Points_Delta'] = (category_costs['Points'] - category_costs['Baseline_Points']).round(2)
+        
+        return {
+            'summary': summary,
+            'tier_distribution': tier_distribution,
+            'category_costs': category_costs
+        }
+    
     def calculate_promo_effectiveness(self):
         """Measure promotional effectiveness across products and stores"""
         
         # Merge to get promotion data
-        transactions = self.sales_line_items_df.merge(
-            self.sales_header_df[['Ticket_ID', 'Cust_ID', 'Store_ID', 'Date', 'Total_Value']], 
-            on='Ticket_ID'
-        )
+        transactions = self._join_sales_header(['Ticket_ID', 'Cust_ID', 'Store_ID', 'Date', 'Total_Value'])
         
         transactions = transactions.merge(
             self.loyalty_rules_df[['Rule_ID', 'Rule_Name', 'Multiplier']], 
@@ -207,14 +825,7 @@ class LoyaltyPointsEngine:
         )
         
         # Calculate points earned
-        transactions['Points_Earned'] = transactions.apply(
-            lambda row: self.calculate_dynamic_points(
-                quantity=row['Qty'],
-                line_total=row['Line_Total'],
-                rule_id=row['Rule_ID']
-            ),
-            axis=1
-        )
+        transactions['Points_Earned'] = self.calculate_points_vectorized(transactions)
         
         # Group by promotion and store
         promo_by_store = transactions.groupby(['Rule_Name', 'Store_ID']).agg({
@@ -226,6 +837,11 @@ class LoyaltyPointsEngine:
         
         promo_by_store.columns = ['Promotion', 'Store_ID', 'Transaction_Count', 'Sales_Uplift', 'Points_Activity', 'Units_Sold']
         
+        return self._finalize_promo_metrics(promo_by_store)
+    
+    def _finalize_promo_metrics(self, promo_by_store):
+        """Derived per rule/store promotion metrics"""
+        
         # Calculate metrics
         promo_by_store['Avg_Transaction_Value'] = (promo_by_store['Sales_Uplift'] / promo_by_store['Transaction_Count']).round(2)
         promo_by_store['Points_per_Sale'] = (promo_by_store['Points_Activity'] / promo_by_store['Sales_Uplift']).round(4)
@@ -241,10 +857,7 @@ class LoyaltyPointsEngine:
     def calculate_sales_uplift_by_product(self):
         """Measure sales uplift by product category"""
         
-        transactions = self.sales_line_items_df.merge(
-            self.sales_header_df[['Ticket_ID', 'Date']], 
-            on='Ticket_ID'
-        )
+        transactions = self._join_sales_header(['Ticket_ID', 'Date'])
         
         transactions = transactions.merge(
             self.loyalty_rules_df[['Rule_ID', 'Rule_Name']], 
@@ -263,19 +876,47 @@ class LoyaltyPointsEngine:
         
         return uplift.sort_values('Sales_Value', ascending=False).head(15)
     
+    def load_saved_balances(self):
+        """Cust_ID and Loyalty_Tier of the last saved balances (empty if never saved)"""
+        csv_path = os.path.join(self.data_path, 'customer_loyalty_balances.csv')
+        if not os.path.exists(csv_path):
+            return pd.DataFrame(columns=['Cust_ID', 'Loyalty_Tier'])
+        return pd.read_csv(csv_path, usecols=['Cust_ID', 'Loyalty_Tier'])
+    
+    def save_balances(self):
+        """
+        Balance refresh: record the tier moves since the last saved balances,
+        then save the current balances as the new baseline
+        Returns the tier changes
+        """
+        if self.customer_balances_df is None:
+            self.calculate_customer_balances()
+        self.tier_changes_df = self.detect_tier_changes(self.load_saved_balances())
+        self.update_tier_changes_csv()
+        self.update_customer_balances_csv()
+        return self.tier_changes_df
+    
     def update_customer_balances_csv(self):
         """Update customer balances in CSV"""
         if self.customer_balances_df is not None:
             csv_path = os.path.join(self.data_path, 'customer_loyalty_balances.csv')
-            self.customer_balances_df.to_csv(csv_path, index=False)
+            atomic_write_csv(self.customer_balances_df, csv_path)
+            return csv_path
+        return None
+    
+    def update_tier_changes_csv(self):
+        """Write the customers whose tier moved since the previously saved balances"""
+        if self.tier_changes_df is not None:
+            csv_path = os.path.join(self.output_path, 'loyalty_tier_changes.csv')
+            atomic_write_csv(self.tier_changes_df, csv_path)
             return csv_path
         return None
     
     def update_points_history_csv(self):
         """Update points history in CSV"""
-        if self.points_history_df is not None:
+        if self.history_builder.initialized:
             csv_path = os.path.join(self.data_path, 'points_transaction_history.csv')
-            self.points_history_df.to_csv(csv_path, index=False)
+            atomic_write_csv(self.get_points_history(), csv_path)
             return csv_path
         return None
     
@@ -283,7 +924,7 @@ class LoyaltyPointsEngine:
         """Update promotional effectiveness in CSV"""
         if self.promo_effectiveness_df is not None:
             csv_path = os.path.join(self.data_path, 'promo_effectiveness_metrics.csv')
-            self.promo_effectiveness_df.to_csv(csv_path, index=False)
+            atomic_write_csv(self.promo_effectiveness_df, csv_path)
             return csv_path
         return None
     
@@ -294,7 +935,7 @@ class LoyaltyPointsEngine:
             'summary': {
                 'total_customers': len(self.customer_balances_df),
                 'total_points_earned': self.customer_balances_df['Total_Points_Earned'].sum(),
-                'total_points_redeemed': self.customer_balances_df['Estimated_Redeemed_Points'].sum(),
+                'total_points_redeemed': self.customer_balances_df['Redeemed_Points'].sum(),
                 'total_active_balance': self.customer_balances_df['Current_Balance'].sum(),
                 'avg_customer_balance': self.customer_balances_df['Current_Balance'].mean(),
             },
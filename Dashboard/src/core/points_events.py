@@ -0,0 +1,101 @@
+"""
+Points Events
+Earn and burn (redemption) events in one signed event stream, so balances,
+tiers and balance history are all derived from actual redemptions
+"""
+
+import pandas as pd
+import numpy as np
+
+REDEMPTION_COLUMNS = ['Redemption_ID', 'Cust_ID', 'Date', 'Points_Redeemed']
+
+EVENT_COLUMNS = ['Cust_ID', 'Date', 'Event_Type', 'Reference_ID', 'Points']
+
+
+def empty_redemptions():
+    """Redemptions frame with no rows (programs without redemption data)"""
+    return pd.DataFrame({
+        'Redemption_ID': pd.Series(dtype='object'),
+        'Cust_ID': pd.Series(dtype='object'),
+        'Date': pd.Series(dtype='datetime64[ns]'),
+        'Points_Redeemed': pd.Series(dtype='float64')
+    })
+
+
+def load_redemptions(csv_path):
+    """
+    Load redemption events (Redemption_ID, Cust_ID, Date, Points_Redeemed)
+    A missing file means no redemptions; Redemption_ID is optional
+    """
+    try:
+        redemptions = pd.read_csv(csv_path)
+    except FileNotFoundError:
+        return empty_redemptions()
+
+    if 'Redemption_ID' not in redemptions.columns:
+        redemptions['Redemption_ID'] = [f"RED_{i + 1:06d}" for i in range(len(redemptions))]
+    redemptions['Date'] = pd.to_datetime(redemptions['Date'])
+    redemptions['Points_Redeemed'] = pd.to_numeric(redemptions['Points_Redeemed'], errors='coerce').fillna(0.0)
+    return redemptions[REDEMPTION_COLUMNS]
+
+
+def next_redemption_ids(existing_ids, count):
+    """
+    count new Redemption_IDs numbered after the highest existing RED_ number,
+    so they never reuse an ID even when rows have been removed
+    """
+    numbers = pd.Series(existing_ids, dtype=object).astype(str).str.extract(r'^RED_(\d+)$')[0]
+    start = int(pd.to_numeric(numbers).max()) + 1 if numbers.notna().any() else 1
+    return [f"RED_{i:06d}" for i in range(start, start + count)]
+
+
+def build_point_events(history_df, redemptions_df):
+    """
+    Combine earn rows from the points history with redemptions
+    Points are signed: positive for earn events, negative for redemptions
+    """
+    earn = pd.DataFrame({
+        'Cust_ID': history_df['Cust_ID'].to_numpy(),
+        'Date': history_df['Date'].to_numpy(),
+        'Event_Type': 'Earn',
+        'Reference_ID': history_df['Ticket_ID'].to_numpy(),
+        'Points': history_df['Points_Earned'].to_numpy(dtype='float64')
+    })
+    burn = pd.DataFrame({
+        'Cust_ID': redemptions_df['Cust_ID'].to_numpy(),
+        'Date': redemptions_df['Date'].to_numpy(),
+        'Event_Type': 'Redeem',
+        'Reference_ID': redemptions_df['Redemption_ID'].to_numpy(),
+        'Points': -redemptions_df['Points_Redeemed'].to_numpy(dtype='float64')
+    })
+    frames = [df for df in [earn, burn] if len(df) > 0]
+    if not frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # Earn before burn on the same day, so a same-day redemption sees that day's points
+    events = pd.concat(frames, ignore_index=True)
+    return events.sort_values(['Cust_ID', 'Date', 'Event_Type'], kind='stable').reset_index(drop=True)
+
+
+def net_points_by_customer(cust_ids, points, customers=None):
+    """
+    Earned, redeemed and net points per customer in one pass
+    Uses factorized codes and bincount instead of a groupby, so cost is
+    linear in the number of events
+    Returns a frame indexed by Cust_ID with Earned, Redeemed and Net columns
+    """
+    points = np.asarray(points, dtype='float64')
+    if customers is None:
+        codes, customers = pd.factorize(pd.Series(cust_ids), sort=True)
+    else:
+        customers = pd.Index(customers)
+        codes = customers.get_indexer(np.asarray(cust_ids))
+
+    known = codes >= 0
+    codes, points = codes[known], points[known]
+    earned = np.bincount(codes, weights=np.where(points > 0, points, 0.0), minlength=len(customers))
+    redeemed = np.bincount(codes, weights=np.where(points < 0, -points, 0.0), minlength=len(customers))
+    return pd.DataFrame(
+        {'Earned': earned, 'Redeemed': redeemed, 'Net': earned - redeemed},
+        index=pd.Index(customers, name='Cust_ID')
+    )
@@ -0,0 +1,138 @@
+"""
+Points Expiry
+FIFO expiry of earned points: every earn event is a dated bucket that
+expires after N months, and redemptions deplete the oldest buckets first
+"""
+
+import pandas as pd
+import numpy as np
+
+
+class PointsExpiry:
+    """
+    Batch FIFO expiry over sorted event arrays (no per-customer loops)
+
+    For one customer with earn buckets j (in earn order), cumulative earned
+    points cumE_j, expiry dates x_j and cumulative redemptions R(t), FIFO
+    depletion gives the total expired once bucket j has expired as
+        X_j = max(0, max over i <= j of (cumE_i - R(x_i)))
+    i.e. whatever of the oldest buckets was not redeemed before they expired.
+    Expired-by-date and expiring-soon amounts are both grouped maxima of
+    that quantity, computed for all customers at once.
+    """
+
+    def __init__(self, cust_ids, earn_dates, earn_points,
+                 redeem_cust_ids, redeem_dates, redeem_points, expiry_months=12):
+        earn_cust = pd.Series(cust_ids, dtype='object')
+        redeem_cust = pd.Series(redeem_cust_ids, dtype='object')
+        self.customers = pd.Index(pd.unique(pd.concat([earn_cust, redeem_cust], ignore_index=True))).sort_values()
+        self.expiry_months = expiry_months
+
+        # Earn buckets sorted by (customer, earn date); expiry follows the same order
+        codes = self.customers.get_indexer(earn_cust)
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(earn_dates))).normalize()
+        days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        expiry = (dates + pd.DateOffset(months=expiry_months)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        order = np.lexsort((days, codes))
+        self.codes = codes[order]
+        self.days = days[order]
+        self.expiry_days = expiry[order]
+        self.points = np.asarray(earn_points, dtype='float64')[order]
+        self.cumulative = self._running_totals(self.codes, self.points)
+
+        # Redemptions sorted by (customer, day) with per-customer running totals
+        r_codes = self.customers.get_indexer(redeem_cust)
+        r_days = pd.to_datetime(pd.Series(redeem_dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        r_order = np.lexsort((r_days, r_codes))
+        self.r_codes = r_codes[r_order]
+        self.r_days = r_days[r_order]
+        self.r_cumulative = self._running_totals(self.r_codes, np.asarray(redeem_points, dtype='float64')[r_order])
+        self.r_offsets = np.searchsorted(self.r_codes, np.arange(len(self.customers) + 1))
+
+        all_days = np.concatenate([self.days, self.expiry_days, self.r_days])
+        self._min_day = int(all_days.min()) if len(all_days) else 0
+        self._day_span = (int(all_days.max()) - self._min_day + 2) if len(all_days) else 2
+        self._r_keys = self.r_codes.astype(np.int64) * self._day_span + (self.r_days - self._min_day)
+
+    @classmethod
+    def from_events(cls, history_df, redemptions_df, expiry_months=12):
+        """Build from a points history (earn rows) and a redemptions frame"""
+        return cls(
+            history_df['Cust_ID'].to_numpy(), history_df['Date'].to_numpy(), history_df['Points_Earned'].to_numpy(),
+            redemptions_df['Cust_ID'].to_numpy(), redemptions_df['Date'].to_numpy(),
+            redemptions_df['Points_Redeemed'].to_numpy(), expiry_months=expiry_months
+        )
+
+    @staticmethod
+    def _running_totals(codes, values):
+        """Per-customer running totals of values sorted by customer code"""
+        if len(values) == 0:
+            return values
+        running = np.cumsum(values)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        block_base = np.concatenate([[0.0], running])[starts]
+        return running - np.repeat(block_base, np.diff(np.r_[starts, len(codes)]))
+
+    @staticmethod
+    def _to_day(date):
+        return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+    def _redeemed_before(self, codes, days):
+        """Cumulative redemptions of each customer strictly before the given days"""
+        if len(self._r_keys) == 0:
+            return np.zeros(len(codes))
+        relative = np.clip(days - self._min_day, 0, self._day_span - 1)
+        positions = np.searchsorted(self._r_keys, codes.astype(np.int64) * self._day_span + relative, side='left') - 1
+        valid = (positions >= 0) & (positions >= self.r_offsets[codes])
+        redeemed = np.zeros(len(codes))
+        redeemed[valid] = self.r_cumulative[positions[valid]]
+        return redeemed
+
+    def _group_max(self, codes, values):
+        """Per-customer maximum of values (0 where a customer has none), clipped at 0"""
+        result = np.zeros(len(self.customers))
+        if len(values):
+            maxima = pd.Series(values).groupby(codes).max()
+            result[maxima.index.to_numpy()] = maxima.to_numpy()
+        return np.maximum(result, 0.0)
+
+    def _expired_through(self, cutoff_day, as_of_day):
+        """
+        Total expired per customer for buckets expiring on or before cutoff_day,
+        with redemptions known up to as_of_day (later ones are not anticipated)
+        """
+        mask = (self.days <= as_of_day) & (self.expiry_days <= cutoff_day)
+        codes = self.codes[mask]
+        redeemed = self._redeemed_before(codes, np.minimum(self.expiry_days[mask], as_of_day + 1))
+        return self._group_max(codes, self.cumulative[mask] - redeemed)
+
+    def summary(self, as_of, window_days=30):
+        """
+        Per-customer expiry position at the end of as_of:
+        Earned, Redeemed, Expired, Available_Balance, Expiring_Soon (within
+        window_days, assuming no further redemptions) and Next_Expiry_Date
+        """
+        as_of_day = self._to_day(as_of)
+        earned_mask = self.days <= as_of_day
+        earned = np.bincount(self.codes[earned_mask], weights=self.points[earned_mask], minlength=len(self.customers))
+        redeemed = self._redeemed_before(np.arange(len(self.customers)), np.full(len(self.customers), as_of_day + 1))
+
+        expired = self._expired_through(as_of_day, as_of_day)
+        expiring = self._expired_through(as_of_day + window_days, as_of_day) - expired
+
+        # Earliest unexpired bucket that still holds points after FIFO depletion
+        consumed = redeemed + expired
+        open_mask = earned_mask & (self.expiry_days > as_of_day) & (self.cumulative > consumed[self.codes] + 1e-9)
+        next_expiry = pd.Series(self.expiry_days[open_mask]).groupby(self.codes[open_mask]).min()
+        next_expiry_dates = pd.Series(pd.NaT, index=np.arange(len(self.customers)), dtype='datetime64[ns]')
+        next_expiry_dates[next_expiry.index.to_numpy()] = next_expiry.to_numpy().astype('datetime64[D]')
+
+        return pd.DataFrame({
+            'Cust_ID': self.customers,
+            'Earned': earned.round(2),
+            'Redeemed': redeemed.round(2),
+            'Expired': expired.round(2),
+            'Available_Balance': np.maximum(earned - redeemed - expired, 0.0).round(2),
+            'Expiring_Soon': expiring.round(2),
+            'Next_Expiry_Date': next_expiry_dates.to_numpy()
+        })
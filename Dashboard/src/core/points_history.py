@@ -0,0 +1,220 @@
+"""
+Incremental Points History
+Appends new point accruals to the per-customer history without re-sorting
+or re-accumulating what is already there
+"""
+
+import pandas as pd
+import numpy as np
+
+HISTORY_COLUMNS = [
+    'Cust_ID', 'Ticket_ID', 'Date', 'Rule_Name', 'Qty',
+    'Line_Total', 'Points_Earned', 'Cumulative_Points'
+]
+
+
+class PointsHistoryBuilder:
+    """
+    Incremental points history builder:
+    - Keeps each customer's last cumulative total and latest date as state
+    - New rows are sorted among themselves only, and their running totals
+      are offset from that state
+    - A customer receiving a row dated before their latest stored row is
+      re-accumulated from their full history instead, so cumulative totals
+      stay in date order
+    - Appended batches are merged into the full history lazily; the last
+      batch and the customers it re-accumulated are kept for consumers
+      that merge it themselves (CustomerTimelines.merged)
+    Cost of append() is proportional to the number of new rows, plus the
+    stored rows of customers with back-dated tickets.
+    """
+
+    def __init__(self):
+        self.last_cumulative = pd.Series(dtype='float64')
+        self.last_date = pd.Series(dtype='datetime64[ns]')
+        self._history_df = pd.DataFrame(columns=HISTORY_COLUMNS)
+        self._batches = []
+        self.initialized = False
+        self.last_batch = None
+        self.last_replaced = np.array([], dtype=object)
+
+    def initialize(self, history_df):
+        """Seed the builder from a full history sorted by Cust_ID, Date"""
+        self._history_df = history_df
+        self._batches = []
+        self.initialized = True
+        by_customer = history_df.groupby('Cust_ID', sort=False)
+        self.last_cumulative = by_customer['Cumulative_Points'].last()
+        self.last_date = by_customer['Date'].max()
+
+    @staticmethod
+    def _upsert(state, values):
+        """state with values set for their customers (new customers added)"""
+        new_customers = values.index.difference(state.index)
+        if len(new_customers) > 0:
+            state = pd.concat([state, values[new_customers]]) if len(state) else values[new_customers].copy()
+        existing = values.index.difference(new_customers)
+        state.loc[existing] = values[existing]
+        return state
+
+    def append(self, transactions):
+        """
+        Append new transactions (Cust_ID, Date, Points_Earned, ...)
+        Returns the new history rows with Cumulative_Points filled in
+        """
+        if len(transactions) == 0:
+            return transactions.reindex(columns=HISTORY_COLUMNS)
+
+        batch = transactions.assign(_new=True)
+        offsets = self.last_cumulative.reindex(batch['Cust_ID']).fillna(0.0).to_numpy()
+
+        # Back-dated rows: move those customers' stored rows into the batch and
+        # re-accumulate them from zero
+        backdated = batch['Date'].to_numpy() < self.last_date.reindex(batch['Cust_ID']).to_numpy()
+        late_customers = pd.unique(batch['Cust_ID'].to_numpy()[backdated])
+        if len(late_customers) > 0:
+            history = self.history
+            stored = history['Cust_ID'].isin(late_customers).to_numpy()
+            self._history_df = history[~stored].reset_index(drop=True)
+            offsets = np.where(batch['Cust_ID'].isin(late_customers).to_numpy(), 0.0, offsets)
+            batch = batch.assign(_offset=offsets)
+            # Stored rows go first so they stay ahead of new rows with the same date
+            batch = pd.concat([history[stored].assign(_new=False, _offset=0.0), batch], ignore_index=True)
+            offsets = batch['_offset'].to_numpy()
+
+        order = np.lexsort((batch['Date'].to_numpy(), batch['Cust_ID'].to_numpy()))
+        batch = batch.iloc[order].reset_index(drop=True)
+        offsets = offsets[order]
+
+        # Running totals within the batch, offset by each customer's stored total
+        batch['Cumulative_Points'] = batch.groupby('Cust_ID', sort=False)['Points_Earned'].cumsum().to_numpy() + offsets
+
+        new_rows = batch['_new'].to_numpy(dtype=bool)
+        batch = batch[HISTORY_COLUMNS]
+        self._batches.append(batch)
+        self.last_batch = batch
+        self.last_replaced = late_customers
+
+        # Update state only for the customers in this batch
+        by_customer = batch.groupby('Cust_ID', sort=False)
+        self.last_cumulative = self._upsert(self.last_cumulative, by_customer['Cumulative_Points'].last())
+        self.last_date = self._upsert(self.last_date, by_customer['Date'].max())
+        return batch[new_rows].reset_index(drop=True)
+
+    @property
+    def history(self):
+        """Full history (existing rows followed by appended batches)"""
+        if self._batches:
+            frames = [df for df in [self._history_df] + self._batches if len(df) > 0]
+            self._history_df = pd.concat(frames, ignore_index=True)
+            self._batches = []
+        return self._history_df
+
+    def cumulative_points(self, cust_ids):
+        """Current cumulative points for the given customers (0 if unknown)"""
+        return self.last_cumulative.reindex(np.asarray(cust_ids)).fillna(0.0)
+
+
+def _range_positions(starts, ends):
+    """Row positions of the concatenated [start, end) ranges"""
+    counts = ends - starts
+    return np.repeat(starts, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+
+class CustomerTimelines:
+    """
+    Points history in Cust_ID, Date order with CSR-style offsets:
+    rows of customer c are [offsets[c], offsets[c + 1]), so one customer's
+    ordered timeline is a contiguous slice and a batch of customers is a
+    single take over concatenated ranges
+    """
+
+    def __init__(self, history_df, customers=None, codes=None):
+        """
+        history_df in any order; customers (sorted) and each row's code in
+        them may be given for a frame already in order, skipping the
+        factorize and order check
+        """
+        if codes is None:
+            codes, customers = pd.factorize(history_df['Cust_ID'].to_numpy(), sort=True)
+            dates = history_df['Date'].to_numpy()
+
+            # A history from unmerged batches can be out of order; sort once here
+            ordered = len(codes) < 2 or bool(np.all(
+                (codes[1:] > codes[:-1]) | ((codes[1:] == codes[:-1]) & (dates[1:] >= dates[:-1]))
+            ))
+            if not ordered:
+                order = np.lexsort((dates, codes))
+                history_df = history_df.iloc[order].reset_index(drop=True)
+                codes = codes[order]
+
+        self.frame = history_df
+        self.customers = pd.Index(customers)
+        self.offsets = np.searchsorted(codes, np.arange(len(customers) + 1))
+
+    def merged(self, batch, replaced=()):
+        """
+        Timelines with a batch in Cust_ID, Date order merged in, as
+        PointsHistoryBuilder.append leaves it: the batch holds the complete
+        history of the `replaced` customers (their stored rows are dropped)
+        and rows no earlier than the stored ones for everyone else, so each
+        customer's batch rows go after their stored rows. Cost is linear in
+        the stored rows, with no re-sort
+        """
+        frame, offsets = self.frame, self.offsets
+        codes = np.repeat(np.arange(len(self.customers)), np.diff(offsets))
+        if len(replaced) > 0:
+            keep = np.ones(len(frame), dtype=bool)
+            keep[_range_positions(*self.ranges(replaced))] = False
+            frame, codes = frame[keep], codes[keep]
+
+        customers = self.customers.union(pd.Index(pd.unique(batch['Cust_ID'].to_numpy())))
+        stored_codes = customers.get_indexer(self.customers)[codes]
+        batch_codes = customers.get_indexer(batch['Cust_ID'].to_numpy())
+
+        # Batch row i lands after the stored rows of its customer and the i batch rows before it
+        batch_positions = np.searchsorted(stored_codes, batch_codes, side='right') + np.arange(len(batch))
+        is_batch = np.zeros(len(frame) + len(batch), dtype=bool)
+        is_batch[batch_positions] = True
+        order = np.empty(len(is_batch), dtype=np.int64)
+        order[~is_batch] = np.arange(len(frame))
+        order[is_batch] = len(frame) + np.arange(len(batch))
+
+        merged_codes = np.empty(len(order), dtype=np.int64)
+        merged_codes[~is_batch] = stored_codes
+        merged_codes[is_batch] = batch_codes
+        merged_frame = pd.concat([frame, batch[frame.columns]], ignore_index=True).take(order).reset_index(drop=True)
+        return CustomerTimelines(merged_frame, customers, merged_codes)
+
+    def __len__(self):
+        return len(self.customers)
+
+    def range(self, cust_id):
+        """[start, end) rows of a customer ((0, 0) if unknown)"""
+        try:
+            code = self.customers.get_loc(cust_id)
+        except KeyError:
+            return 0, 0
+        return self.offsets[code], self.offsets[code + 1]
+
+    def timeline(self, cust_id):
+        """One customer's ordered history as a slice of the stored frame"""
+        start, end = self.range(cust_id)
+        return self.frame.iloc[start:end]
+
+    def column(self, cust_id, column):
+        """One customer's values of a column as an array view (no copy)"""
+        start, end = self.range(cust_id)
+        return self.frame[column].to_numpy()[start:end]
+
+    def ranges(self, cust_ids):
+        """[start, end) row ranges for many customers (empty for unknown IDs)"""
+        codes = self.customers.get_indexer(np.asarray(cust_ids))
+        known = codes >= 0
+        starts = np.where(known, self.offsets[np.where(known, codes, 0)], 0)
+        ends = np.where(known, self.offsets[np.where(known, codes, 0) + 1], 0)
+        return starts, ends
+
+    def timelines(self, cust_ids):
+        """Ordered timelines of many customers, in the requested customer order"""
+        return self.frame.take(_range_positions(*self.ranges(cust_ids))).reset_index(drop=True)
@@ -0,0 +1,133 @@
+"""
+Points Ledger
+Time-indexed per-customer ledger for point-in-time balance and tier queries
+("what was CUST_042's balance and tier on 2026-01-01?")
+"""
+
+import pandas as pd
+import numpy as np
+
+
+class PointsLedger:
+    """
+    Per-customer ledger stored as flat sorted arrays:
+    - Rows sorted by (customer code, date)
+    - offsets[c]:offsets[c + 1] is customer c's row range
+    - cumulative[i] is the customer's balance after row i
+    Single lookups binary-search one customer's dates (O(log n)); batch
+    lookups binary-search a combined (customer, day) key for all queries at once.
+    """
+
+    def __init__(self, cust_ids, dates, point_deltas, tier_assigner=None):
+        codes, customers = pd.factorize(pd.Series(cust_ids), sort=True)
+        days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        deltas = np.asarray(point_deltas, dtype='float64')
+
+        order = np.lexsort((days, codes))
+        self.customers = pd.Index(customers)
+        self.codes = codes[order]
+        self.days = days[order]
+        self.deltas = deltas[order]
+        self.offsets = np.searchsorted(self.codes, np.arange(len(self.customers) + 1))
+
+        # Per-customer running totals: global cumsum minus the total before each block
+        running = np.cumsum(self.deltas)
+        block_base = np.concatenate([[0.0], running])[self.offsets[:-1]]
+        self.cumulative = running - np.repeat(block_base, np.diff(self.offsets))
+
+        # Combined sort key (customer, day) for vectorized as-of lookups
+        self._min_day = int(self.days.min()) if len(self.days) else 0
+        self._day_span = (int(self.days.max()) - self._min_day + 1) if len(self.days) else 1
+        self._keys = self.codes.astype(np.int64) * self._day_span + (self.days - self._min_day)
+
+        self.tier_assigner = tier_assigner
+
+    @classmethod
+    def from_history(cls, history_df, points_col='Points_Earned', scale=1.0, tier_assigner=None):
+        """Build a ledger from a points history frame (Cust_ID, Date, points)"""
+        return cls(
+            history_df['Cust_ID'].to_numpy(),
+            history_df['Date'].to_numpy(),
+            history_df[points_col].to_numpy() * scale,
+            tier_assigner=tier_assigner
+        )
+
+    @staticmethod
+    def _to_day(date):
+        return int(np.datetime64(pd.Timestamp(date).date(), 'D').astype(np.int64))
+
+    def balance_as_of(self, cust_id, as_of):
+        """Balance of one customer at the end of the given date"""
+        code = self.customers.get_indexer([cust_id])[0]
+        if code < 0:
+            return 0.0
+        start, end = self.offsets[code], self.offsets[code + 1]
+        position = np.searchsorted(self.days[start:end], self._to_day(as_of), side='right')
+        return float(self.cumulative[start + position - 1]) if position > 0 else 0.0
+
+    def min_balance_from(self, cust_id, from_date):
+        """
+        Lowest balance of one customer from the end of the given date on:
+        what a redemption dated then can take without any later balance
+        going negative
+        """
+        code = self.customers.get_indexer([cust_id])[0]
+        if code < 0:
+            return 0.0
+        start, end = self.offsets[code], self.offsets[code + 1]
+        position = start + np.searchsorted(self.days[start:end], self._to_day(from_date), side='right')
+        opening = float(self.cumulative[position - 1]) if position > start else 0.0
+        return min(opening, float(self.cumulative[position:end].min())) if position < end else opening
+
+    def balances_as_of(self, cust_ids, as_of):
+        """
+        Vectorized balances for many customers
+        as_of may be a single date or one date per customer
+        """
+        codes = self.customers.get_indexer(np.asarray(cust_ids))
+        as_of_days = pd.to_datetime(pd.Series(np.broadcast_to(np.asarray(as_of, dtype=object), codes.shape)))
+        as_of_days = as_of_days.to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+        # Clamp outside the ledger's date range; "before first day" maps to -1
+        relative = np.clip(as_of_days - self._min_day, -1, self._day_span - 1)
+        query_keys = codes.astype(np.int64) * self._day_span + relative
+        positions = np.searchsorted(self._keys, query_keys, side='right') - 1
+
+        known = codes >= 0
+        valid = known & (positions >= self.offsets[np.where(known, codes, 0)])
+        balances = np.zeros(len(codes))
+        balances[valid] = self.cumulative[positions[valid]]
+        return balances
+
+    def tier_as_of(self, cust_id, as_of):
+        """Loyalty tier of one customer at the end of the given date"""
+        return self.tiers_as_of([cust_id], as_of)[0]
+
+    def tiers_as_of(self, cust_ids, as_of):
+        """Vectorized loyalty tiers for many customers"""
+        if self.tier_assigner is None:
+            raise ValueError("PointsLedger was built without a tier assigner")
+        return np.asarray(self.tier_assigner(self.balances_as_of(cust_ids, as_of)))
+
+    def snapshot(self, as_of):
+        """Balance (and tier) of every customer at the given date"""
+        balances = self.balances_as_of(self.customers.to_numpy(), as_of)
+        snapshot_df = pd.DataFrame({'Cust_ID': self.customers, 'Balance': balances})
+        if self.tier_assigner is not None:
+            snapshot_df['Loyalty_Tier'] = np.asarray(self.tier_assigner(balances))
+        return snapshot_df
+
+    def timeline(self, cust_id):
+        """Balance (and tier) after each ledger event of one customer"""
+        code = self.customers.get_indexer([cust_id])[0]
+        if code < 0:
+            return pd.DataFrame(columns=['Date', 'Points_Change', 'Balance'])
+        start, end = self.offsets[code], self.offsets[code + 1]
+        timeline_df = pd.DataFrame({
+            'Date': self.days[start:end].astype('datetime64[D]'),
+            'Points_Change': self.deltas[start:end],
+            'Balance': self.cumulative[start:end]
+        })
+        if self.tier_assigner is not None:
+            timeline_df['Loyalty_Tier'] = np.asarray(self.tier_assigner(timeline_df['Balance'].to_numpy()))
+        return timeline_df
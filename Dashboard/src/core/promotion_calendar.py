@@ -0,0 +1,267 @@
+"""
+Promotion Calendar
+Dated promotions (festivals, sale events, admin-created special days) stored
+as sorted interval arrays, so the promotions active on a whole array of
+transaction dates can be looked up at once
+"""
+
+import pandas as pd
+import numpy as np
+import calendar
+import json
+import os
+from datetime import date, timedelta
+
+PROMOTION_CALENDAR_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'promotion_calendar.json')
+
+ALL_CATEGORIES = 'All'
+
+# Written by the Admin Panel to data/output, headerless; rows saved before the
+# bonus multiplier was added have four fields and earn no extra points
+ADMIN_PROMOTIONS_FILENAME = 'special_day_promotions.csv'
+ADMIN_PROMOTION_COLUMNS = ['Special_Day', 'Category', 'Discount_Rate', 'Applied_Date', 'Bonus_Points_Multiplier']
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th given weekday (Mon=0) of a month"""
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7, weeks=n - 1)
+
+
+def _annual_date(month_day, year):
+    """MM-DD in a given year; 02-29 falls on 02-28 outside leap years"""
+    month, day = map(int, month_day.split('-'))
+    if (month, day) == (2, 29) and not calendar.isleap(year):
+        day = 28
+    return date(year, month, day)
+
+
+def _easter(year):
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def rule_dates(rule, year):
+    """
+    (start, end) dates of a calendar rule in a given year, both inclusive
+    Rule types:
+    - annual: fixed "MM-DD" start and end every year; an end before the
+      start falls in the next year (e.g. 12-26 to 01-05)
+    - nth_weekday: n-th weekday of a month (e.g. Black Friday), optionally
+      shifted by offset_days and widened by days_before / days_after
+    - easter: Easter Sunday, with the same optional shifts
+    - fixed: explicit "YYYY-MM-DD" start and end (one-off promotions)
+    """
+    rule_type = rule['type']
+    if rule_type == 'annual':
+        start = _annual_date(rule['start'], year)
+        end = _annual_date(rule['end'], year)
+        if end < start:
+            end = _annual_date(rule['end'], year + 1)
+        return start, end
+    if rule_type == 'fixed':
+        start, end = pd.Timestamp(rule['start']).date(), pd.Timestamp(rule['end']).date()
+        return (start, end) if start.year == year else None
+    if rule_type == 'nth_weekday':
+        anchor = _nth_weekday(year, rule['month'], rule['weekday'], rule['n'])
+    elif rule_type == 'easter':
+        anchor = _easter(year)
+    else:
+        raise ValueError(f"Unknown promotion rule type: {rule_type}")
+    anchor += timedelta(days=rule.get('offset_days', 0))
+    return anchor - timedelta(days=rule.get('days_before', 0)), anchor + timedelta(days=rule.get('days_after', 0))
+
+
+def load_special_day_names(config_path=PROMOTION_CALENDAR_PATH):
+    """Special days an admin can attach promotions to"""
+    with open(config_path) as f:
+        return list(json.load(f).get('special_days', {}).keys())
+
+
+def load_promotion_calendar(output_path='data/output', config_path=PROMOTION_CALENDAR_PATH):
+    """Config promotions plus the special day promotions saved by the Admin Panel"""
+    return PromotionCalendar.load(
+        config_path,
+        admin_promotions_path=os.path.join(output_path, ADMIN_PROMOTIONS_FILENAME)
+    )
+
+
+class PromotionCalendar:
+    """
+    Sorted interval arrays over promotion dates:
+    - Promotion rules are materialized into concrete intervals per year on demand
+    - Interval boundaries split the timeline into elementary segments over
+      which the active set is constant; each segment keeps its active
+      promotions (CSR layout) and its best multiplier/discount
+    - A batch of dates is mapped to segments with one searchsorted
+    """
+
+    def __init__(self, promotions, special_days=None, admin_promotions=None):
+        self.definitions = list(promotions)
+        self.special_days = dict(special_days or {})
+        self.years = set()
+        self.intervals = pd.DataFrame(columns=[
+            'Name', 'Category', 'Discount', 'Bonus_Points_Multiplier', 'Description', 'Source', 'Start', 'End'
+        ])
+
+        # Admin promotions name a special day; unknown days are skipped
+        self.admin_definitions = []
+        if admin_promotions is not None:
+            for _, promo in admin_promotions.iterrows():
+                rule = self.special_days.get(promo['Special_Day'])
+                if rule is None:
+                    continue
+                multiplier = promo.get('Bonus_Points_Multiplier')
+                multiplier = 1.0 if pd.isna(multiplier) else float(multiplier)
+                description = f"{promo['Discount_Rate']}% off {promo['Category']} for {promo['Special_Day']}"
+                if multiplier > 1.0:
+                    description += f", {multiplier:g}x points"
+                self.admin_definitions.append({
+                    'name': f"{promo['Special_Day']} - {promo['Category']}",
+                    'rule': rule,
+                    'category': promo['Category'],
+                    'discount': float(promo['Discount_Rate']) / 100,
+                    'bonus_points_multiplier': multiplier,
+                    'description': description,
+                    'source': 'Admin'
+                })
+        self._build_index()
+
+    @classmethod
+    def load(cls, config_path=PROMOTION_CALENDAR_PATH, admin_promotions_path=None):
+        """Load promotion rules from config, plus admin-created special day promotions if given"""
+        with open(config_path) as f:
+            config = json.load(f)
+
+        admin_promotions = None
+        if admin_promotions_path is not None and os.path.exists(admin_promotions_path):
+            # The admin panel appends rows without a header
+            admin_promotions = pd.read_csv(admin_promotions_path, header=None, names=ADMIN_PROMOTION_COLUMNS)
+        return cls(
+            config.get('promotions', []),
+            special_days=config.get('special_days', {}),
+            admin_promotions=admin_promotions
+        )
+
+    def _materialize(self, years):
+        """Concrete intervals of every promotion for the given years"""
+        rows = []
+        for definition in self.definitions + self.admin_definitions:
+            for year in years:
+                dates = rule_dates(definition['rule'], year)
+                if dates is None:
+                    continue
+                rows.append({
+                    'Name': definition['name'],
+                    'Category': definition.get('category', ALL_CATEGORIES),
+                    'Discount': definition.get('discount', 0.0),
+                    'Bonus_Points_Multiplier': definition.get('bonus_points_multiplier', 1.0),
+                    'Description': definition.get('description', ''),
+                    'Source': definition.get('source', 'Config'),
+                    'Start': pd.Timestamp(dates[0]),
+                    'End': pd.Timestamp(dates[1])
+                })
+        return pd.DataFrame(rows, columns=self.intervals.columns)
+
+    def _ensure_years(self, days):
+        """Materialize intervals for any year touched by the queried days"""
+        if len(days) == 0:
+            return
+        first, last = (pd.Timestamp(np.datetime64(int(d), 'D')).year for d in (days.min(), days.max()))
+        # One year of margin for intervals spanning a year boundary
+        missing = sorted(set(range(first - 1, last + 1)) - self.years)
+        if missing:
+            new_intervals = self._materialize(missing)
+            if len(new_intervals) > 0:
+                frames = [df for df in [self.intervals, new_intervals] if len(df) > 0]
+                self.intervals = pd.concat(frames, ignore_index=True)
+            self.years.update(missing)
+            self._build_index()
+
+    def _build_index(self):
+        """Elementary segments between interval boundaries and their active intervals"""
+        self.intervals = self.intervals.sort_values('Start', kind='stable').reset_index(drop=True)
+        starts = self.intervals['Start'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        ends = self.intervals['End'].to_numpy(dtype='datetime64[D]').astype(np.int64) + 1  # exclusive
+
+        self.boundaries = np.unique(np.concatenate([starts, ends]))
+        n_segments = max(len(self.boundaries) - 1, 0)
+        if n_segments == 0 or len(starts) == 0:
+            self.segment_offsets = np.zeros(1, dtype=np.int64)
+            self.segment_intervals = np.zeros(0, dtype=np.int64)
+            return
+
+        # Interval i covers segments [first_segment[i], last_segment[i])
+        first_segment = np.searchsorted(self.boundaries, starts)
+        last_segment = np.searchsorted(self.boundaries, ends)
+        counts = last_segment - first_segment
+        interval_ids = np.repeat(np.arange(len(starts)), counts)
+        segment_ids = np.repeat(first_segment, counts) + (
+            np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        )
+        order = np.lexsort((interval_ids, segment_ids))
+        self.segment_intervals = interval_ids[order]
+        self.segment_offsets = np.searchsorted(segment_ids[order], np.arange(n_segments + 1))
+
+    @staticmethod
+    def _to_days(dates):
+        return pd.to_datetime(pd.Series(np.asarray(dates))).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    def _segments(self, days):
+        """Segment of each day, -1 where no promotion can be active"""
+        segments = np.searchsorted(self.boundaries, days, side='right') - 1
+        outside = (segments < 0) | (segments >= len(self.segment_offsets) - 1)
+        return np.where(outside, -1, segments)
+
+    def active_for_dates(self, dates):
+        """
+        All (date, promotion) pairs for an array of dates
+        Returns a frame with Date_Index (position in dates) and the promotion columns
+        """
+        days = self._to_days(dates)
+        self._ensure_years(days)
+        segments = self._segments(days)
+
+        valid = np.flatnonzero(segments >= 0)
+        starts = self.segment_offsets[segments[valid]]
+        counts = self.segment_offsets[segments[valid] + 1] - starts
+        date_index = np.repeat(valid, counts)
+        positions = np.repeat(starts, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+        active = self.intervals.iloc[self.segment_intervals[positions]].reset_index(drop=True)
+        active.insert(0, 'Date_Index', date_index)
+        return active
+
+    def active_on(self, as_of):
+        """Promotions active on a single date"""
+        return self.active_for_dates([as_of]).drop(columns='Date_Index')
+
+    def multipliers_for_dates(self, dates, categories=None):
+        """
+        Best bonus-points multiplier per date (1.0 where nothing is active)
+        With categories (one per date), category promotions only apply to
+        matching items; 'All' promotions apply everywhere
+        """
+        active = self.active_for_dates(dates)
+        multipliers = np.ones(len(np.asarray(dates)))
+        if len(active) == 0:
+            return multipliers
+
+        if categories is not None:
+            item_categories = np.asarray(categories, dtype=object)[active['Date_Index'].to_numpy()]
+            applies = (active['Category'].to_numpy() == ALL_CATEGORIES) | (active['Category'].to_numpy() == item_categories)
+            active = active[applies]
+        else:
+            active = active[active['Category'] == ALL_CATEGORIES]
+
+        best = active.groupby('Date_Index')['Bonus_Points_Multiplier'].max()
+        multipliers[best.index.to_numpy()] = np.maximum(best.to_numpy(), 1.0)
+        return multipliers
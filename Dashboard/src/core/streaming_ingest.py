@@ -0,0 +1,239 @@
+"""
+Streaming Ingestion
+Reads the sales files in fixed-size chunks and folds them into mergeable
+partial aggregates, so peak memory is bounded by the chunk size plus the
+aggregate state rather than by the size of the files
+"""
+
+import os
+import pandas as pd
+from ticket_join import TicketIndex
+
+HEADER_COLUMNS = ['Ticket_ID', 'Cust_ID', 'Store_ID', 'Date', 'Total_Value']
+LINE_ITEM_COLUMNS = ['Ticket_ID', 'SKU', 'Qty', 'Rule_ID', 'Line_Total']
+
+# How partial results of each aggregation are combined
+_COMBINE = {'sum': 'sum', 'count': 'sum', 'max': 'max', 'min': 'min'}
+
+
+class MergeableAggregate:
+    """
+    Grouped aggregate that can be built chunk by chunk or merged with
+    another partial of the same spec (e.g. from another file or worker)
+    spec maps output column -> (source column, 'sum' | 'count' | 'max' | 'min')
+
+    Partials are buffered and combined with the state only once they hold
+    as many rows as the state, so each combine at most doubles the rows
+    it regroups and the total work stays linear in the rows folded in
+    """
+
+    def __init__(self, keys, spec):
+        self.keys = [keys] if isinstance(keys, str) else list(keys)
+        self.spec = spec
+        self._state = None
+        self._pending = []
+        self._pending_rows = 0
+
+    @property
+    def state(self):
+        """Combined aggregate indexed by the keys (None before any rows)"""
+        self._flush()
+        return self._state
+
+    def _flush(self):
+        if self._pending:
+            self._state = self._combine([self._state] + self._pending)
+            self._pending = []
+            self._pending_rows = 0
+
+    def _combine(self, partials):
+        partials = [df for df in partials if df is not None and len(df) > 0]
+        if not partials:
+            return None
+        combined = pd.concat(partials)
+        if len(partials) == 1:
+            return combined
+        how = {column: _COMBINE[agg] for column, (_, agg) in self.spec.items()}
+        return combined.groupby(level=list(range(len(self.keys)))).agg(how)
+
+    def _add(self, partial):
+        if partial is None or len(partial) == 0:
+            return
+        self._pending.append(partial)
+        self._pending_rows += len(partial)
+        if self._pending_rows >= (0 if self._state is None else len(self._state)):
+            self._flush()
+
+    def update(self, chunk):
+        """Fold one chunk of rows into the state"""
+        if len(chunk) == 0:
+            return self
+        self._add(chunk.groupby(self.keys).agg(**{
+            column: (source, agg) for column, (source, agg) in self.spec.items()
+        }))
+        return self
+
+    def merge(self, other):
+        """Merge another partial aggregate with the same keys and spec"""
+        self._add(other.state)
+        return self
+
+    def result(self):
+        """Final aggregate as a frame with the key columns"""
+        state = self.state
+        if state is None:
+            return pd.DataFrame(columns=self.keys + list(self.spec))
+        return state.reset_index()
+
+
+def rfm_aggregate():
+    """Per-customer recency/frequency/monetary state (from sales header)"""
+    return MergeableAggregate('Cust_ID', {
+        'Last_Purchase_Date': ('Date', 'max'),
+        'Frequency': ('Ticket_ID', 'count'),
+        'Monetary': ('Total_Value', 'sum'),
+    })
+
+
+def store_spend_aggregate():
+    """Per store and customer spend (from sales header)"""
+    return MergeableAggregate(['Store_ID', 'Cust_ID'], {
+        'Total_Value': ('Total_Value', 'sum'),
+    })
+
+
+def sku_sales_aggregate():
+    """Per-SKU units and revenue (from line items)"""
+    return MergeableAggregate('SKU', {
+        'Units_Sold': ('Qty', 'sum'),
+        'Revenue': ('Line_Total', 'sum'),
+    })
+
+
+def promo_metrics_aggregate():
+    """Per rule and store promotion metrics (from scored, joined line items)"""
+    return MergeableAggregate(['Rule_Name', 'Store_ID'], {
+        'Transaction_Count': ('Ticket_ID', 'count'),
+        'Sales_Uplift': ('Line_Total', 'sum'),
+        'Points_Activity': ('Points_Earned', 'sum'),
+        'Units_Sold': ('Qty', 'sum'),
+    })
+
+
+def customer_points_aggregate():
+    """Per-customer points and spend (from scored, joined line items)"""
+    return MergeableAggregate('Cust_ID', {
+        'Total_Points_Earned': ('Points_Earned', 'sum'),
+        'Transaction_Count': ('Ticket_ID', 'count'),
+        'Last_Purchase_Date': ('Date', 'max'),
+        'Total_Spent': ('Line_Total', 'sum'),
+    })
+
+
+def interaction_aggregate():
+    """Per customer and SKU quantity, spend and last purchase (from joined line items)"""
+    return MergeableAggregate(['Cust_ID', 'SKU'], {
+        'Qty': ('Qty', 'sum'),
+        'Spend': ('Line_Total', 'sum'),
+        'Last_Purchase_Date': ('Date', 'max'),
+        'Last_Ticket_ID': ('Ticket_ID', 'max'),
+    })
+
+
+class StreamingIngestor:
+    """
+    Chunked reader over sales_header.csv and sales_line_items.csv
+
+    Both files are written in Ticket_ID order, so line items are joined to
+    their header rows in lockstep: header chunks are pulled only as far as the
+    current line-item chunk needs, and header rows behind it are dropped.
+    Header aggregates see every header row exactly once; line aggregates see
+    line items joined with header columns (and optionally enriched by a
+    prepare function, e.g. rule multipliers and points).
+    """
+
+    def __init__(self, data_path, chunk_rows=500_000,
+                 header_columns=HEADER_COLUMNS, line_item_columns=LINE_ITEM_COLUMNS):
+        self.data_path = data_path
+        self.chunk_rows = chunk_rows
+        self.header_columns = list(header_columns)
+        self.line_item_columns = list(line_item_columns)
+        self.chunks_read = 0
+
+    def _read_chunks(self, filename, columns, parse_dates=None):
+        path = os.path.join(self.data_path, filename)
+        available = pd.read_csv(path, nrows=0).columns
+        return pd.read_csv(
+            path,
+            usecols=[c for c in columns if c in available],
+            parse_dates=parse_dates,
+            chunksize=self.chunk_rows
+        )
+
+    @staticmethod
+    def _check_order(chunk, previous_last, filename):
+        tickets = chunk['Ticket_ID']
+        if not tickets.is_monotonic_increasing or (previous_last is not None and tickets.iloc[0] < previous_last):
+            raise ValueError(f"{filename} must be sorted by Ticket_ID for streaming ingestion")
+        return tickets.iloc[-1]
+
+    def run(self, header_aggregates=None, line_aggregates=None, prepare=None):
+        """
+        Stream both files once
+        header_aggregates / line_aggregates: dicts of name -> MergeableAggregate
+        prepare: optional function applied to each joined line-item chunk
+        Returns a dict of name -> aggregate result frame
+        """
+        header_aggregates = header_aggregates or {}
+        line_aggregates = line_aggregates or {}
+
+        headers = self._read_chunks('sales_header.csv', self.header_columns, parse_dates=['Date'])
+        header_last = None
+        buffer = None
+        exhausted = False
+
+        def next_header_chunk():
+            nonlocal header_last
+            chunk = next(headers)
+            header_last = self._check_order(chunk, header_last, 'sales_header.csv')
+            for aggregate in header_aggregates.values():
+                aggregate.update(chunk)
+            self.chunks_read += 1
+            return chunk
+
+        if line_aggregates:
+            line_last = None
+            for lines in self._read_chunks('sales_line_items.csv', self.line_item_columns):
+                self.chunks_read += 1
+                line_last = self._check_order(lines, line_last, 'sales_line_items.csv')
+
+                # Pull header chunks until they cover the last ticket of this chunk
+                while not exhausted and (buffer is None or len(buffer) == 0 or buffer['Ticket_ID'].iloc[-1] < line_last):
+                    try:
+                        chunk = next_header_chunk()
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    buffer = chunk if buffer is None else pd.concat([buffer, chunk], ignore_index=True)
+
+                if buffer is None:
+                    break
+                joined = TicketIndex(buffer).attach(lines, [c for c in self.header_columns if c in buffer.columns])
+                if prepare is not None:
+                    joined = prepare(joined)
+                for aggregate in line_aggregates.values():
+                    aggregate.update(joined)
+
+                # Later line items can only reference line_last or higher
+                buffer = buffer[buffer['Ticket_ID'].to_numpy() >= line_last].reset_index(drop=True)
+
+        # Remaining header rows still feed the header aggregates
+        while not exhausted:
+            try:
+                next_header_chunk()
+            except StopIteration:
+                exhausted = True
+
+        results = {name: aggregate.result() for name, aggregate in header_aggregates.items()}
+        results.update({name: aggregate.result() for name, aggregate in line_aggregates.items()})
+        return results
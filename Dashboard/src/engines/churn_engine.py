@@ -0,0 +1,347 @@
+"""
+Churn Risk Engine
+Trained churn-probability model over RFM, tier, balance, category mix and
+inter-purchase gaps: features are per-customer array aggregations (no
+per-customer loops), inference runs in fixed-size batches and the fitted
+model is cached until the sales data changes
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import pickle
+from datetime import datetime
+from scipy import sparse
+from sklearn.ensemble import HistGradientBoostingClassifier
+from atomic_io import atomic_write_csv, atomic_write_pickle
+from interaction_matrix import load_interaction_matrix
+from streaming_ingest import StreamingIngestor, interaction_aggregate
+
+MODEL_FILENAME = 'churn_model.pkl'
+
+RISK_COLUMNS = [
+    'Customer_ID', 'Recency', 'Frequency', 'Monetary', 'R_Score', 'F_Score', 'M_Score',
+    'RFM_Segment', 'Churn_Probability', 'Risk_Level', 'Recommended_Action',
+    'Date_Identified', 'Bonus_Points_Offered'
+]
+
+# (minimum churn probability, risk level, recommended action, bonus points offered)
+RISK_LEVELS = [
+    (0.7, 'High', 'Re-engagement campaign with bonus points', 1000),
+    (0.5, 'Medium', 'Targeted offer on preferred categories', 500),
+]
+
+
+class ChurnRiskEngine:
+    """
+    Churn = no purchase within HORIZON_DAYS
+    - Training: features as of a cutoff HORIZON_DAYS before the latest sale,
+      labelled by whether each customer bought again after the cutoff;
+      balances and tiers are point-in-time values from the loyalty ledger
+      and category mix is streamed from tickets up to the cutoff, so no
+      feature sees the label window
+    - Scoring: the same features as of the latest sale (category mix from
+      the shared InteractionMatrix), predicted in batches of BATCH_SIZE
+    - The model is pickled with a fingerprint of the sales data and the
+      feature list, and reused while both are unchanged
+    """
+
+    # Days without a purchase that count as churned
+    HORIZON_DAYS = 30
+    # Rolling windows (days before the as-of date) for recent activity features
+    WINDOWS = (30, 90)
+    # Customers per predict_proba call
+    BATCH_SIZE = 500_000
+    # Minimum churn probability for risk_customers.csv
+    RISK_THRESHOLD = 0.5
+
+    def __init__(self, data_path="data/input", output_path="data/output", chunk_rows=500_000):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.chunk_rows = chunk_rows
+        self.model_path = os.path.join(output_path, MODEL_FILENAME)
+        self.sales_header_df = None
+        self.interaction_matrix = None
+        self.loyalty_engine = None
+        self.categories = None
+        self.sku_categories = None
+        self.model = None
+        self.feature_names = None
+        self.horizon_days = None
+        self.source_fingerprint = None
+        self.scores_df = None
+        self.risk_df = None
+
+    def load_data(self, sales_header_df=None, products_df=None, interaction_matrix=None, loyalty_engine=None):
+        """
+        Use already loaded frames/engines where given, reading the rest from data_path
+        loyalty_engine (optional) supplies point-in-time balances and tiers
+        """
+        try:
+            if sales_header_df is None:
+                sales_header_df = pd.read_csv(
+                    os.path.join(self.data_path, 'sales_header.csv'),
+                    usecols=['Ticket_ID', 'Cust_ID', 'Date', 'Total_Value'], parse_dates=['Date']
+                )
+            if products_df is None:
+                products_df = pd.read_csv(os.path.join(self.data_path, 'products_master.csv'))
+            if interaction_matrix is None:
+                interaction_matrix = load_interaction_matrix(self.data_path, self.output_path, chunk_rows=self.chunk_rows)
+        except Exception as e:
+            print(f"Error loading churn data: {e}")
+            return False
+
+        self.sales_header_df = sales_header_df
+        self.interaction_matrix = interaction_matrix
+        self.loyalty_engine = loyalty_engine
+        categories = products_df.drop_duplicates('SKU').set_index('SKU')['Category']
+        self.categories = pd.Index(sorted(categories.dropna().unique()))
+        self.sku_categories = categories
+        return True
+
+    def _latest_date(self):
+        return self.sales_header_df['Date'].max().to_datetime64().astype('datetime64[D]')
+
+    def _horizon(self):
+        """HORIZON_DAYS, shortened to half the sales history when that is shorter"""
+        dates = self.sales_header_df['Date']
+        span = (dates.max() - dates.min()).days
+        return int(max(1, min(self.HORIZON_DAYS, span // 2)))
+
+    def _fingerprint(self):
+        """Sales data and feature set a model was fitted on"""
+        header = self.sales_header_df
+        return (
+            int(header['Ticket_ID'].max()), len(header), str(self._latest_date()),
+            self._horizon(), tuple(self._feature_names()),
+            tuple(int(v) for v in self.interaction_matrix.version())
+        )
+
+    def _feature_names(self):
+        names = ['Recency', 'Frequency', 'Monetary', 'Avg_Ticket', 'Tenure_Days',
+                 'Gap_Mean', 'Gap_Std', 'Gap_Max', 'Recency_Gap_Ratio']
+        for window in self.WINDOWS:
+            names += [f'Frequency_{window}D', f'Monetary_{window}D']
+        if self.loyalty_engine is not None:
+            names += ['Balance', 'Tier_Rank']
+        return names + [f'Mix_{category}' for category in self.categories]
+
+    def _ticket_features(self, as_of):
+        """
+        RFM, inter-purchase gap and rolling window features from the sales
+        header up to as_of: one sort by (customer, date), then bincount and
+        reduceat over the customer groups
+        """
+        header = self.sales_header_df
+        dates = header['Date'].to_numpy(dtype='datetime64[D]')
+        keep = dates <= as_of
+        codes, customers = pd.factorize(header['Cust_ID'].to_numpy()[keep])
+        days_ago = (as_of - dates[keep]).astype(np.int64)
+        values = header['Total_Value'].to_numpy(dtype='float64')[keep]
+
+        # Oldest ticket first within each customer
+        order = np.lexsort((-days_ago, codes))
+        codes, days_ago, values = codes[order], days_ago[order], values[order]
+        n = len(customers)
+        frequency = np.bincount(codes, minlength=n)
+        starts = np.concatenate([[0], np.cumsum(frequency)[:-1]])
+        ends = starts + frequency - 1
+
+        features = {
+            'Recency': days_ago[ends].astype('float64'),
+            'Frequency': frequency.astype('float64'),
+            'Monetary': np.bincount(codes, weights=values, minlength=n),
+            'Tenure_Days': days_ago[starts].astype('float64'),
+        }
+        features['Avg_Ticket'] = features['Monetary'] / frequency
+
+        # Gaps between consecutive purchases of the same customer
+        same = codes[1:] == codes[:-1]
+        gaps = (days_ago[:-1] - days_ago[1:])[same].astype('float64')
+        gap_codes = codes[1:][same]
+        gap_count = frequency - 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            gap_mean = np.bincount(gap_codes, weights=gaps, minlength=n) / gap_count
+            gap_var = np.bincount(gap_codes, weights=gaps * gaps, minlength=n) / gap_count - gap_mean ** 2
+        gap_max = np.full(n, np.nan)
+        has_gaps = gap_count > 0
+        if has_gaps.any():
+            gap_starts = np.concatenate([[0], np.cumsum(gap_count)[:-1]])
+            gap_max[has_gaps] = np.maximum.reduceat(gaps, gap_starts[has_gaps])
+        features['Gap_Mean'] = gap_mean
+        features['Gap_Std'] = np.sqrt(np.maximum(gap_var, 0))
+        features['Gap_Max'] = gap_max
+        # How overdue the next purchase is relative to the customer's own rhythm
+        features['Recency_Gap_Ratio'] = features['Recency'] / np.maximum(gap_mean, 1)
+
+        for window in self.WINDOWS:
+            recent = days_ago < window
+            features[f'Frequency_{window}D'] = np.bincount(codes[recent], minlength=n).astype('float64')
+            features[f'Monetary_{window}D'] = np.bincount(codes[recent], weights=values[recent], minlength=n)
+
+        return pd.DataFrame(features, index=pd.Index(customers, name='Cust_ID'))
+
+    def _category_mix(self, customers, skus, spend):
+        """Share of spend per category from a customer x SKU spend matrix"""
+        category_codes = self.categories.get_indexer(self.sku_categories.reindex(skus).to_numpy())
+        known = np.flatnonzero(category_codes >= 0)
+        category_map = sparse.csr_matrix(
+            (np.ones(len(known)), (known, category_codes[known])), shape=(len(skus), len(self.categories))
+        )
+        category_spend = np.asarray((spend @ category_map).todense())
+        totals = category_spend.sum(axis=1, keepdims=True)
+        shares = np.divide(category_spend, totals, out=np.zeros_like(category_spend), where=totals > 0)
+        return pd.DataFrame(
+            shares, index=pd.Index(customers, name='Cust_ID'),
+            columns=[f'Mix_{category}' for category in self.categories]
+        )
+
+    def _category_mix_as_of(self, as_of):
+        """Category mix from line items of tickets dated up to as_of (one streaming pass)"""
+        cutoff = pd.Timestamp(as_of)
+        pairs = StreamingIngestor(self.data_path, chunk_rows=self.chunk_rows).run(
+            line_aggregates={'pairs': interaction_aggregate()},
+            prepare=lambda chunk: chunk[chunk['Date'] <= cutoff]
+        )['pairs']
+        cust_codes, customers = pd.factorize(pairs['Cust_ID'].to_numpy())
+        sku_codes, skus = pd.factorize(pairs['SKU'].to_numpy())
+        spend = sparse.csr_matrix(
+            (pairs['Spend'].to_numpy(dtype='float64'), (cust_codes, sku_codes)), shape=(len(customers), len(skus))
+        )
+        return self._category_mix(customers, skus, spend)
+
+    def build_features(self, as_of=None):
+        """
+        Feature frame indexed by Cust_ID for customers with a purchase on or
+        before as_of (defaults to the latest sale, using the interaction matrix
+        for category mix)
+        """
+        latest = self._latest_date()
+        as_of = latest if as_of is None else np.datetime64(pd.Timestamp(as_of).date(), 'D')
+        features = self._ticket_features(as_of)
+
+        if as_of >= latest:
+            matrix = self.interaction_matrix
+            mix = self._category_mix(matrix.customers, matrix.skus, matrix.spend)
+        else:
+            mix = self._category_mix_as_of(as_of)
+        features = features.join(mix).fillna({column: 0.0 for column in mix.columns})
+
+        if self.loyalty_engine is not None:
+            balances = self.loyalty_engine.get_balances_as_of(features.index.to_numpy(), pd.Timestamp(as_of))
+            tier_rank = pd.Index(self.loyalty_engine.tier_names).get_indexer(balances['Loyalty_Tier'])
+            features['Balance'] = balances['Balance'].to_numpy()
+            features['Tier_Rank'] = tier_rank.astype('float64')
+
+        return features.reindex(columns=self._feature_names(), fill_value=0.0)
+
+    def training_set(self):
+        """Features as of the cutoff and churn labels (1 = no purchase within the horizon after it)"""
+        horizon = self._horizon()
+        cutoff = self._latest_date() - np.timedelta64(horizon, 'D')
+        features = self.build_features(as_of=cutoff)
+
+        dates = self.sales_header_df['Date'].to_numpy(dtype='datetime64[D]')
+        returned = pd.unique(self.sales_header_df['Cust_ID'].to_numpy()[dates > cutoff])
+        labels = (~features.index.isin(returned)).astype(np.int8)
+        return features, labels
+
+    def fit(self):
+        """Fit the gradient boosting classifier on the cutoff training set"""
+        features, labels = self.training_set()
+        if len(np.unique(labels)) < 2:
+            raise ValueError("Churn model needs both returning and churned customers in the training window")
+
+        # Gradient boosting handles the missing gap features of one-purchase customers natively
+        self.model = HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=0)
+        self.model.fit(features.to_numpy(), labels)
+        self.feature_names = list(features.columns)
+        self.horizon_days = self._horizon()
+        self.source_fingerprint = self._fingerprint()
+        return self
+
+    def save(self):
+        """Persist the fitted model with its feature list and data fingerprint"""
+        return atomic_write_pickle(self.model_path, {
+            'model': self.model,
+            'feature_names': self.feature_names,
+            'horizon_days': self.horizon_days,
+            'fingerprint': self.source_fingerprint,
+        })
+
+    def load_model(self):
+        """Load a persisted model; returns False if missing, unreadable or fitted on other data"""
+        if not os.path.exists(self.model_path):
+            return False
+        try:
+            with open(self.model_path, 'rb') as f:
+                artifact = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading churn model: {e}")
+            return False
+        if artifact.get('fingerprint') != self._fingerprint():
+            return False
+        self.model = artifact['model']
+        self.feature_names = artifact['feature_names']
+        self.horizon_days = artifact['horizon_days']
+        self.source_fingerprint = artifact['fingerprint']
+        return True
+
+    def load_or_fit(self):
+        """Reuse the persisted model when the sales data is unchanged, else fit and save it"""
+        if self.sales_header_df is None and not self.load_data():
+            return False
+        if not self.load_model():
+            self.fit()
+            self.save()
+        return True
+
+    def score(self, batch_size=None):
+        """
+        Churn probability of every customer as of the latest sale
+        Returns Cust_ID, Churn_Probability (predicted in batches of batch_size rows)
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        features = self.build_features()
+        values = features[self.feature_names].to_numpy()
+        probabilities = np.empty(len(values))
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            probabilities[start:start + batch_size] = self.model.predict_proba(batch)[:, 1]
+
+        self.scores_df = pd.DataFrame({
+            'Cust_ID': features.index.to_numpy(),
+            'Churn_Probability': np.round(probabilities, 4)
+        })
+        return self.scores_df
+
+    def risk_customers(self, rfm_df, threshold=None):
+        """
+        RFM rows of customers whose churn probability reaches threshold,
+        most likely to churn first, with risk level, action and bonus offer
+        """
+        threshold = self.RISK_THRESHOLD if threshold is None else threshold
+        if self.scores_df is None:
+            self.score()
+
+        probabilities = self.scores_df.set_index('Cust_ID')['Churn_Probability']
+        risk = rfm_df.assign(Churn_Probability=probabilities.reindex(rfm_df['Customer_ID']).to_numpy())
+        risk = risk[risk['Churn_Probability'] >= threshold].sort_values('Churn_Probability', ascending=False)
+
+        minimums = np.array([minimum for minimum, _, _, _ in RISK_LEVELS])
+        levels = np.searchsorted(-minimums, -risk['Churn_Probability'].to_numpy(), side='left')
+        levels = np.minimum(levels, len(RISK_LEVELS) - 1)
+        risk['Risk_Level'] = np.array([level for _, level, _, _ in RISK_LEVELS])[levels]
+        risk['Recommended_Action'] = np.array([action for _, _, action, _ in RISK_LEVELS])[levels]
+        risk['Bonus_Points_Offered'] = np.array([points for _, _, _, points in RISK_LEVELS])[levels]
+        risk['Date_Identified'] = datetime.now().strftime('%Y-%m-%d')
+        self.risk_df = risk.reindex(columns=RISK_COLUMNS).reset_index(drop=True)
+        return self.risk_df
+
+    def update_risk_csv(self, filename='risk_customers.csv'):
+        """Write the last risk customer list to data/output"""
+        if self.risk_df is not None:
+            csv_path = os.path.join(self.output_path, filename)
+            atomic_write_csv(self.risk_df, csv_path)
+            return csv_path
+        return None
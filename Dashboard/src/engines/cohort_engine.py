@@ -0,0 +1,233 @@
+"""
+Cohort Retention Engine
+Customers bucketed by enrollment month; active customers, orders and
+revenue per cohort x months-since-enrollment cell from one groupby over
+integer month codes, refreshed incrementally as new months of sales arrive
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import json
+from atomic_io import atomic_write_csv, atomic_write_json
+
+METRICS = ['Retention_Rate', 'Active_Customers', 'Orders', 'Revenue', 'Revenue_Per_Customer']
+
+
+def month_codes(dates):
+    """Integer month codes (year * 12 + month - 1) of a date array"""
+    months = pd.to_datetime(dates).to_numpy(dtype='datetime64[M]')
+    return months.astype(np.int64) + 1970 * 12
+
+
+def month_labels(codes):
+    """'YYYY-MM' labels of integer month codes"""
+    return (np.asarray(codes, dtype=np.int64) - 1970 * 12).astype('datetime64[M]').astype(str)
+
+
+def _frame_hash(df):
+    """Order-independent hash of a frame's rows (sum of row hashes modulo 2**64)"""
+    return int(pd.util.hash_pandas_object(df, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+def sales_hash(header_df):
+    """Order-independent hash of the ticket fields the cells are built from (Cust_ID, Date, Total_Value)"""
+    return _frame_hash(pd.DataFrame({
+        'Cust_ID': header_df['Cust_ID'].astype(str).to_numpy(),
+        'Day': pd.to_datetime(header_df['Date']).to_numpy(dtype='datetime64[D]').astype(np.int64),
+        'Total_Value': header_df['Total_Value'].to_numpy(dtype='float64'),
+    }))
+
+
+class CohortRetentionEngine:
+    """
+    Cohort x months-since-enrollment matrices:
+    - Every ticket gets integer month codes for its date and its customer's
+      enrollment; age = purchase month - enrollment month
+    - Cells are one groupby over (cohort, age) of the customer-month
+      activity rows, so active customers are distinct per cell
+    - Each cell belongs to exactly one calendar month (cohort + age), so a
+      refresh only recomputes the last (possibly partial) month and any newer
+      months; earlier cells are final
+    - The saved cells carry a fingerprint of the customer cohorts and of the
+      tickets before last_month; load_or_build resumes from them only if the
+      current data still matches it, else it builds from scratch
+    """
+
+    def __init__(self, data_path="data/input", output_path="data/output"):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.cells_path = os.path.join(output_path, 'cohort_retention.csv')
+        self.fingerprint_path = os.path.join(output_path, 'cohort_retention.fingerprint.json')
+        self.customers_df = None
+        self.cohort_sizes = None
+        self.cells = None
+        self.last_month = None
+        self.fingerprint = None
+
+    def load_data(self, customers_df=None):
+        """Cohort of every customer from customers_master.Enrollment_Date"""
+        try:
+            if customers_df is None:
+                customers_df = pd.read_csv(os.path.join(self.data_path, 'customers_master.csv'))
+        except Exception as e:
+            print(f"Error loading customers: {e}")
+            return False
+
+        cust_col = 'Cust_ID' if 'Cust_ID' in customers_df.columns else 'Customer_ID'
+        customers = customers_df.dropna(subset=['Enrollment_Date']).drop_duplicates(cust_col)
+        self.customers_df = pd.DataFrame({
+            'Cohort_Code': month_codes(customers['Enrollment_Date'])
+        }, index=pd.Index(customers[cust_col].to_numpy(), name='Cust_ID'))
+        self.cohort_sizes = self.customers_df['Cohort_Code'].value_counts().sort_index()
+        return True
+
+    def _customers_hash(self):
+        return _frame_hash(pd.DataFrame({
+            'Cust_ID': self.customers_df.index.astype(str).to_numpy(),
+            'Cohort_Code': self.customers_df['Cohort_Code'].to_numpy(),
+        }))
+
+    def _fingerprint(self, sales_header_df, last_month):
+        """Customer cohorts plus the tickets before last_month: the data behind the final cells"""
+        before = sales_header_df[month_codes(sales_header_df['Date']) < last_month]
+        return {
+            'last_month': int(last_month),
+            'customers': self._customers_hash(),
+            'sales_rows': len(before),
+            'sales': sales_hash(before),
+        }
+
+    def _month_cells(self, header_df):
+        """Cells of the calendar months covered by header_df (Cust_ID, Date, Total_Value)"""
+        positions = self.customers_df.index.get_indexer(header_df['Cust_ID'].to_numpy())
+        purchase_month = month_codes(header_df['Date'])
+        cohort = self.customers_df['Cohort_Code'].to_numpy()[positions]
+        # Customers missing from the master (or buying before enrollment) have no cohort cell
+        valid = (positions >= 0) & (purchase_month >= cohort)
+
+        activity = pd.DataFrame({
+            'Customer': positions[valid],
+            'Cohort_Code': cohort[valid],
+            'Months_Since_Enrollment': (purchase_month - cohort)[valid],
+            'Revenue': header_df['Total_Value'].to_numpy(dtype='float64')[valid],
+        })
+        cells = activity.groupby(['Cohort_Code', 'Months_Since_Enrollment']).agg(
+            Active_Customers=('Customer', 'nunique'),
+            Orders=('Customer', 'size'),
+            Revenue=('Revenue', 'sum'),
+        ).reset_index()
+        return cells
+
+    def build(self, sales_header_df):
+        """All cells from the full sales header"""
+        self.cells = self._month_cells(sales_header_df)
+        self.last_month = int(month_codes(sales_header_df['Date']).max()) if len(sales_header_df) else None
+        self.fingerprint = self._fingerprint(sales_header_df, self.last_month) if self.last_month is not None else None
+        return self.cells
+
+    def refresh(self, sales_header_df):
+        """
+        Recompute only the cells of the last built month and later months
+        from sales_header_df (which must include all tickets of those months)
+        Returns the number of calendar months recomputed
+        """
+        if self.cells is None or self.last_month is None:
+            self.build(sales_header_df)
+            return len(np.unique(month_codes(sales_header_df['Date'])))
+
+        open_month_start = np.datetime64(month_labels([self.last_month])[0], 'D')
+        recent = sales_header_df[sales_header_df['Date'].to_numpy(dtype='datetime64[D]') >= open_month_start]
+        if len(recent) == 0:
+            return 0
+
+        calendar_month = self.cells['Cohort_Code'] + self.cells['Months_Since_Enrollment']
+        new_cells = self._month_cells(recent)
+        self.cells = pd.concat([self.cells[calendar_month < self.last_month], new_cells], ignore_index=True)
+        self.cells = self.cells.sort_values(['Cohort_Code', 'Months_Since_Enrollment']).reset_index(drop=True)
+        months = month_codes(recent['Date'])
+        refreshed = int(months.max()) - self.last_month + 1
+        last_month = max(self.last_month, int(months.max()))
+        if self.fingerprint is not None:
+            # Tickets of months that just became final join the fingerprint
+            closed = recent[months < last_month]
+            self.fingerprint = {
+                'last_month': last_month,
+                'customers': self.fingerprint['customers'],
+                'sales_rows': self.fingerprint['sales_rows'] + len(closed),
+                'sales': (self.fingerprint['sales'] + sales_hash(closed)) % 2 ** 64,
+            }
+        self.last_month = last_month
+        return refreshed
+
+    def load_or_build(self, sales_header_df):
+        """
+        Start from the saved cells and refresh them when their fingerprint
+        matches the current customers and sales, else build from scratch
+        """
+        if self.customers_df is None and not self.load_data():
+            return False
+        if self.cells is None:
+            self._load_saved_cells(sales_header_df)
+        self.refresh(sales_header_df)
+        return True
+
+    def _load_saved_cells(self, sales_header_df):
+        """Saved cells if present and built from the same data before their last month; returns True if used"""
+        if not (os.path.exists(self.cells_path) and os.path.exists(self.fingerprint_path)):
+            return False
+        with open(self.fingerprint_path, encoding='utf-8') as f:
+            fingerprint = json.load(f)
+        if fingerprint != self._fingerprint(sales_header_df, fingerprint['last_month']):
+            return False
+
+        saved = pd.read_csv(self.cells_path)
+        self.cells = pd.DataFrame({
+            'Cohort_Code': month_codes(saved['Cohort']),
+            'Months_Since_Enrollment': saved['Months_Since_Enrollment'].astype(np.int64),
+            'Active_Customers': saved['Active_Customers'].astype(np.int64),
+            'Orders': saved['Orders'].astype(np.int64),
+            'Revenue': saved['Revenue'].astype('float64'),
+        })
+        self.last_month = fingerprint['last_month']
+        self.fingerprint = fingerprint
+        return True
+
+    def cohort_table(self):
+        """Cells with cohort labels, cohort sizes and per-cell rates"""
+        cells = self.cells
+        sizes = self.cohort_sizes.reindex(cells['Cohort_Code']).fillna(0).to_numpy()
+        table = pd.DataFrame({
+            'Cohort': month_labels(cells['Cohort_Code']),
+            'Months_Since_Enrollment': cells['Months_Since_Enrollment'].to_numpy(),
+            'Cohort_Size': sizes.astype(np.int64),
+            'Active_Customers': cells['Active_Customers'].to_numpy(),
+            'Orders': cells['Orders'].to_numpy(),
+            'Revenue': cells['Revenue'].round(2).to_numpy(),
+        })
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['Retention_Rate'] = np.round(table['Active_Customers'] / np.where(sizes > 0, sizes, np.nan), 4)
+            table['Revenue_Per_Customer'] = np.round(table['Revenue'] / table['Active_Customers'], 2)
+        return table
+
+    def matrix(self, metric='Retention_Rate'):
+        """Cohort x months-since-enrollment matrix of one metric (NaN where no activity)"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown cohort metric {metric!r}; expected one of {METRICS}")
+        table = self.cohort_table()
+        return table.pivot(index='Cohort', columns='Months_Since_Enrollment', values=metric).sort_index()
+
+    def update_cohort_csv(self):
+        """
+        Write the cells (long format) and their fingerprint to data/output;
+        load_or_build resumes from them. The old fingerprint is removed
+        first, so an interrupted save leads to a rebuild, not a stale resume
+        """
+        if self.cells is not None:
+            if os.path.exists(self.fingerprint_path):
+                os.remove(self.fingerprint_path)
+            atomic_write_csv(self.cohort_table(), self.cells_path)
+            if self.fingerprint is not None:
+                atomic_write_json(self.fingerprint_path, self.fingerprint)
+            return self.cells_path
+        return None
@@ -7,7 +7,11 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+from atomic_io import atomic_write_csv
+from promotion_calendar import load_promotion_calendar, PROMOTION_CALENDAR_PATH
+from instrumentation import instrument_class
 
+@instrument_class
 class DynamicRulesEngine:
     """
     Dynamic Business Rules Engine:
@@ -19,14 +23,18 @@ class DynamicRulesEngine:
     - CSV persistence
     """
     
-    def __init__(self, data_path="SampleData"):
+    def __init__(self, data_path="SampleData", calendar_path=PROMOTION_CALENDAR_PATH, output_path="data/output"):
         self.data_path = data_path
+        self.output_path = output_path
+        self.calendar_path = calendar_path
+        self.promotion_calendar = None
         self.products_df = None
         self.customers_df = None
         self.sales_header_df = None
         self.sales_line_items_df = None
         self.customer_balances_df = None
         self.recommendations_df = None
+        self.customer_value_df = None
         self.current_date = datetime.now()
         
     def load_data(self):
@@ -163,73 +171,30 @@ class DynamicRulesEngine:
     # RULE 4: SPECIAL DATE PROMOTIONS
     # ============================================================================
     
+    def get_promotion_calendar(self):
+        """
+        Promotion calendar from config/promotion_calendar.json plus the
+        special day promotions created in the admin panel
+        """
+        if self.promotion_calendar is None:
+            self.promotion_calendar = load_promotion_calendar(self.output_path, self.calendar_path)
+        return self.promotion_calendar
+    
     def get_special_date_promotions(self):
         """
         Return active promotions based on special dates
         Examples: New Year, Republic Day, etc.
         """
-        month = self.current_date.month
-        day = self.current_date.day
-        
-        promotions = []
-        
-        # Republic Day (Jan 26)
-        if month == 1 and day >= 20 and day <= 26:
-            promotions.append({
-                'name': 'Republic Day Special',
-                'discount': 0.15,  # 15% discount
-                'bonus_points_multiplier': 2.0,  # 2x bonus points
-                'description': 'Celebrate India! 15% off + 2x points on all products'
-            })
-        
-        # Independence Day (Aug 15)
-        if month == 8 and day >= 10 and day <= 15:
-            promotions.append({
-                'name': 'Independence Day Sale',
-                'discount': 0.20,  # 20% discount
-                'bonus_points_multiplier': 2.5,  # 2.5x bonus points
-                'description': 'Freedom Sale! 20% off + 2.5x points on all products'
-            })
-        
-        # New Year (Jan 1)
-        if month == 1 and day >= 1 and day <= 5:
-            promotions.append({
-                'name': 'New Year Bonanza',
-                'discount': 0.25,  # 25% discount
-                'bonus_points_multiplier': 3.0,  # 3x bonus points
-                'description': 'New Year, New Rewards! 25% off + 3x points on all products'
-            })
-        
-        # Diwali (Oct 29 in 2026)
-        if month == 10 and day >= 25 and day <= 31:
-            promotions.append({
-                'name': 'Diwali Festival',
-                'discount': 0.30,  # 30% discount
-                'bonus_points_multiplier': 3.5,  # 3.5x bonus points
-                'description': 'Diwali Lights! 30% off + 3.5x points on all products'
-            })
-        
-        # Black Friday (Last Friday of Nov)
-        if month == 11:
-            from datetime import date
-            black_friday = self._get_black_friday_date(self.current_date.year)
-            if (black_friday - timedelta(days=1)).date() <= self.current_date.date() <= (black_friday + timedelta(days=1)).date():
-                promotions.append({
-                    'name': 'Black Friday Mega Sale',
-                    'discount': 0.40,  # 40% discount
-                    'bonus_points_multiplier': 4.0,  # 4x bonus points
-                    'description': 'Black Friday! 40% off + 4x points on selected items'
-                })
-        
-        return promotions
-    
-    def _get_black_friday_date(self, year):
-        """Get Black Friday (4th Friday of November)"""
-        from datetime import date
-        november_1 = date(year, 11, 1)
-        first_friday = november_1 + timedelta(days=(4 - november_1.weekday()))
-        black_friday = first_friday + timedelta(weeks=3)
-        return black_friday
+        active = self.get_promotion_calendar().active_on(self.current_date)
+        return [
+            {
+                'name': promo['Name'],
+                'discount': promo['Discount'],
+                'bonus_points_multiplier': promo['Bonus_Points_Multiplier'],
+                'description': promo['Description']
+            }
+            for promo in active.to_dict('records')
+        ]
     
     # ============================================================================
     # RULE 5: RFM-BASED RETENTION STRATEGIES
@@ -283,15 +248,21 @@ class DynamicRulesEngine:
     # RULE 6: GENERATE DYNAMIC CUSTOMER RECOMMENDATIONS
     # ============================================================================
     
+    def set_customer_value(self, clv_df):
+        """Predicted lifetime values (Cust_ID, Predicted_CLV, CLV_Tier) for the recommendation rules"""
+        self.customer_value_df = clv_df.set_index('Cust_ID')[['Predicted_CLV', 'CLV_Tier']]
+    
     def generate_customer_recommendations(self):
         """
         Generate real-time recommendations for each customer
-        Based on: RFM segment, inactivity, loyalty tier
+        Based on: RFM segment, inactivity, loyalty tier and predicted CLV
+        (inactive customers with a high predicted CLV get double bonus points)
         """
         recommendations = []
         
-        # Get inactive customers
-        inactive = self.identify_inactive_customers(days_inactive=30)
+        # Get inactive customers, indexed for per-customer lookups
+        inactive = self.identify_inactive_customers(days_inactive=30).set_index('Cust_ID')
+        customer_value = self.customer_value_df
         
         # Get RFM info (merge with customer balances)
         rfm_data = self.customer_balances_df.copy()
@@ -313,9 +284,15 @@ class DynamicRulesEngine:
                 'Action': ''
             }
             
+            clv_tier = None
+            if customer_value is not None and cust_id in customer_value.index:
+                recommendation['Predicted_CLV'] = customer_value.at[cust_id, 'Predicted_CLV']
+                clv_tier = customer_value.at[cust_id, 'CLV_Tier']
+                recommendation['CLV_Tier'] = clv_tier
+            
             # Check if inactive
-            if cust_id in inactive['Cust_ID'].values:
-                inactive_row = inactive[inactive['Cust_ID'] == cust_id].iloc[0]
+            if cust_id in inactive.index:
+                inactive_row = inactive.loc[cust_id]
                 days_inactive = inactive_row['Days_Inactive']
                 bonus = inactive_row['Bonus_Points_Offer']
                 
@@ -323,6 +300,11 @@ class DynamicRulesEngine:
                 recommendation['Bonus_Points'] = int(bonus)
                 recommendation['Discount_Offer'] = 0.15
                 recommendation['Action'] = 'Send re-engagement email with offer'
+                
+                # High future value is worth a stronger win-back offer
+                if clv_tier == 'High':
+                    recommendation['Bonus_Points'] = int(bonus) * 2
+                    recommendation['Action'] = 'Priority: high predicted CLV - send re-engagement offer'
             
             # RFM-based recommendations
             elif segment == 'Champion':
@@ -458,14 +440,14 @@ class DynamicRulesEngine:
         """Update products CSV with discounts and pricing"""
         products_with_discounts = self.apply_dynamic_discounts()
         csv_path = os.path.join(self.data_path, 'products_master_dynamic.csv')
-        products_with_discounts.to_csv(csv_path, index=False)
+        atomic_write_csv(products_with_discounts, csv_path)
         return csv_path
     
     def update_recommendations_csv(self):
         """Save recommendations to CSV for dashboard consumption"""
         if self.recommendations_df is not None:
             csv_path = os.path.join(self.data_path, 'customer_recommendations_dynamic.csv')
-            self.recommendations_df.to_csv(csv_path, index=False)
+            atomic_write_csv(self.recommendations_df, csv_path)
             return csv_path
         return None
     
@@ -514,7 +496,7 @@ class DynamicRulesEngine:
         
         suggestions_df = pd.DataFrame(suggestion_records)
         csv_path = os.path.join(self.data_path, 'dashboard_suggestions_dynamic.csv')
-        suggestions_df.to_csv(csv_path, index=False)
+        atomic_write_csv(suggestions_df, csv_path)
         return csv_path
     
     def update_all_dynamic_rules(self):
@@ -0,0 +1,195 @@
+"""
+Market Basket Engine
+"Bought X, also bought Y" association rules over sales_line_items: pair
+supports come from sparse ticket x item products accumulated chunk by chunk,
+so no Python loop ever runs over tickets
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from scipy import sparse
+from atomic_io import atomic_write_csv
+from streaming_ingest import StreamingIngestor
+
+RULE_COLUMNS = [
+    'Antecedent', 'Consequent', 'Antecedent_Category', 'Consequent_Category',
+    'Pair_Tickets', 'Support', 'Confidence', 'Lift'
+]
+
+
+class MarketBasketEngine:
+    """
+    Pairwise association rules at SKU and category level:
+    - Line items are read in chunks; each chunk becomes a binary ticket x SKU
+      CSR matrix B (and ticket x category B @ M), and co-occurrence counts
+      accumulate as B.T @ B, so memory is bounded by the chunk size plus the
+      item x item count matrix
+    - A ticket split across chunk boundaries is carried into the next chunk
+    - Counting happens once; rules(min_support, min_confidence, min_lift)
+      only filters the counts, so thresholds can be changed interactively
+    """
+
+    DEFAULT_MIN_SUPPORT = 0.01
+    DEFAULT_MIN_CONFIDENCE = 0.1
+    DEFAULT_MIN_LIFT = 1.0
+
+    def __init__(self, data_path="data/input", output_path="data/output", chunk_rows=2_000_000):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.chunk_rows = chunk_rows
+        self.products_df = None
+        self.skus = None
+        self.categories = None
+        self.sku_categories = None
+        self.ticket_count = 0
+        self.counts = {}
+        self.rules_df = None
+
+    def load_data(self):
+        """Load the product master (SKU vocabulary and categories)"""
+        try:
+            self.products_df = pd.read_csv(os.path.join(self.data_path, 'products_master.csv'))
+        except Exception as e:
+            print(f"Error loading products: {e}")
+            return False
+
+        self.skus = pd.Index(self.products_df['SKU'].unique())
+        categories = self.products_df.drop_duplicates('SKU').set_index('SKU')['Category'].reindex(self.skus)
+        category_codes, self.categories = pd.factorize(categories.fillna('Unknown'))
+        self.categories = pd.Index(self.categories)
+        self.sku_categories = category_codes
+        return True
+
+    def _extend_skus(self, skus):
+        """Add SKUs missing from the product master (category 'Unknown')"""
+        unseen = pd.Index(pd.unique(skus)).difference(self.skus)
+        if len(unseen) == 0:
+            return
+        if 'Unknown' not in self.categories:
+            self.categories = self.categories.append(pd.Index(['Unknown']))
+        self.skus = self.skus.append(unseen)
+        self.sku_categories = np.concatenate([
+            self.sku_categories, np.full(len(unseen), self.categories.get_loc('Unknown'))
+        ])
+
+    @staticmethod
+    def _resized(matrix, size):
+        matrix = matrix.tocsr(copy=True)
+        matrix.resize((size, size))
+        return matrix
+
+    def _count_chunk(self, tickets, skus):
+        """Accumulate item and pair counts of complete tickets"""
+        self._extend_skus(skus)
+        ticket_codes, ticket_ids = pd.factorize(tickets)
+        sku_codes = self.skus.get_indexer(skus)
+
+        baskets = sparse.csr_matrix(
+            (np.ones(len(sku_codes)), (ticket_codes, sku_codes)), shape=(len(ticket_ids), len(self.skus))
+        )
+        baskets.data = np.ones(len(baskets.data))  # a SKU counts once per ticket after summing duplicates
+        category_map = sparse.csr_matrix(
+            (np.ones(len(self.skus)), (np.arange(len(self.skus)), self.sku_categories)),
+            shape=(len(self.skus), len(self.categories))
+        )
+        category_baskets = (baskets @ category_map).tocsr()
+        category_baskets.data = np.ones(len(category_baskets.data))
+
+        for level, matrix in (('SKU', baskets), ('Category', category_baskets)):
+            pairs = (matrix.T @ matrix).tocsr()
+            size = matrix.shape[1]
+            previous = self.counts.get(level)
+            self.counts[level] = pairs if previous is None else self._resized(previous, size) + pairs
+        self.ticket_count += len(ticket_ids)
+
+    def count_pairs(self):
+        """One pass over sales_line_items accumulating item and pair ticket counts"""
+        if self.skus is None and not self.load_data():
+            return False
+
+        self.counts = {}
+        self.ticket_count = 0
+        carry = None
+        previous_last = None
+        reader = pd.read_csv(
+            os.path.join(self.data_path, 'sales_line_items.csv'),
+            usecols=['Ticket_ID', 'SKU'],
+            chunksize=self.chunk_rows
+        )
+        for chunk in reader:
+            # The carry below is only right if the file is in ticket order
+            previous_last = StreamingIngestor._check_order(chunk, previous_last, 'sales_line_items.csv')
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            # The last ticket may continue in the next chunk
+            last_ticket = chunk['Ticket_ID'].iloc[-1]
+            complete = (chunk['Ticket_ID'] != last_ticket).to_numpy()
+            carry = chunk[~complete]
+            chunk = chunk[complete]
+            if len(chunk) > 0:
+                self._count_chunk(chunk['Ticket_ID'].to_numpy(), chunk['SKU'].to_numpy())
+        if carry is not None and len(carry) > 0:
+            self._count_chunk(carry['Ticket_ID'].to_numpy(), carry['SKU'].to_numpy())
+        return True
+
+    def rules(self, min_support=None, min_confidence=None, min_lift=None, level='SKU'):
+        """
+        Association rules X -> Y between pairs of items (SKUs or categories)
+        Support = share of tickets with both, Confidence = P(Y | X),
+        Lift = Confidence / P(Y)
+        """
+        min_support = self.DEFAULT_MIN_SUPPORT if min_support is None else min_support
+        min_confidence = self.DEFAULT_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        min_lift = self.DEFAULT_MIN_LIFT if min_lift is None else min_lift
+
+        pairs = self.counts.get(level)
+        if pairs is None or self.ticket_count == 0:
+            return pd.DataFrame(columns=RULE_COLUMNS)
+
+        item_counts = pairs.diagonal()
+        pairs = sparse.triu(pairs, k=1).tocoo()
+        keep = pairs.data >= min_support * self.ticket_count
+        first, second, together = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+
+        # Both directions of every frequent pair
+        antecedent = np.concatenate([first, second])
+        consequent = np.concatenate([second, first])
+        together = np.concatenate([together, together])
+        confidence = together / item_counts[antecedent]
+        lift = confidence / (item_counts[consequent] / self.ticket_count)
+        keep = (confidence >= min_confidence) & (lift >= min_lift)
+        antecedent, consequent, together = antecedent[keep], consequent[keep], together[keep]
+
+        if level == 'SKU':
+            names = self.skus.to_numpy()
+            categories = self.categories.to_numpy()[self.sku_categories]
+        else:
+            names = categories = self.categories.to_numpy()
+
+        rules = pd.DataFrame({
+            'Antecedent': names[antecedent],
+            'Consequent': names[consequent],
+            'Antecedent_Category': categories[antecedent],
+            'Consequent_Category': categories[consequent],
+            'Pair_Tickets': together.astype('int64'),
+            'Support': np.round(together / self.ticket_count, 4),
+            'Confidence': np.round(confidence[keep], 4),
+            'Lift': np.round(lift[keep], 3)
+        })
+        return rules.sort_values(['Lift', 'Support'], ascending=False).reset_index(drop=True)
+
+    def generate_rules(self, min_support=None, min_confidence=None, min_lift=None, level='SKU'):
+        """Count pairs if needed and keep the rules for update_rules_csv"""
+        if not self.counts and not self.count_pairs():
+            return pd.DataFrame(columns=RULE_COLUMNS)
+        self.rules_df = self.rules(min_support, min_confidence, min_lift, level)
+        return self.rules_df
+
+    def update_rules_csv(self, filename='market_basket_rules.csv'):
+        """Write the last generated rules to data/output"""
+        if self.rules_df is not None:
+            csv_path = os.path.join(self.output_path, filename)
+            atomic_write_csv(self.rules_df, csv_path)
+            return csv_path
+        return None
@@ -0,0 +1,285 @@
+"""
+Promotion Effectiveness Engine
+Before/after comparison of every promotion in the calendar over equal-length
+windows, computed from one set of running sums instead of a filter per promotion
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from ticket_join import TicketIndex
+from atomic_io import atomic_write_csv
+
+OUTPUT_COLUMNS = [
+    'Promotion_ID', 'Promotion_Type', 'Store_ID', 'Store_Location', 'Store_Tier', 'Target_Segment',
+    'Bonus_Points_Offered', 'Start_Date', 'End_Date',
+    'Before_Sales', 'Before_Transaction_Count', 'Before_Avg_Order_Value', 'Before_Points_Activity',
+    'After_Sales', 'After_Transaction_Count', 'After_Avg_Order_Value', 'After_Points_Activity',
+    'Sales_Uplift_Percent', 'Transaction_Uplift_Percent', 'AOV_Uplift_Percent', 'Points_Activity_Uplift_Percent',
+    'Units_Sold_Before', 'Units_Sold_After', 'Units_Uplift',
+    'Effectiveness_Score', 'ROI_Percent', 'Status'
+]
+
+ALL_CUSTOMERS = 'All Customers'
+ALL_STORES = 'All'
+
+# Additive per-ticket measures summed over promotion windows
+MEASURES = ['Sales', 'Transaction_Count', 'Points_Activity', 'Units_Sold']
+
+
+class PromoEffectivenessEngine:
+    """
+    Promotion effectiveness from a promotion calendar:
+    - Each promotion has a store, a target segment and a start/end date
+    - The "after" window is the promotion itself; the "before" window is the
+      same number of days immediately preceding it
+    - Ticket measures are sorted once by (segment, store, day) with running
+      sums; any window of any promotion is two binary searches into that
+      order, so memory grows with the tickets, not segments x stores x days
+    """
+
+    # Value of one bonus point in currency, used for the ROI cost side
+    POINT_VALUE = 0.01
+    # Size of the "Least Active Customers" list (same as the Admin Panel)
+    LEAST_ACTIVE_COUNT = 15
+
+    def __init__(self, data_path="data/input", output_path="data/output"):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.calendar_df = None
+        self.sales_header_df = None
+        self.sales_line_items_df = None
+        self.stores_df = None
+        self.customer_segments_df = None
+        self.effectiveness_df = None
+
+    def load_data(self, calendar_df=None, customer_segments_df=None):
+        """
+        Load sales, stores, the promotion calendar and segment membership
+        calendar_df / customer_segments_df (Cust_ID, Segment) override the
+        files; build the segments from current results with customer_segments()
+        """
+        try:
+            self.sales_header_df = pd.read_csv(os.path.join(self.data_path, 'sales_header.csv'))
+            self.sales_line_items_df = pd.read_csv(os.path.join(self.data_path, 'sales_line_items.csv'))
+            self.stores_df = pd.read_csv(os.path.join(self.data_path, 'stores_master.csv'))
+            if calendar_df is None:
+                calendar_df = pd.read_csv(os.path.join(self.data_path, 'promotion_calendar.csv'))
+
+            self.sales_header_df['Date'] = pd.to_datetime(self.sales_header_df['Date'])
+            calendar_df = calendar_df.copy()
+            calendar_df['Start_Date'] = pd.to_datetime(calendar_df['Start_Date'])
+            calendar_df['End_Date'] = pd.to_datetime(calendar_df['End_Date'])
+            self.calendar_df = calendar_df
+
+            self.customer_segments_df = (
+                customer_segments_df if customer_segments_df is not None else self._load_customer_segments()
+            )
+            return True
+        except Exception as e:
+            print(f"Error loading promotion data: {e}")
+            return False
+
+    @classmethod
+    def customer_segments(cls, rfm_df=None, balances_df=None, risk_df=None):
+        """
+        Segment membership (Cust_ID, Segment):
+        - RFM segments from rfm_df (Customer_ID, RFM_Segment)
+        - "<Tier> Customers" from loyalty balances (Cust_ID, Loyalty_Tier)
+        - "Least Active Customers": the risk customers most likely to churn,
+          or with the lowest spend when risk_df has no churn scores
+        """
+        frames = []
+        if rfm_df is not None:
+            frames.append(pd.DataFrame({'Cust_ID': rfm_df['Customer_ID'], 'Segment': rfm_df['RFM_Segment'].astype(str)}))
+        if risk_df is not None and len(risk_df) > 0:
+            if 'Churn_Probability' in risk_df.columns:
+                least_active = risk_df.nlargest(cls.LEAST_ACTIVE_COUNT, 'Churn_Probability')
+            else:
+                least_active = risk_df.nsmallest(cls.LEAST_ACTIVE_COUNT, 'Monetary')
+            frames.append(pd.DataFrame({'Cust_ID': least_active['Customer_ID'], 'Segment': 'Least Active Customers'}))
+        if balances_df is not None:
+            frames.append(pd.DataFrame({
+                'Cust_ID': balances_df['Cust_ID'],
+                'Segment': balances_df['Loyalty_Tier'].astype(str) + ' Customers'
+            }))
+
+        if not frames:
+            return pd.DataFrame(columns=['Cust_ID', 'Segment'])
+        return pd.concat(frames, ignore_index=True).drop_duplicates()
+
+    def _load_customer_segments(self):
+        """Segment membership from saved outputs (risk_customers.csv, loyalty balances)"""
+        risk = None
+        risk_path = os.path.join(self.output_path, 'risk_customers.csv')
+        if os.path.exists(risk_path):
+            risk = pd.read_csv(risk_path)
+
+        balances = None
+        balances_path = os.path.join(self.data_path, 'customer_loyalty_balances.csv')
+        if os.path.exists(balances_path):
+            balances = pd.read_csv(balances_path, usecols=['Cust_ID', 'Loyalty_Tier'])
+
+        return self.customer_segments(rfm_df=risk, balances_df=balances, risk_df=risk)
+
+    def _ticket_measures(self):
+        """Per-ticket measures: sales, one transaction, points and units sold"""
+        header = self.sales_header_df
+        positions = TicketIndex(header).lookup(self.sales_line_items_df['Ticket_ID'])
+        found = positions >= 0
+        units = np.bincount(
+            positions[found],
+            weights=self.sales_line_items_df['Qty'].to_numpy(dtype='float64')[found],
+            minlength=len(header)
+        )
+        if 'Total_Points_Earned' in header.columns:
+            points = header['Total_Points_Earned'].to_numpy(dtype='float64')
+        else:
+            points = np.zeros(len(header))
+        return pd.DataFrame({
+            'Cust_ID': header['Cust_ID'].to_numpy(),
+            'Store_ID': header['Store_ID'].to_numpy(),
+            'Date': header['Date'].dt.normalize().to_numpy(),
+            'Sales': header['Total_Value'].to_numpy(dtype='float64'),
+            'Transaction_Count': 1.0,
+            'Points_Activity': points,
+            'Units_Sold': units
+        })
+
+    def _build_running_sums(self, tickets, segments, stores, first_day):
+        """
+        Ticket measures sorted by (segment, store slot, day) with running sums
+        Returns (keys, running): keys[i] encodes row i's group and day, and
+        running[m, i] is the total of measure m over rows before i; the last
+        store slot aggregates all stores
+        """
+        # Expand tickets to one row per (ticket, segment) the customer belongs to
+        membership = self.customer_segments_df[self.customer_segments_df['Segment'].isin(segments)]
+        segment_rows = tickets.merge(membership, on='Cust_ID', how='inner')
+        if ALL_CUSTOMERS in segments:
+            segment_rows = pd.concat([segment_rows, tickets.assign(Segment=ALL_CUSTOMERS)], ignore_index=True)
+
+        seg_codes = pd.Index(segments).get_indexer(segment_rows['Segment'])
+        store_codes = pd.Index(stores).get_indexer(segment_rows['Store_ID'])
+        days = segment_rows['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64) - first_day
+        keep = store_codes >= 0
+        seg_codes, store_codes, days = seg_codes[keep], store_codes[keep], days[keep]
+        values = segment_rows[MEASURES].to_numpy(dtype='float64')[keep]
+
+        # Every row counts for its own store and for the all-stores slot
+        n_stores = len(stores) + 1
+        groups = np.concatenate([
+            seg_codes * n_stores + store_codes,
+            seg_codes * n_stores + (n_stores - 1)
+        ]).astype(np.int64)
+        keys = groups * self._key_span + np.concatenate([days, days]) + 1
+        values = np.concatenate([values, values])
+
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        running = np.zeros((len(MEASURES), len(keys) + 1))
+        np.cumsum(values[order].T, axis=1, out=running[:, 1:])
+        return keys, running
+
+    def _window_totals(self, keys, running, groups, window_start, window_end):
+        """Totals of every measure per promotion over [window_start, window_end] (day offsets)"""
+        # Day slots run 1..span-2 inside each group; clipped bounds never cross into a neighbour
+        lo = groups * self._key_span + np.clip(window_start + 1, 0, self._key_span - 1)
+        hi = groups * self._key_span + np.clip(window_end + 1, 0, self._key_span - 1)
+        left = np.searchsorted(keys, lo, side='left')
+        right = np.searchsorted(keys, hi, side='right')
+        return running[:, right] - running[:, left]
+
+    @staticmethod
+    def _uplift(before, after):
+        """Percent change, 0 where there is no baseline"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(before > 0, (after - before) / before * 100, 0.0)
+
+    def calculate_effectiveness(self):
+        """Before/after metrics for every promotion in the calendar"""
+        calendar = self.calendar_df.reset_index(drop=True)
+        tickets = self._ticket_measures()
+
+        segments = sorted(calendar['Target_Segment'].astype(str).unique())
+        stores = sorted(tickets['Store_ID'].unique())
+
+        start = calendar['Start_Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        end = calendar['End_Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        length = end - start + 1
+        before_start = start - length
+
+        # Days are offsets from the first sale; windows outside the sales are clipped
+        sales_days = tickets['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        first_day = int(sales_days.min())
+        self._key_span = int(sales_days.max()) - first_day + 3
+        keys, running = self._build_running_sums(tickets, segments, stores, first_day)
+
+        # Promotions without a specific store use the all-stores slot
+        seg_idx = pd.Index(segments).get_indexer(calendar['Target_Segment'].astype(str))
+        store_idx = pd.Index(stores).get_indexer(calendar['Store_ID'])
+        store_idx = np.where(store_idx >= 0, store_idx, len(stores))
+        groups = seg_idx.astype(np.int64) * (len(stores) + 1) + store_idx
+
+        before = dict(zip(MEASURES, self._window_totals(
+            keys, running, groups, before_start - first_day, start - 1 - first_day
+        )))
+        after = dict(zip(MEASURES, self._window_totals(
+            keys, running, groups, start - first_day, end - first_day
+        )))
+
+        result = calendar.copy()
+        stores_info = self.stores_df.set_index('Store_ID')
+        result['Store_Location'] = result['Store_ID'].map(stores_info['Location']).fillna(ALL_STORES)
+        result['Store_Tier'] = result['Store_ID'].map(stores_info['Tier']).fillna('')
+
+        for label, totals in [('Before', before), ('After', after)]:
+            result[f'{label}_Sales'] = totals['Sales'].round(2)
+            result[f'{label}_Transaction_Count'] = totals['Transaction_Count'].astype(int)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                aov = np.where(totals['Transaction_Count'] > 0, totals['Sales'] / totals['Transaction_Count'], 0.0)
+            result[f'{label}_Avg_Order_Value'] = aov.round(2)
+            result[f'{label}_Points_Activity'] = totals['Points_Activity'].round(2)
+
+        result['Sales_Uplift_Percent'] = self._uplift(result['Before_Sales'], result['After_Sales']).round(2)
+        result['Transaction_Uplift_Percent'] = self._uplift(
+            result['Before_Transaction_Count'], result['After_Transaction_Count']
+        ).round(2)
+        result['AOV_Uplift_Percent'] = self._uplift(result['Before_Avg_Order_Value'], result['After_Avg_Order_Value']).round(2)
+        result['Points_Activity_Uplift_Percent'] = self._uplift(
+            result['Before_Points_Activity'], result['After_Points_Activity']
+        ).round(2)
+
+        result['Units_Sold_Before'] = before['Units_Sold'].astype(int)
+        result['Units_Sold_After'] = after['Units_Sold'].astype(int)
+        result['Units_Uplift'] = result['Units_Sold_After'] - result['Units_Sold_Before']
+
+        # Score: 100 = no change; the four uplifts weighted equally
+        result['Effectiveness_Score'] = (100 + result[[
+            'Sales_Uplift_Percent', 'Transaction_Uplift_Percent', 'AOV_Uplift_Percent', 'Points_Activity_Uplift_Percent'
+        ]].mean(axis=1)).round(2)
+
+        # ROI: incremental sales against the value of bonus points awarded per promoted transaction
+        bonus_cost = result['Bonus_Points_Offered'] * self.POINT_VALUE * result['After_Transaction_Count']
+        incremental_sales = result['After_Sales'] - result['Before_Sales']
+        result['ROI_Percent'] = self._uplift(bonus_cost, incremental_sales).round(2)
+
+        latest_date = self.sales_header_df['Date'].max().normalize()
+        result['Status'] = np.select(
+            [result['End_Date'] < latest_date, result['Start_Date'] > latest_date],
+            ['Completed', 'Scheduled'],
+            default='Active'
+        )
+
+        result['Start_Date'] = result['Start_Date'].dt.strftime('%Y-%m-%d')
+        result['End_Date'] = result['End_Date'].dt.strftime('%Y-%m-%d')
+        self.effectiveness_df = result[OUTPUT_COLUMNS]
+        return self.effectiveness_df
+
+    def update_effectiveness_csv(self):
+        """Write promotion effectiveness in the promo_effectiveness_after_bonus.csv schema"""
+        if self.effectiveness_df is not None:
+            csv_path = os.path.join(self.output_path, 'promo_effectiveness_after_bonus.csv')
+            atomic_write_csv(self.effectiveness_df, csv_path)
+            return csv_path
+        return None
@@ -0,0 +1,269 @@
+"""
+Product Recommendation Engine
+Item-item co-occurrence recommender over the line-item history: top-N SKUs
+for every customer from blocked sparse matrix products, with the item
+similarity model persisted and reused until the interaction matrix changes
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from atomic_io import atomic_write_npz
+from interaction_matrix import load_interaction_matrix
+
+MODEL_FILENAME = 'recommendation_model.npz'
+
+# Discount level and message of personalized offers by RFM segment
+SEGMENT_OFFERS = {
+    'Champions': ('vip', "Premium products with VIP discount"),
+    'Loyal Customers': ('standard', "Continue with preferred categories"),
+    'At-Risk Customers': ('vip', "Re-engagement offer - exclusive discount"),
+}
+DEFAULT_OFFER = ('standard', "Personalized recommendations")
+HIGH_VALUE_OFFER = ('vip', "High predicted lifetime value - VIP discount")
+
+OFFER_COLUMNS = [
+    'Customer_ID', 'Segment', 'Product_ID', 'Rank', 'Score', 'Discount_Percentage', 'Recommendation'
+]
+
+
+class ProductRecommendationEngine:
+    """
+    Item-item collaborative filtering:
+    - X is the customer x SKU matrix of units bought, taken from the
+      shared InteractionMatrix artifact
+    - Item similarity is the cosine of SKU columns of the binarized X,
+      pruned to each SKU's strongest neighbours and stored sparse
+    - Scores for a block of customers are X_block @ S (sparse product);
+      already bought SKUs are removed and the top N per row are selected
+      among the block's nonzero scores with one lexsort
+    - Popularity breaks ties and fills in for customers without history
+    """
+
+    # Neighbours kept per SKU in the similarity model
+    NEIGHBOURS = 50
+    # Customers scored per block
+    BLOCK_SIZE = 5000
+    # Weight of the popularity tie-breaker relative to similarity scores
+    POPULARITY_WEIGHT = 1e-6
+
+    def __init__(self, data_path="data/input", output_path="data/output"):
+        self.data_path = data_path
+        self.output_path = output_path
+        self.model_path = os.path.join(output_path, MODEL_FILENAME)
+        self.customers = None
+        self.skus = None
+        self.interactions = None
+        self.interactions_version = None
+        self.similarity = None
+        self.popularity = None
+        self.source_fingerprint = None
+
+    def load_data(self, interaction_matrix=None):
+        """Use the customer x SKU interaction matrix (loaded and updated from data_path if not given)"""
+        try:
+            if interaction_matrix is None:
+                interaction_matrix = load_interaction_matrix(self.data_path, self.output_path)
+        except Exception as e:
+            print(f"Error loading recommendation data: {e}")
+            return False
+
+        self.customers, self.skus = interaction_matrix.customers, interaction_matrix.skus
+        self.interactions = interaction_matrix.qty
+        # Tickets folded in and matrix size identify the data a model was fitted on
+        self.interactions_version = np.array([*interaction_matrix.version(), *self.interactions.shape, self.interactions.nnz])
+        return True
+
+    def set_interactions(self, cust_ids, skus, quantities):
+        """Customer x SKU matrix of summed quantities from purchase rows"""
+        cust_codes, customers = pd.factorize(np.asarray(cust_ids), sort=True)
+        sku_codes, skus = pd.factorize(np.asarray(skus), sort=True)
+        self.customers, self.skus = pd.Index(customers), pd.Index(skus)
+        self.interactions = sparse.csr_matrix(
+            (np.asarray(quantities, dtype='float64'), (cust_codes, sku_codes)),
+            shape=(len(self.customers), len(self.skus))
+        )
+        self.interactions.sum_duplicates()
+        self.interactions_version = np.array([-1, *self.interactions.shape, self.interactions.nnz])
+
+    def fit(self):
+        """Item-item cosine similarity, pruned to the top neighbours per SKU"""
+        bought = self.interactions.copy()
+        bought.data = np.ones_like(bought.data)
+
+        # Cosine of SKU columns: normalize columns, then co-occurrence product
+        columns = normalize(bought.tocsc(), norm='l2', axis=0)
+        similarity = (columns.T @ columns).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+        self.similarity = self._prune(similarity, self.NEIGHBOURS)
+
+        self.popularity = np.asarray(bought.sum(axis=0)).ravel()
+        self.source_fingerprint = self.interactions_version
+        return self
+
+    @staticmethod
+    def _prune(matrix, k):
+        """
+        Keep the k largest entries of each row of a CSR matrix
+        Entries are sorted by (row, -value) once and ranked within their row,
+        like _top_n; ties keep the lower column index
+        """
+        rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        order = np.lexsort((matrix.indices, -matrix.data, rows))
+        ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+        keep = order[ranks < k]
+        return sparse.csr_matrix(
+            (matrix.data[keep], (rows[keep], matrix.indices[keep])), shape=matrix.shape
+        )
+
+    def save(self):
+        """Persist the similarity model and SKU vocabulary"""
+        return atomic_write_npz(
+            self.model_path,
+            skus=self.skus.to_numpy().astype(str),
+            popularity=self.popularity,
+            data=self.similarity.data,
+            indices=self.similarity.indices,
+            indptr=self.similarity.indptr,
+            fingerprint=self.source_fingerprint,
+        )
+
+    def load_model(self):
+        """Load a persisted model; returns False if missing or fitted on other interactions"""
+        if not os.path.exists(self.model_path):
+            return False
+        with np.load(self.model_path, allow_pickle=False) as model:
+            if not np.array_equal(model['fingerprint'], self.interactions_version):
+                return False
+            skus = pd.Index(model['skus'])
+            self.similarity = sparse.csr_matrix(
+                (model['data'], model['indices'], model['indptr']), shape=(len(skus), len(skus))
+            )
+            self.popularity = model['popularity']
+            self.source_fingerprint = model['fingerprint']
+
+        # Interaction columns must follow the model's SKU order
+        if self.skus is not None and not self.skus.equals(skus):
+            positions = skus.get_indexer(self.skus)
+            coo = self.interactions.tocoo()
+            known = positions[coo.col] >= 0
+            self.interactions = sparse.csr_matrix(
+                (coo.data[known], (coo.row[known], positions[coo.col[known]])), shape=(len(self.customers), len(skus))
+            )
+        self.skus = skus
+        return True
+
+    def load_or_fit(self):
+        """Reuse the persisted model when the interactions are unchanged, else fit and save it"""
+        if self.interactions is None and not self.load_data():
+            return False
+        if not self.load_model():
+            self.fit()
+            self.save()
+        return True
+
+    def _top_n(self, rows, n, exclude_purchased, popular_order):
+        """
+        Top-n (row, SKU code, score, rank) for a block of interaction rows
+        Only SKUs with a nonzero score are ranked from the sparse product;
+        rows left with fewer than n candidates are padded from the
+        popularity order, so no dense rows x SKUs block is needed
+        """
+        tiebreak = self.popularity / max(self.popularity.max(), 1) * self.POPULARITY_WEIGHT
+        bought = rows.astype(bool).astype('float64')
+
+        scores = (rows @ self.similarity).tocsr()
+        if exclude_purchased:
+            scores = (scores - scores.multiply(bought)).tocsr()
+        scores.eliminate_zeros()
+        scores.sort_indices()
+        candidate_rows = np.repeat(np.arange(rows.shape[0]), np.diff(scores.indptr))
+        row_ids, sku_ids, values = [candidate_rows], [scores.indices], [scores.data]
+
+        # Popularity fill-in for rows with fewer than n candidates
+        short = np.flatnonzero(np.diff(scores.indptr) < n)
+        if len(short) > 0:
+            taken = scores[short] + bought[short] if exclude_purchased else scores[short]
+            taken = sparse.csr_matrix(taken)
+            width = min(len(self.skus), n + int(np.diff(taken.indptr).max(initial=0)))
+            popular = popular_order[:width]
+            available = taken[:, popular].toarray() == 0
+            # First (n - candidates) available popular SKUs of each short row
+            needed = n - np.diff(scores.indptr)[short]
+            fill = available & (np.cumsum(available, axis=1) <= needed[:, None])
+            fill_rows, fill_positions = np.nonzero(fill)
+            row_ids.append(short[fill_rows])
+            sku_ids.append(popular[fill_positions])
+            values.append(np.zeros(len(fill_rows)))
+
+        row_ids, sku_ids, values = np.concatenate(row_ids), np.concatenate(sku_ids), np.concatenate(values)
+        order = np.lexsort((-(values + tiebreak[sku_ids]), row_ids))
+        row_ids, sku_ids, values = row_ids[order], sku_ids[order], values[order]
+        starts = np.searchsorted(row_ids, row_ids, side='left')
+        ranks = np.arange(len(row_ids)) - starts + 1
+        keep = ranks <= n
+        return row_ids[keep], sku_ids[keep], values[keep], ranks[keep]
+
+    def _recommend_rows(self, cust_ids, rows, n, exclude_purchased, block_size):
+        n = min(n, len(self.skus))
+        popular_order = np.argsort(-self.popularity, kind='stable')
+        cust_ids = np.asarray(cust_ids)
+        frames = []
+        for start in range(0, rows.shape[0], block_size):
+            row_ids, sku_ids, scores, ranks = self._top_n(
+                rows[start:start + block_size], n, exclude_purchased, popular_order
+            )
+            frames.append(pd.DataFrame({
+                'Cust_ID': cust_ids[start + row_ids],
+                'Rank': ranks,
+                'SKU': self.skus.to_numpy()[sku_ids],
+                'Score': np.round(scores, 4)
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['Cust_ID', 'Rank', 'SKU', 'Score'])
+        return pd.concat(frames, ignore_index=True)
+
+    def recommend_all(self, n=5, exclude_purchased=True, block_size=None):
+        """
+        Top-n SKUs for every customer with purchase history
+        Returns Cust_ID, Rank, SKU, Score (Score 0 means a popularity fill-in)
+        """
+        return self._recommend_rows(
+            self.customers.to_numpy(), self.interactions, n, exclude_purchased, block_size or self.BLOCK_SIZE
+        )
+
+    def recommend(self, cust_ids, n=5, exclude_purchased=True):
+        """Top-n SKUs for the given customers; unknown customers get the most popular SKUs"""
+        cust_ids = np.asarray(cust_ids)
+        codes = self.customers.get_indexer(cust_ids)
+        known = codes >= 0
+        rows = sparse.diags(known.astype('float64')) @ self.interactions[np.where(known, codes, 0)]
+        return self._recommend_rows(cust_ids, rows.tocsr(), n, exclude_purchased, self.BLOCK_SIZE)
+
+    def personalized_offers(self, rfm_df, n=3, standard_discount=10, vip_discount=20):
+        """
+        Top-n SKUs for every customer in the RFM table, with a discount and
+        message by RFM segment; customers with a 'High' CLV_Tier (when the
+        column is present) get the VIP discount whatever their segment
+        Returns OFFER_COLUMNS
+        """
+        discounts = {'standard': standard_discount, 'vip': vip_discount}
+        offers = rfm_df['RFM_Segment'].astype(str).map(lambda segment: SEGMENT_OFFERS.get(segment, DEFAULT_OFFER))
+        if 'CLV_Tier' in rfm_df.columns:
+            offers = offers.where(rfm_df['CLV_Tier'] != 'High', pd.Series([HIGH_VALUE_OFFER] * len(offers), index=offers.index))
+
+        customers = pd.DataFrame({
+            'Customer_ID': rfm_df['Customer_ID'],
+            'Segment': rfm_df['RFM_Segment'].astype(str),
+            'Discount_Percentage': offers.str[0].map(discounts),
+            'Recommendation': offers.str[1]
+        })
+        top_products = self.recommend(rfm_df['Customer_ID'].to_numpy(), n=n)
+        offers_df = customers.merge(
+            top_products.rename(columns={'Cust_ID': 'Customer_ID', 'SKU': 'Product_ID'}),
+            on='Customer_ID'
+        )
+        return offers_df[OFFER_COLUMNS]
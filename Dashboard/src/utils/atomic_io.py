@@ -0,0 +1,203 @@
+"""
+Atomic Output Writers
+Crash-safe CSV writes for data/output: rewrites and appends go to a temp
+file, are fsynced, then atomically renamed over the target, so readers only
+ever see a complete file
+"""
+
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+VERSIONS_DIR = '.versions'
+# Chunk size for copying an existing file ahead of appended rows
+COPY_BUFFER_BYTES = 1 << 20
+
+# Lock files held by each thread, so nested file_lock calls on the same path
+# (e.g. numbering rows under the lock, then locked_append_csv) do not deadlock
+_held_locks = threading.local()
+
+
+@contextmanager
+def file_lock(path, timeout=30.0, poll_interval=0.05):
+    """
+    Exclusive inter-process lock on '<path>.lock'
+    Serializes writers/appenders of the same output file; readers never take it
+    Re-entrant within a thread: an inner lock on a path already held is a no-op
+    """
+    lock_path = os.path.abspath(f"{path}.lock")
+    held = _held_locks.__dict__.setdefault('paths', set())
+    if lock_path in held:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    handle = open(lock_path, 'a+')
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for lock on {path}")
+                time.sleep(poll_interval)
+        held.add(lock_path)
+        yield
+    finally:
+        held.discard(lock_path)
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        handle.close()
+
+
+def _fsync_directory(directory):
+    """Persist the rename itself (POSIX only)"""
+    if fcntl is None:
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace_atomically(path, write_fn, binary=False):
+    """Write via write_fn(file_obj) into a temp file next to path, then rename over it"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        # mkstemp creates owner-only files; keep the target readable like a normal write
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', newline='', encoding='utf-8')) as tmp_file:
+            write_fn(tmp_file)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+        _fsync_directory(directory)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def snapshot(path, keep_versions=10):
+    """
+    Save a timestamped copy of path under '<dir>/.versions/'
+    Keeps the newest keep_versions snapshots per file
+    """
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    version_path = os.path.join(directory, f"{stem}.{datetime.now().strftime('%Y%m%dT%H%M%S%f')}{ext}")
+    try:
+        # The current file is never modified in place, so a hard link is a safe snapshot
+        os.link(path, version_path)
+    except OSError:
+        shutil.copy2(path, version_path)
+
+    versions = list_snapshots(path)
+    for old_version in versions[:-keep_versions] if keep_versions else []:
+        os.remove(old_version)
+    return version_path
+
+
+def list_snapshots(path):
+    """List snapshot paths for an output file, oldest first"""
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_DIR)
+    if not os.path.isdir(directory):
+        return []
+    stem, ext = os.path.splitext(os.path.basename(path))
+    pattern = re.compile(re.escape(stem) + r'\.\d{8}T\d{12}' + re.escape(ext) + '$')
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if pattern.match(name)
+    )
+
+
+def atomic_write_csv(df, path, snapshot_versions=0, **to_csv_kwargs):
+    """
+    Replace path with df as CSV atomically
+    snapshot_versions > 0 also keeps that many timestamped versions
+    """
+    to_csv_kwargs.setdefault('index', False)
+    with file_lock(path):
+        _replace_atomically(path, lambda f: df.to_csv(f, **to_csv_kwargs))
+        if snapshot_versions:
+            snapshot(path, keep_versions=snapshot_versions)
+    return path
+
+
+def atomic_write_npz(path, **arrays):
+    """Replace path with a compressed NumPy archive of arrays atomically"""
+    with file_lock(path):
+        _replace_atomically(path, lambda f: np.savez_compressed(f, **arrays), binary=True)
+    return path
+
+
+def atomic_write_json(path, obj):
+    """Replace path with obj as JSON atomically (e.g. the fingerprint of a saved result)"""
+    with file_lock(path):
+        _replace_atomically(path, lambda f: json.dump(obj, f, indent=2))
+    return path
+
+
+def atomic_write_pickle(path, obj):
+    """Replace path with a pickle of obj atomically (e.g. a fitted model)"""
+    with file_lock(path):
+        _replace_atomically(path, lambda f: pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL), binary=True)
+    return path
+
+
+def locked_append_csv(df, path, header=False, snapshot_versions=0, **to_csv_kwargs):
+    """
+    Append rows to a CSV under an exclusive lock
+    The existing bytes are copied to a temp file, the new rows are appended
+    there and the temp file is renamed over the original, so lock-free
+    readers only ever see the old or the new complete file and a crash
+    leaves no torn row behind; the header is written only to a new or
+    empty file
+    """
+    to_csv_kwargs.setdefault('index', False)
+    with file_lock(path):
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = df.to_csv(header=header and not size, lineterminator='\n', **to_csv_kwargs).encode('utf-8')
+
+        def write(f):
+            if size:
+                with open(path, 'rb') as current:
+                    shutil.copyfileobj(current, f, COPY_BUFFER_BYTES)
+                    current.seek(size - 1)
+                    if current.read(1) != b'\n':
+                        f.write(b'\n')
+            f.write(rows)
+
+        _replace_atomically(path, write, binary=True)
+        if snapshot_versions:
+            snapshot(path, keep_versions=snapshot_versions)
+    return path
@@ -0,0 +1,151 @@
+"""
+Chart Utilities
+Aggregation-aware Plotly rendering: long time series are downsampled to the
+chart's pixel width and dense scatters are binned into a density heatmap, so
+figures stay small no matter how much data sits behind them
+"""
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+# Roughly the pixel width of a full-width chart; more points are invisible
+MAX_LINE_POINTS = 1500
+# Above this many markers a scatter is rendered as a 2D histogram
+SCATTER_POINT_THRESHOLD = 5000
+DENSITY_BINS = 60
+
+# Per-point trace attributes that must be subset alongside x/y
+_POINT_ATTRIBUTES = ['customdata', 'hovertext', 'text', 'ids']
+
+
+def _numeric_axis(values):
+    """Convert axis values (numbers, dates, timestamps) to float64"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.number):
+        return values.astype('float64')
+    return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    Returns indices of the n_out points that best preserve the line's shape
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _numeric_axis(x)
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket boundaries over the interior points (first/last are always kept)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Bucket averages are independent of the selection, so compute them at once
+    bucket_sizes = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / bucket_sizes, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / bucket_sizes, y[-1])
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Triangle area between the last kept point, the candidates and the next bucket's average
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Min/max bucketing: keep the lowest and highest point of each bucket
+    Fully vectorized; preserves spikes that LTTB could smooth out
+    """
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+
+    buckets = np.arange(n) * n_buckets // n
+    grouped = pd.Series(np.asarray(y, dtype='float64')).groupby(buckets)
+    keep = np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy(), [0, n - 1]])
+    return np.unique(keep)
+
+
+def _subset_trace(trace, idx):
+    """Keep only the selected points of a trace (including per-point styling)"""
+    n = len(trace.x)
+    trace.x = np.asarray(trace.x)[idx]
+    trace.y = np.asarray(trace.y)[idx]
+    for attr in _POINT_ATTRIBUTES:
+        value = getattr(trace, attr, None)
+        if value is not None and not isinstance(value, str) and len(value) == n:
+            setattr(trace, attr, np.asarray(value)[idx])
+    for attr in ('size', 'color'):
+        value = getattr(trace.marker, attr, None)
+        if value is not None and not isinstance(value, (str, int, float)) and len(value) == n:
+            setattr(trace.marker, attr, np.asarray(value)[idx])
+
+
+def _is_line_trace(trace):
+    return trace.type in ('scatter', 'scattergl') and trace.mode is not None and 'lines' in trace.mode
+
+
+def _is_marker_trace(trace):
+    return trace.type in ('scatter', 'scattergl') and (trace.mode is None or 'lines' not in trace.mode)
+
+
+def optimize_figure(fig, max_points=MAX_LINE_POINTS, scatter_threshold=SCATTER_POINT_THRESHOLD,
+                    method='lttb'):
+    """
+    Shrink a figure before it is serialized:
+    - Line traces longer than max_points are downsampled (LTTB or min/max)
+    - Marker-only scatters above scatter_threshold points (all traces combined)
+      are replaced by a single density heatmap
+    Bars, pies and other pre-aggregated traces are left untouched.
+    """
+    for trace in fig.data:
+        if _is_line_trace(trace) and trace.x is not None and len(trace.x) > max_points:
+            if method == 'minmax':
+                idx = minmax_indices(trace.y, max_points // 2)
+            else:
+                idx = lttb_indices(trace.x, trace.y, max_points)
+            _subset_trace(trace, idx)
+
+    marker_traces = [t for t in fig.data if _is_marker_trace(t) and t.x is not None]
+    total_markers = sum(len(t.x) for t in marker_traces)
+    if marker_traces and total_markers > scatter_threshold:
+        x = np.concatenate([np.asarray(t.x) for t in marker_traces])
+        y = np.concatenate([np.asarray(t.y) for t in marker_traces])
+        other_traces = [t for t in fig.data if not any(t is m for m in marker_traces)]
+        fig.data = other_traces
+        fig.add_trace(go.Histogram2d(
+            x=x,
+            y=y,
+            nbinsx=DENSITY_BINS,
+            nbinsy=DENSITY_BINS,
+            colorscale='Blues',
+            colorbar=dict(title='Count'),
+            name=f'{total_markers:,} points (binned)'
+        ))
+        fig.update_layout(showlegend=False)
+        title = fig.layout.title.text if fig.layout.title and fig.layout.title.text else ''
+        fig.update_layout(title=f"{title} (density of {total_markers:,} points)".strip())
+    return fig
+
+
+def render_chart(fig, max_points=MAX_LINE_POINTS, scatter_threshold=SCATTER_POINT_THRESHOLD,
+                 method='lttb', **kwargs):
+    """
+    Optimize a Plotly figure for its display size and render it with Streamlit
+    method='minmax' keeps every bucket's extremes, for series where spikes matter
+    """
+    kwargs.setdefault('use_container_width', True)
+    st.plotly_chart(optimize_figure(fig, max_points, scatter_threshold, method=method), **kwargs)
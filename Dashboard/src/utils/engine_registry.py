@@ -0,0 +1,148 @@
+"""
+Engine Registry
+Lazy, page-level engine initialization with background warm-up
+"""
+
+import threading
+import time
+
+
+class EngineRegistry:
+    """
+    Registry of named engine factories:
+    - get(name) builds an engine on first use (pages only pay for what they open)
+    - start_warmup() builds the remaining engines on a background thread
+    - progress() reports warm-up state for the sidebar
+    Each engine is built at most once, even when a page and the warm-up
+    thread ask for it at the same time. A failed build is reported for
+    retry_after seconds and then attempted again; clear(name) or
+    retry(name) forget an engine (or its failure) right away.
+    """
+
+    def __init__(self, retry_after=60.0):
+        self.retry_after = retry_after
+        self._factories = {}
+        self._order = []
+        self._results = {}
+        self._errors = {}
+        self._failed_at = {}
+        self._timings = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+
+    def register(self, name, factory):
+        """Register a zero-argument factory that builds an engine"""
+        with self._lock:
+            if name not in self._factories:
+                self._order.append(name)
+            self._factories[name] = factory
+
+    def is_ready(self, name):
+        """Check whether an engine has been built"""
+        return name in self._results
+
+    def _can_retry(self, name):
+        """A finished build that failed more than retry_after seconds ago"""
+        event = self._events.get(name)
+        return (
+            name in self._errors
+            and event is not None and event.is_set()
+            and time.monotonic() - self._failed_at[name] >= self.retry_after
+        )
+
+    def get(self, name):
+        """Return the engine, building it now if nobody has yet"""
+        if name in self._results:
+            return self._results[name]
+
+        with self._lock:
+            event = self._events.get(name)
+            owner = event is None or self._can_retry(name)
+            if owner:
+                event = threading.Event()
+                self._events[name] = event
+
+        if not owner:
+            # Another thread (page or warm-up) is building it; wait for it
+            event.wait()
+        else:
+            self._build(name, event)
+
+        if name in self._results:
+            return self._results[name]
+        raise self._errors[name]
+
+    def _build(self, name, event):
+        """Run a factory and record its result or error"""
+        start = time.perf_counter()
+        try:
+            self._results[name] = self._factories[name]()
+            self._errors.pop(name, None)
+            self._failed_at.pop(name, None)
+        except Exception as e:
+            self._errors[name] = e
+            self._failed_at[name] = time.monotonic()
+        finally:
+            self._timings[name] = time.perf_counter() - start
+            event.set()
+
+    def clear(self, name=None):
+        """
+        Forget a built engine or a recorded failure (all engines when name
+        is None) so the next get() rebuilds it; builds in progress are kept
+        """
+        with self._lock:
+            for engine in [name] if name is not None else list(self._order):
+                event = self._events.get(engine)
+                if event is not None and not event.is_set():
+                    continue
+                self._events.pop(engine, None)
+                self._results.pop(engine, None)
+                self._errors.pop(engine, None)
+                self._failed_at.pop(engine, None)
+
+    def retry(self, name):
+        """Rebuild an engine now, discarding any previous result or failure"""
+        self.clear(name)
+        return self.get(name)
+
+    def start_warmup(self, names=None):
+        """Build not-yet-loaded engines on a background thread (idempotent)"""
+        if self._warmup_thread is not None and self._warmup_thread.is_alive():
+            return
+
+        pending = [n for n in (names or self._order) if n not in self._events or self._can_retry(n)]
+        if not pending:
+            return
+
+        def warm():
+            for name in pending:
+                try:
+                    self.get(name)
+                except Exception:
+                    # Error is recorded; the page will surface it on visit
+                    pass
+
+        self._warmup_thread = threading.Thread(target=warm, name='engine-warmup', daemon=True)
+        self._warmup_thread.start()
+
+    def progress(self):
+        """Return (ready_count, total_count, status per engine)"""
+        status = {}
+        for name in self._order:
+            event = self._events.get(name)
+            if name in self._results:
+                status[name] = 'ready'
+            elif event is not None and not event.is_set():
+                status[name] = 'loading'
+            elif name in self._errors:
+                status[name] = 'failed'
+            else:
+                status[name] = 'pending'
+        ready = sum(1 for s in status.values() if s in ('ready', 'failed'))
+        return ready, len(self._order), status
+
+    def timings(self):
+        """Return build time in seconds per engine"""
+        return dict(self._timings)
@@ -0,0 +1,216 @@
+"""
+Instrumentation
+Lightweight timing of engine methods: wall time, rows in/out and peak
+memory delta per call, kept in an in-memory ring buffer
+
+Disabled by default (set LOYALTY_INSTRUMENTATION=1 or call enable()); when
+disabled an instrumented call costs one flag check.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+BUFFER_SIZE = 2000
+
+_state = {
+    'enabled': os.environ.get('LOYALTY_INSTRUMENTATION', '0') == '1',
+    'track_memory': os.environ.get('LOYALTY_INSTRUMENTATION_MEMORY', '0') == '1',
+    # Whether tracemalloc was started here (and so may be stopped here)
+    'started_tracing': False,
+}
+_records = deque(maxlen=BUFFER_SIZE)
+_local = threading.local()
+
+
+def _start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state['started_tracing'] = True
+
+
+def _stop_tracing():
+    """Stop tracing only if this module started it"""
+    if _state['started_tracing'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state['started_tracing'] = False
+
+
+if _state['enabled'] and _state['track_memory']:
+    _start_tracing()
+
+
+def enable(track_memory=False):
+    """
+    Start recording calls; track_memory also traces allocations (slower)
+    Enabling again without track_memory stops tracing this module started
+    """
+    _state['enabled'] = True
+    _state['track_memory'] = track_memory
+    if track_memory:
+        _start_tracing()
+    else:
+        _stop_tracing()
+
+
+def disable():
+    """Stop recording calls (the buffer is kept); tracing started by someone else keeps running"""
+    _state['enabled'] = False
+    _stop_tracing()
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+def _count_rows(value):
+    """Rows in a DataFrame/Series/array, summed over tuples and lists of frames"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_count_rows(item) for item in value if isinstance(item, (pd.DataFrame, pd.Series)))
+    if isinstance(value, dict):
+        return sum(_count_rows(item) for item in value.values() if isinstance(item, (pd.DataFrame, pd.Series)))
+    return 0
+
+
+def _open_peaks():
+    """Running peak of every open call on this thread, outermost first"""
+    if not hasattr(_local, 'peaks'):
+        _local.peaks = []
+    return _local.peaks
+
+
+def _record_call(name, func, args, kwargs):
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    memory = _state['track_memory'] and tracemalloc.is_tracing()
+    if memory:
+        # tracemalloc keeps one peak; fold it into the enclosing calls before
+        # resetting it for this one, so their peaks still cover it
+        peaks = _open_peaks()
+        start_memory, peak = tracemalloc.get_traced_memory()
+        peaks[:] = [max(open_peak, peak) for open_peak in peaks]
+        peaks.append(start_memory)
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    status = 'ok'
+    result = None
+    try:
+        result = func(*args, **kwargs)
+        return result
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        wall_ms = (time.perf_counter() - started) * 1000
+        _local.depth = depth
+        peak_delta = None
+        if memory and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            peak_delta = max(max(_open_peaks().pop(), peak) - start_memory, 0)
+        elif memory:
+            _open_peaks().pop()
+        _records.append({
+            'timestamp': datetime.now().isoformat(timespec='milliseconds'),
+            'name': name,
+            'depth': depth,
+            'wall_ms': round(wall_ms, 3),
+            'rows_in': _count_rows(args) + _count_rows(kwargs),
+            'rows_out': _count_rows(result),
+            'peak_memory_delta': peak_delta,
+            'status': status,
+            'thread': threading.current_thread().name,
+        })
+
+
+def instrumented(name=None):
+    """Decorator recording each call of a function when instrumentation is enabled"""
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            return _record_call(label, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls):
+    """
+    Class decorator: instrument every public method defined on the class
+    Nested instrumented calls are recorded with their depth; with memory
+    tracking each call's peak covers its inner calls too (the tracer is
+    process-wide, so calls on other threads can raise a peak)
+    """
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_'):
+            continue
+        if isinstance(value, staticmethod):
+            setattr(cls, attr, staticmethod(instrumented(f"{cls.__name__}.{attr}")(value.__func__)))
+        elif isinstance(value, classmethod):
+            setattr(cls, attr, classmethod(instrumented(f"{cls.__name__}.{attr}")(value.__func__)))
+        elif callable(value):
+            setattr(cls, attr, instrumented(f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+def records():
+    """Recorded calls, oldest first"""
+    return list(_records)
+
+
+def clear():
+    _records.clear()
+
+
+def records_frame():
+    """Recorded calls as a DataFrame"""
+    return pd.DataFrame(records(), columns=[
+        'timestamp', 'name', 'depth', 'wall_ms', 'rows_in', 'rows_out', 'peak_memory_delta', 'status', 'thread'
+    ])
+
+
+def summary_frame():
+    """Per-method totals: calls, total/mean/p95/max wall time, rows and peak memory"""
+    df = records_frame()
+    if df.empty:
+        return pd.DataFrame(columns=[
+            'name', 'calls', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms', 'rows_in', 'rows_out', 'max_peak_memory_delta'
+        ])
+    summary = df.groupby('name').agg(
+        calls=('wall_ms', 'size'),
+        total_ms=('wall_ms', 'sum'),
+        mean_ms=('wall_ms', 'mean'),
+        p95_ms=('wall_ms', lambda x: x.quantile(0.95)),
+        max_ms=('wall_ms', 'max'),
+        rows_in=('rows_in', 'sum'),
+        rows_out=('rows_out', 'sum'),
+        max_peak_memory_delta=('peak_memory_delta', 'max'),
+    ).reset_index()
+    return summary.sort_values('total_ms', ascending=False).round(3).reset_index(drop=True)
+
+
+def export_json(path=None):
+    """
+    Export the buffer and per-method summary as JSON (for diffing runs)
+    Returns the JSON string; also writes it to path if given
+    """
+    payload = json.dumps({
+        'exported_at': datetime.now().isoformat(),
+        'summary': summary_frame().to_dict('records'),
+        'records': records(),
+    }, indent=2, default=str)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(payload)
+    return payload
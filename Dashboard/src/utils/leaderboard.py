@@ -0,0 +1,129 @@
+"""
+Top-K Leaderboards
+Heap-backed top-K rankings that are maintained incrementally as balances and
+sales change, so "top N" views never re-sort the full customer/product base
+"""
+
+import heapq
+import pandas as pd
+import numpy as np
+
+
+class TopKLeaderboard:
+    """
+    Maintained top-K ranking per metric, optionally split by group
+    (store, category, ...)
+
+    - Values for every key are kept in a dict (the source of truth)
+    - Each group keeps its current top-K as a small sorted list
+    - Increases and inserts are applied in O(K)
+    - A decrease of a current leader marks the group dirty; it is rebuilt
+      lazily with heapq.nlargest on the next read
+    """
+
+    ALL = '__all__'
+
+    def __init__(self, k=50):
+        self.k = k
+        self._values = {}   # group -> {key: value}
+        self._top = {}      # group -> [(value, key), ...] sorted descending
+        self._dirty = set()
+
+    @classmethod
+    def from_frame(cls, df, key_col, value_col, k=50, group_col=None):
+        """Build a leaderboard from an aggregated frame (one row per key/group)"""
+        board = cls(k=k)
+        if group_col is None:
+            board._load_group(cls.ALL, df[key_col].to_numpy(), df[value_col].to_numpy())
+        else:
+            for group, group_df in df.groupby(group_col, sort=False):
+                board._load_group(group, group_df[key_col].to_numpy(), group_df[value_col].to_numpy())
+        return board
+
+    def _load_group(self, group, keys, values):
+        """Bulk-load a group and select its leaders without a full sort"""
+        key_list = keys.tolist()
+        value_list = values.tolist()
+        self._values[group] = dict(zip(key_list, value_list))
+        if len(value_list) > self.k:
+            leaders = np.argpartition(-np.asarray(values, dtype=float), self.k - 1)[:self.k]
+        else:
+            leaders = range(len(value_list))
+        top = [(value_list[i], key_list[i]) for i in leaders]
+        top.sort(key=lambda item: item[0], reverse=True)
+        self._top[group] = top
+        self._dirty.discard(group)
+
+    def _rebuild(self, group):
+        """Recompute a group's leaders from the full value dict"""
+        values = self._values.get(group, {})
+        self._top[group] = heapq.nlargest(self.k, ((v, key) for key, v in values.items()), key=lambda item: item[0])
+        self._dirty.discard(group)
+
+    def set(self, key, value, group=None):
+        """Set the metric value for a key"""
+        group = self.ALL if group is None else group
+        values = self._values.setdefault(group, {})
+        old_value = values.get(key)
+        values[key] = value
+
+        if group in self._dirty:
+            return
+
+        top = self._top.setdefault(group, [])
+        position = next((i for i, (_, k) in enumerate(top) if k == key), None)
+
+        if position is not None:
+            if old_value is not None and value < old_value and len(values) > len(top):
+                # A leader dropped; someone outside the top-K may overtake it
+                self._dirty.add(group)
+                return
+            top[position] = (value, key)
+        elif len(top) < self.k:
+            top.append((value, key))
+        elif value > top[-1][0]:
+            top[-1] = (value, key)
+        else:
+            return
+        top.sort(key=lambda item: item[0], reverse=True)
+
+    def increment(self, key, delta, group=None):
+        """Add a delta to a key's metric (e.g. new sales or earned points)"""
+        group_key = self.ALL if group is None else group
+        current = self._values.get(group_key, {}).get(key, 0)
+        self.set(key, current + delta, group=group)
+
+    def increment_many(self, keys, deltas, groups=None):
+        """Apply a batch of deltas (keys may repeat)"""
+        batch = pd.DataFrame({'key': keys, 'delta': deltas})
+        if groups is not None:
+            batch['group'] = groups
+            totals = batch.groupby(['group', 'key'], sort=False)['delta'].sum()
+            for (group, key), delta in totals.items():
+                self.increment(key, delta, group=group)
+        else:
+            totals = batch.groupby('key', sort=False)['delta'].sum()
+            for key, delta in totals.items():
+                self.increment(key, delta)
+
+    def top(self, n=None, group=None):
+        """Return the top-n (key, value) pairs in descending order"""
+        group = self.ALL if group is None else group
+        n = self.k if n is None else n
+        if n > self.k:
+            values = self._values.get(group, {})
+            return [(key, v) for v, key in heapq.nlargest(n, ((v, key) for key, v in values.items()), key=lambda item: item[0])]
+        if group in self._dirty:
+            self._rebuild(group)
+        return [(key, v) for v, key in self._top.get(group, [])[:n]]
+
+    def top_frame(self, n=None, group=None, key_col='Key', value_col='Value'):
+        """Return the top-n entries as a DataFrame"""
+        return pd.DataFrame(self.top(n, group=group), columns=[key_col, value_col])
+
+    def groups(self):
+        """List the groups tracked by this leaderboard"""
+        return [g for g in self._values if g != self.ALL]
+
+    def __len__(self):
+        return sum(len(v) for v in self._values.values())
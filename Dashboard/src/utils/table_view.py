@@ -0,0 +1,147 @@
+"""
+Paginated Table Component
+Server-side search, sorting and slicing so st.dataframe only receives the
+visible page instead of the whole frame
+"""
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+PAGE_SIZES = [10, 25, 50, 100]
+
+
+def _sort_codes(series, ascending):
+    """Map a column to numeric sort keys (missing values always sort last)"""
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+        missing = series.isna().to_numpy()
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+        missing = series.isna().to_numpy()
+    else:
+        codes, _ = pd.factorize(series, sort=True)
+        values = codes.astype('float64')
+        missing = codes < 0
+
+    if not ascending:
+        values = -values
+    values[missing] = np.inf
+    return values
+
+
+def _sorted_positions(series, ascending, stop):
+    """
+    Row positions in sorted order, computed only as far as needed:
+    early pages use a partial selection instead of a full sort
+    """
+    keys = _sort_codes(series, ascending)
+    n = len(keys)
+    if stop < n // 2:
+        head = np.argpartition(keys, stop - 1)[:stop]
+        return head[np.lexsort((head, keys[head]))]
+    return np.argsort(keys, kind='stable')
+
+
+def _search_mask(df, term):
+    """Case-insensitive substring match over text columns (exact match for numbers)"""
+    mask = np.zeros(len(df), dtype=bool)
+    try:
+        number = float(term)
+    except ValueError:
+        number = None
+
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            if number is not None:
+                mask |= (series == number).to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            mask |= series.astype(str).str.contains(term, case=False, regex=False).to_numpy()
+        else:
+            mask |= series.astype(str).str.contains(term, case=False, regex=False, na=False).to_numpy()
+    return mask
+
+
+def query_frame(df, search=None, sort_by=None, ascending=True, page=0, page_size=25):
+    """
+    Apply search, sort and pagination on the server
+    Returns (page_df, matching_row_count)
+    """
+    positions = None
+    if search:
+        positions = np.flatnonzero(_search_mask(df, search))
+    view = df if positions is None else df.iloc[positions]
+    total = len(view)
+
+    start = page * page_size
+    stop = min(start + page_size, total)
+    if start >= total:
+        return view.iloc[0:0], total
+
+    if sort_by is not None and sort_by in view.columns:
+        order = _sorted_positions(view[sort_by], ascending, stop)
+        return view.iloc[order[start:stop]], total
+    return view.iloc[start:stop], total
+
+
+def paginated_table(df, key, page_size=25, sort_by=None, ascending=False, height=None):
+    """
+    Render a searchable, sortable, paginated table
+    Only the current page is serialized to the browser
+    """
+    columns = df.columns.tolist()
+    sort_options = ['(original order)'] + columns
+
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        search = st.text_input("🔍 Search", key=f"{key}_search", placeholder="Filter rows...")
+    with col2:
+        default_index = sort_options.index(sort_by) if sort_by in columns else 0
+        sort_choice = st.selectbox("Sort by", sort_options, index=default_index, key=f"{key}_sort")
+    with col3:
+        # Only meaningful with a sort column; unsorted tables start unticked
+        descending = st.checkbox(
+            "Descending", value=sort_by in columns and not ascending, key=f"{key}_desc",
+            disabled=sort_choice == sort_options[0]
+        )
+    with col4:
+        page_size = st.selectbox(
+            "Rows", PAGE_SIZES,
+            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 1,
+            key=f"{key}_page_size"
+        )
+
+    # Filter once up front so the page selector is bounded by the matches
+    view = df.iloc[np.flatnonzero(_search_mask(df, search))] if search else df
+    total = len(view)
+    num_pages = max(1, -(-total // page_size))
+
+    # A narrower search can leave the stored page past the last one; clamp it
+    # before the widget reads it (Streamlit rejects a value above max_value)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > num_pages:
+        st.session_state[page_key] = num_pages
+    page = st.number_input(
+        f"Page (of {num_pages:,})", min_value=1, max_value=num_pages, step=1, key=page_key
+    )
+
+    page_df, total = query_frame(
+        view,
+        sort_by=None if sort_choice == sort_options[0] else sort_choice,
+        ascending=not descending,
+        page=int(page) - 1,
+        page_size=page_size
+    )
+
+    kwargs = {'use_container_width': True, 'hide_index': True}
+    if height is not None:
+        kwargs['height'] = height
+    st.dataframe(page_df, **kwargs)
+
+    if total > 0:
+        start = (int(page) - 1) * page_size
+        st.caption(f"Showing rows {start + 1:,}–{start + len(page_df):,} of {total:,}")
+    else:
+        st.caption("No matching rows")
+    return page_df
@@ -0,0 +1,126 @@
+"""
+Ticket Join Utilities
+Attaches sales header columns to line items using a positional Ticket_ID index
+instead of a hash join
+"""
+
+import hashlib
+
+import pandas as pd
+import numpy as np
+
+
+def _key_digest(keys):
+    """Positional digest of a key column, so in-place edits and reorders show up"""
+    values = keys.to_numpy()
+    if values.dtype.kind not in 'iufM':
+        values = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return hashlib.sha1(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+class TicketIndex:
+    """
+    Positional index from Ticket_ID to sales header row offset
+
+    Both sales files are written in ticket order, so the header keys are
+    normally already sorted. The index keeps them sorted (sorting once if
+    needed) and resolves line items by:
+    - Direct offset (ticket - first ticket) when ticket numbers are dense
+    - Binary search over the sorted keys otherwise
+    """
+
+    def __init__(self, header_df, key='Ticket_ID'):
+        self.key = key
+        self.header_df = header_df
+        self.num_rows = len(header_df)
+        self.key_digest = _key_digest(header_df[key])
+
+        keys = header_df[key].to_numpy()
+        if header_df[key].is_monotonic_increasing:
+            self._order = None
+        else:
+            # Maintain sorted order once so every lookup stays linear/log
+            self._order = np.argsort(keys, kind='stable')
+            keys = keys[self._order]
+        self._keys = keys
+
+        self.is_unique = len(keys) < 2 or bool((keys[1:] != keys[:-1]).all())
+        self.is_dense = (
+            self.is_unique
+            and len(keys) > 0
+            and np.issubdtype(keys.dtype, np.integer)
+            and int(keys[-1]) - int(keys[0]) + 1 == len(keys)
+        )
+
+    def is_current(self, header_df):
+        """
+        Check whether the index was built from this header frame with the same
+        keys in the same order (other columns are read at attach time)
+        """
+        return (
+            header_df is self.header_df
+            and len(header_df) == self.num_rows
+            and _key_digest(header_df[self.key]) == self.key_digest
+        )
+
+    def lookup(self, tickets):
+        """
+        Map ticket IDs to header row offsets
+        Returns an int64 array with -1 where the ticket has no header row
+        """
+        tickets = np.asarray(tickets)
+        if len(self._keys) == 0:
+            return np.full(len(tickets), -1, dtype=np.int64)
+
+        if self.is_dense and np.issubdtype(tickets.dtype, np.integer):
+            # Dense ticket numbers: the offset is the position
+            positions = tickets.astype(np.int64) - int(self._keys[0])
+            found = (positions >= 0) & (positions < len(self._keys))
+        else:
+            positions = np.searchsorted(self._keys, tickets, side='left')
+            found = positions < len(self._keys)
+            found[found] = self._keys[positions[found]] == tickets[found]
+
+        positions = np.where(found, positions, -1).astype(np.int64)
+        if self._order is not None:
+            positions[found] = self._order[positions[found]]
+        return positions
+
+    def attach(self, line_items_df, columns, how='inner'):
+        """
+        Attach header columns to line items (equivalent to an inner/left merge
+        on Ticket_ID, preserving line item order)
+        Raises ValueError if a requested column is already a line item column
+        """
+        columns = [c for c in columns if c != self.key]
+        overlapping = [c for c in columns if c in line_items_df.columns]
+        if overlapping:
+            raise ValueError(f"Header columns already in the line items: {', '.join(overlapping)}")
+
+        if not self.is_unique:
+            # Duplicate header tickets fan out rows; only a real merge handles that
+            return line_items_df.merge(
+                self.header_df[[self.key] + columns],
+                on=self.key,
+                how=how
+            )
+
+        positions = self.lookup(line_items_df[self.key].to_numpy())
+        found = positions >= 0
+
+        if how == 'inner':
+            result = line_items_df[found].reset_index(drop=True)
+            header_rows = positions[found]
+        else:
+            result = line_items_df.reset_index(drop=True)
+            header_rows = positions
+
+        for col in columns:
+            values = self.header_df[col].to_numpy()
+            if how == 'inner' or found.all():
+                result[col] = values[header_rows]
+            else:
+                # Unmatched tickets get missing values, like a left merge
+                result[col] = pd.Series(values[np.where(found, header_rows, 0)]).where(found)
+        return result
+
@@ -0,0 +1,13 @@
+"""
+Shared test setup: engine modules import each other by module name, so the
+source folders go on sys.path the same way app.py adds them
+"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+for folder in ('src/utils', 'src/engines', 'src/core', 'src/api'):
+    path = os.path.abspath(os.path.join(ROOT, folder))
+    if path not in sys.path:
+        sys.path.insert(0, path)
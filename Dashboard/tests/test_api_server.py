@@ -0,0 +1,91 @@
+"""Loyalty API error responses, record lookups, pages and ETags against an in-memory store"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pandas as pd
+from aiohttp.test_utils import TestClient, TestServer
+
+import loyalty_store
+from loyalty_store import ResourceIndex
+from server import create_app
+
+
+def make_store():
+    balances = pd.DataFrame({'Cust_ID': ['CUST_001', 'CUST_002'], 'Current_Balance': [632.01, 12.5]})
+    return SimpleNamespace(resources={'balances': ResourceIndex.from_frame('balances', balances, 'Cust_ID')})
+
+
+async def fetch_raw(requests):
+    """(status, ETag, body text) for each (path, If-None-Match or None)"""
+    async with TestClient(TestServer(create_app(store=make_store()))) as client:
+        responses = []
+        for path, if_none_match in requests:
+            headers = {} if if_none_match is None else {'If-None-Match': if_none_match}
+            response = await client.get(path, headers=headers)
+            responses.append((response.status, response.headers.get('ETag'), await response.text()))
+        return responses
+
+
+async def fetch(paths):
+    async with TestClient(TestServer(create_app(store=make_store()))) as client:
+        responses = []
+        for path in paths:
+            response = await client.get(path)
+            responses.append((response.status, await response.json()))
+        return responses
+
+
+def test_errors_are_json_with_the_name_encoded():
+    (found, unknown, missing, bad_offset) = asyncio.run(fetch([
+        '/api/v1/balances/CUST_001',
+        '/api/v1/bal"ances',
+        '/api/v1/balances/CUST_999',
+        '/api/v1/balances?offset=first',
+    ]))
+    assert found == (200, {'Cust_ID': 'CUST_001', 'Current_Balance': 632.01})
+    assert unknown == (404, {'error': 'unknown resource bal"ances'})
+    assert missing == (404, {'error': 'not found'})
+    assert bad_offset[0] == 400
+
+
+def test_pages_in_id_order_with_next_offset():
+    first, second = asyncio.run(fetch([
+        '/api/v1/balances?limit=1',
+        '/api/v1/balances?offset=1&limit=1',
+    ]))
+    assert first == (200, {
+        'resource': 'balances', 'key': 'Cust_ID', 'total': 2, 'offset': 0, 'limit': 1, 'next_offset': 1,
+        'items': [{'Cust_ID': 'CUST_001', 'Current_Balance': 632.01}]
+    })
+    assert second[1]['next_offset'] is None
+    assert second[1]['items'] == [{'Cust_ID': 'CUST_002', 'Current_Balance': 12.5}]
+
+
+def test_page_envelope_does_not_depend_on_key_order(monkeypatch):
+    # Serialized with sorted keys, 'items' is no longer the last envelope key
+    monkeypatch.setattr(loyalty_store, '_dumps', lambda value: json.dumps(
+        value, default=loyalty_store._json_default, separators=(',', ':'), sort_keys=True).encode())
+    balances = pd.DataFrame({'Cust_ID': ['CUST_001', 'CUST_002', 'CUST_003'], 'Current_Balance': [1.0, 2.0, 3.0]})
+    page = json.loads(ResourceIndex.from_frame('balances', balances, 'Cust_ID').page(1, 5)[0])
+    assert page['items'] == [{'Cust_ID': 'CUST_002', 'Current_Balance': 2.0}, {'Cust_ID': 'CUST_003', 'Current_Balance': 3.0}]
+    assert (page['total'], page['offset'], page['limit'], page['next_offset']) == (3, 1, 5, None)
+
+
+def test_if_none_match_answers_304_when_unchanged():
+    (record, page) = asyncio.run(fetch_raw([('/api/v1/balances/CUST_001', None), ('/api/v1/balances', None)]))
+    record_etag, page_etag = record[1], page[1]
+    assert record_etag and page_etag and record_etag != page_etag
+
+    responses = asyncio.run(fetch_raw([
+        ('/api/v1/balances/CUST_001', record_etag),
+        ('/api/v1/balances/CUST_001', f'"other", W/{record_etag}'),
+        ('/api/v1/balances/CUST_001', '*'),
+        ('/api/v1/balances', page_etag),
+        ('/api/v1/balances/CUST_001', page_etag),
+        ('/api/v1/balances/CUST_001', record_etag[:-3] + '"'),
+    ]))
+    assert [status for status, _, _ in responses] == [304, 304, 304, 304, 200, 200]
+    assert [etag for _, etag, _ in responses[:3]] == [record_etag] * 3
+    assert responses[0][2] == ''
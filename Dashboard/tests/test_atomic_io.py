@@ -0,0 +1,46 @@
+"""Appends replace the CSV atomically: readers and snapshots never see partial rows"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import atomic_io
+from atomic_io import locked_append_csv, list_snapshots
+
+
+def rows(start, n):
+    return pd.DataFrame({'Ticket_ID': range(start, start + n), 'Total_Value': [1.5] * n})
+
+
+def test_appends_keep_open_readers_and_snapshots_complete(tmp_path):
+    path = str(tmp_path / 'sales_header.csv')
+    locked_append_csv(rows(1, 3), path, header=True, snapshot_versions=5)
+
+    with open(path, newline='') as reader:
+        locked_append_csv(rows(4, 2), path, snapshot_versions=5)
+        # A reader that opened the file before the append keeps the old complete file
+        assert reader.read() == 'Ticket_ID,Total_Value\n1,1.5\n2,1.5\n3,1.5\n'
+
+    pd.testing.assert_frame_equal(pd.read_csv(path), rows(1, 5))
+    first, second = list_snapshots(path)
+    assert len(pd.read_csv(first)) == 3
+    assert len(pd.read_csv(second)) == 5
+
+
+def test_missing_trailing_newline_and_failed_write(tmp_path, monkeypatch):
+    path = str(tmp_path / 'points_redemptions.csv')
+    with open(path, 'w') as f:
+        f.write('Ticket_ID,Total_Value\n1,1.5')
+    locked_append_csv(rows(2, 1), path)
+    assert open(path).read() == 'Ticket_ID,Total_Value\n1,1.5\n2,1.5\n'
+
+    def fail(*args):
+        raise OSError('disk full')
+
+    # A write that fails before the rename leaves the file and directory as they were
+    monkeypatch.setattr(atomic_io.os, 'replace', fail)
+    with pytest.raises(OSError):
+        locked_append_csv(rows(3, 1), path)
+    assert open(path).read() == 'Ticket_ID,Total_Value\n1,1.5\n2,1.5\n'
+    assert sorted(os.listdir(tmp_path)) == ['points_redemptions.csv', 'points_redemptions.csv.lock']
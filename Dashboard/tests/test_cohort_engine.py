@@ -0,0 +1,112 @@
+"""Cohort cells against a Period-based brute force, month-by-month refreshes and resuming saved cells"""
+
+import numpy as np
+import pandas as pd
+
+from cohort_engine import CohortRetentionEngine
+
+
+def make_data(rng, customers=150, tickets=3000):
+    cust_ids = [f'CUST_{i:03d}' for i in range(customers)]
+    customers_df = pd.DataFrame({
+        'Cust_ID': cust_ids,
+        'Enrollment_Date': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, customers), unit='D'),
+    })
+    header_df = pd.DataFrame({
+        'Ticket_ID': np.arange(tickets),
+        # Some customers missing from the master
+        'Cust_ID': rng.choice(cust_ids + ['CUST_999'], tickets),
+        'Date': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 540, tickets), unit='D'),
+        'Total_Value': np.round(rng.uniform(5, 500, tickets), 2),
+    }).sort_values('Date', kind='stable').reset_index(drop=True)
+    return customers_df, header_df
+
+
+def brute_force_cells(customers_df, header_df):
+    cohorts = customers_df.set_index('Cust_ID')['Enrollment_Date'].dt.to_period('M')
+    tickets = header_df[header_df['Cust_ID'].isin(cohorts.index)].copy()
+    tickets['Cohort'] = tickets['Cust_ID'].map(cohorts)
+    tickets['Age'] = [(month - cohort).n for month, cohort in zip(tickets['Date'].dt.to_period('M'), tickets['Cohort'])]
+    tickets = tickets[tickets['Age'] >= 0]
+    cells = tickets.groupby(['Cohort', 'Age']).agg(
+        Active_Customers=('Cust_ID', 'nunique'), Orders=('Cust_ID', 'size'), Revenue=('Total_Value', 'sum')
+    ).reset_index()
+    cells['Cohort'] = cells['Cohort'].astype(str)
+    return cells.rename(columns={'Age': 'Months_Since_Enrollment'})
+
+
+def cells_of(engine):
+    table = engine.cohort_table()
+    return table[['Cohort', 'Months_Since_Enrollment', 'Active_Customers', 'Orders', 'Revenue']].reset_index(drop=True)
+
+
+def assert_same_cells(actual, expected):
+    actual = actual.sort_values(['Cohort', 'Months_Since_Enrollment']).reset_index(drop=True)
+    expected = expected.sort_values(['Cohort', 'Months_Since_Enrollment']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, atol=0.011)
+
+
+def test_cells_match_brute_force():
+    customers_df, header_df = make_data(np.random.default_rng(1))
+    engine = CohortRetentionEngine(output_path='unused')
+    engine.load_data(customers_df)
+    engine.build(header_df)
+    assert_same_cells(cells_of(engine), brute_force_cells(customers_df, header_df))
+
+    sizes = customers_df['Enrollment_Date'].dt.to_period('M').astype(str).value_counts()
+    table = engine.cohort_table()
+    np.testing.assert_allclose(
+        table['Retention_Rate'], np.round(table['Active_Customers'] / table['Cohort'].map(sizes), 4)
+    )
+
+
+def test_month_by_month_refresh_matches_full_build():
+    customers_df, header_df = make_data(np.random.default_rng(2))
+    engine = CohortRetentionEngine(output_path='unused')
+    engine.load_data(customers_df)
+
+    # Cut-offs inside months, so every month is seen partial before it closes
+    for cutoff in pd.date_range('2025-01-20', '2026-07-20', freq='MS') + pd.Timedelta(days=19):
+        engine.refresh(header_df[header_df['Date'] < cutoff])
+    engine.refresh(header_df)
+
+    full = CohortRetentionEngine(output_path='unused')
+    full.load_data(customers_df)
+    full.build(header_df)
+    assert_same_cells(cells_of(engine), cells_of(full))
+    assert engine.last_month == full.last_month
+    assert engine.fingerprint == full.fingerprint
+
+
+def resumed(tmp_path, customers_df, header_df):
+    engine = CohortRetentionEngine(output_path=str(tmp_path))
+    engine.load_data(customers_df)
+    engine.load_or_build(header_df)
+    return engine
+
+
+def uses_saved_cells(tmp_path, customers_df, header_df):
+    engine = CohortRetentionEngine(output_path=str(tmp_path))
+    engine.load_data(customers_df)
+    return engine._load_saved_cells(header_df)
+
+
+def test_resume_only_from_matching_saved_cells(tmp_path):
+    customers_df, header_df = make_data(np.random.default_rng(3))
+    saved_until = header_df['Date'] < pd.Timestamp('2026-03-15')
+    resumed(tmp_path, customers_df, header_df[saved_until]).update_cohort_csv()
+
+    # Same history plus newer tickets: resumes from the saved cells
+    assert uses_saved_cells(tmp_path, customers_df, header_df)
+    assert_same_cells(cells_of(resumed(tmp_path, customers_df, header_df)), brute_force_cells(customers_df, header_df))
+
+    # An older ticket changed: the saved cells are stale
+    changed = header_df.copy()
+    changed.loc[10, 'Total_Value'] += 100
+    assert not uses_saved_cells(tmp_path, customers_df, changed)
+    assert_same_cells(cells_of(resumed(tmp_path, customers_df, changed)), brute_force_cells(customers_df, changed))
+
+    # Customers moved to other cohorts: the saved cells are stale
+    moved = customers_df.assign(Enrollment_Date=customers_df['Enrollment_Date'] - pd.Timedelta(days=40))
+    assert not uses_saved_cells(tmp_path, moved, header_df)
+    assert_same_cells(cells_of(resumed(tmp_path, moved, header_df)), brute_force_cells(moved, header_df))
@@ -0,0 +1,70 @@
+"""Peak memory of nested instrumented calls and tracemalloc ownership"""
+
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+
+@instrumentation.instrumented('inner')
+def allocate_inner():
+    block = np.ones(2_000_000)
+    return float(block[0])
+
+
+@instrumentation.instrumented('outer')
+def allocate_outer():
+    # A larger block freed before the inner call starts
+    first = float(np.ones(4_000_000)[0])
+    return first + allocate_inner()
+
+
+def run_traced():
+    instrumentation.clear()
+    instrumentation.enable(track_memory=True)
+    try:
+        allocate_outer()
+    finally:
+        instrumentation.disable()
+    return instrumentation.records_frame().set_index('name')['peak_memory_delta']
+
+
+def test_outer_peak_covers_inner_calls():
+    peaks = run_traced()
+    # ~32 MB in the outer call before the ~16 MB inner call
+    assert 15_000_000 <= peaks['inner'] < 30_000_000
+    assert peaks['outer'] >= 31_000_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_disable_keeps_tracing_started_elsewhere():
+    tracemalloc.start()
+    try:
+        run_traced()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_enable_without_memory_stops_own_tracing():
+    instrumentation.enable(track_memory=True)
+    try:
+        assert tracemalloc.is_tracing()
+        instrumentation.enable(track_memory=False)
+        assert not tracemalloc.is_tracing()
+        assert allocate_inner() == 1.0
+        assert pd.isna(instrumentation.records_frame()['peak_memory_delta'].iloc[-1])
+    finally:
+        instrumentation.disable()
+
+    # Tracing started elsewhere survives unticking memory tracking
+    tracemalloc.start()
+    try:
+        instrumentation.enable(track_memory=True)
+        instrumentation.enable(track_memory=False)
+        assert tracemalloc.is_tracing()
+    finally:
+        instrumentation.disable()
+        tracemalloc.stop()
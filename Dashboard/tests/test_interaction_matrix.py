@@ -0,0 +1,112 @@
+"""Incremental interaction matrix updates against full builds, and rebuilds when the sales change"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from interaction_matrix import InteractionMatrix, load_interaction_matrix, INTERACTION_MATRIX_FILENAME
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def copy_sales(folder, header, lines):
+    os.makedirs(folder, exist_ok=True)
+    header.to_csv(os.path.join(folder, 'sales_header.csv'), index=False)
+    lines.to_csv(os.path.join(folder, 'sales_line_items.csv'), index=False)
+    return str(folder)
+
+
+def dense(matrix, name):
+    """Matrix as a frame keyed by customer and SKU, independent of code order"""
+    return pd.DataFrame(
+        getattr(matrix, name).toarray(),
+        index=pd.Index(matrix.customers, dtype=object), columns=pd.Index(matrix.skus, dtype=object)
+    ).sort_index().sort_index(axis=1)
+
+
+def assert_same(actual, expected):
+    for name in ('qty', 'spend', 'last_purchase'):
+        pd.testing.assert_frame_equal(dense(actual, name), dense(expected, name))
+    assert actual.last_ticket == expected.last_ticket
+    assert actual.source_hash == expected.source_hash
+
+
+def sales():
+    header = pd.read_csv(os.path.join(DATA_PATH, 'sales_header.csv'), parse_dates=['Date'])
+    lines = pd.read_csv(os.path.join(DATA_PATH, 'sales_line_items.csv'))
+    return header, lines
+
+
+def test_appended_tickets_match_full_build():
+    header, lines = sales()
+    split = header['Ticket_ID'].median()
+    old_header = header[header['Ticket_ID'] <= split]
+    old_lines = lines[lines['Ticket_ID'] <= split]
+
+    matrix = InteractionMatrix.from_sales(old_header, old_lines)
+    matrix.update_from_sales(header[header['Ticket_ID'] > split], lines[lines['Ticket_ID'] > split])
+    assert_same(matrix, InteractionMatrix.from_sales(header, lines))
+
+    # Verifying against the complete frames keeps the matrix as it is
+    assert matrix.update_from_sales(header, lines, verify=True) == 0
+    assert_same(matrix, InteractionMatrix.from_sales(header, lines))
+
+
+def test_streamed_files_match_in_memory_build(tmp_path):
+    header, lines = sales()
+    split = header['Ticket_ID'].median()
+    folder = copy_sales(tmp_path / 'old', header[header['Ticket_ID'] <= split], lines[lines['Ticket_ID'] <= split])
+
+    matrix = InteractionMatrix.from_files(folder, chunk_rows=97)
+    copy_sales(folder, header, lines)
+    matrix.update_from_files(folder, chunk_rows=97)
+    assert_same(matrix, InteractionMatrix.from_sales(header, lines))
+
+
+def test_replaced_sales_rebuild_persisted_matrix(tmp_path):
+    header, lines = sales()
+    folder = copy_sales(tmp_path / 'input', header, lines)
+    output = str(tmp_path / 'output')
+    load_interaction_matrix(folder, output, chunk_rows=150)
+    assert os.path.exists(os.path.join(output, INTERACTION_MATRIX_FILENAME))
+
+    # Same tickets, different contents: nothing above last_ticket is new
+    replaced = lines.copy()
+    replaced['Qty'] = replaced['Qty'] + 1
+    replaced_header = header.assign(Cust_ID=np.roll(header['Cust_ID'].to_numpy(), 1))
+    copy_sales(folder, replaced_header, replaced)
+
+    matrix = load_interaction_matrix(folder, output, chunk_rows=150)
+    expected = InteractionMatrix.from_sales(replaced_header, replaced)
+    assert_same(matrix, expected)
+    assert_same(InteractionMatrix.load(os.path.join(output, INTERACTION_MATRIX_FILENAME)), expected)
+
+    # In-memory verification catches the same change
+    stale = InteractionMatrix.from_sales(header, lines)
+    stale.update_from_sales(replaced_header, replaced, verify=True)
+    assert_same(stale, expected)
+
+
+def test_archive_without_source_hash_is_rebuilt(tmp_path):
+    header, lines = sales()
+    folder = copy_sales(tmp_path / 'input', header, lines)
+    path = os.path.join(str(tmp_path), INTERACTION_MATRIX_FILENAME)
+    InteractionMatrix.from_sales(header, lines).save(path)
+    with np.load(path) as archive:
+        arrays = {name: archive[name] for name in archive.files if name != 'source_hash'}
+    np.savez(path, **arrays)
+
+    matrix = load_interaction_matrix(folder, path=path)
+    assert_same(matrix, InteractionMatrix.from_sales(header, lines))
+
+
+def test_old_tickets_are_rejected_not_skipped():
+    header, lines = sales()
+    matrix = InteractionMatrix.from_sales(header, lines)
+    late = header.tail(1).assign(Ticket_ID=header['Ticket_ID'].min() - 1)
+    late_lines = lines.head(1).assign(Ticket_ID=late['Ticket_ID'].iloc[0], SKU='SKU_999')
+    with pytest.raises(ValueError, match='at or below'):
+        matrix.update_from_sales(late, late_lines)
+    assert 'SKU_999' not in matrix.skus
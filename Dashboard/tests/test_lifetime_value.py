@@ -0,0 +1,68 @@
+"""BG/NBD fit on simulated customers, and its predictions against a Monte-Carlo simulation"""
+
+import numpy as np
+import pytest
+
+from lifetime_value_engine import CustomerLifetimeValueEngine
+
+PARAMS = {'r': 0.6, 'alpha': 5.0, 'a': 0.8, 'b': 2.5}
+
+
+def simulate_purchases(rng, rate, dropout, start, end):
+    """
+    Purchases of customers alive at `start` up to `end`: Poisson purchases at
+    `rate`, each followed by dropping out with probability `dropout`
+    Returns the purchase count and the time of the last purchase
+    """
+    count = np.zeros(len(rate))
+    last = np.array(start, dtype='float64') * np.ones(len(rate))
+    time = last.copy()
+    active = np.ones(len(rate), dtype=bool)
+    while active.any():
+        time[active] += rng.exponential(1 / rate[active])
+        active &= time <= end
+        count[active] += 1
+        last[active] = time[active]
+        active &= rng.random(len(rate)) >= dropout
+    return count, last
+
+
+def engine_for(x, t_x, T, params=None):
+    engine = CustomerLifetimeValueEngine(output_path='unused')
+    engine.customers = np.arange(len(x))
+    engine.x, engine.t_x, engine.T = (np.asarray(v, dtype='float64') for v in (x, t_x, T))
+    engine.purchase_params = params
+    return engine
+
+
+def test_fit_recovers_simulated_parameters():
+    rng = np.random.default_rng(11)
+    n = 6000
+    rate = rng.gamma(PARAMS['r'], 1 / PARAMS['alpha'], n)
+    dropout = rng.beta(PARAMS['a'], PARAMS['b'], n)
+    T = rng.uniform(26, 78, n)
+    x, t_x = simulate_purchases(rng, rate, dropout, 0.0, T)
+
+    fitted = engine_for(x, t_x, T).fit_purchase_model()
+    for name, expected in PARAMS.items():
+        assert fitted[name] == pytest.approx(expected, rel=0.15), name
+
+
+@pytest.mark.parametrize('x, t_x, T', [(0, 0, 40), (2, 30, 40), (4, 8, 40), (6, 38, 40)])
+def test_predictions_match_monte_carlo(x, t_x, T):
+    rng = np.random.default_rng(3)
+    samples = 400_000
+    rate = rng.gamma(PARAMS['r'], 1 / PARAMS['alpha'], samples)
+    dropout = rng.beta(PARAMS['a'], PARAMS['b'], samples)
+
+    # Posterior weights of the prior draws given the history, split by
+    # whether the customer is still active at T
+    alive = (1 - dropout) ** x * rate ** x * np.exp(-rate * T)
+    dead = dropout * (1 - dropout) ** (x - 1) * rate ** x * np.exp(-rate * t_x) if x > 0 else 0.0
+    total = (alive + dead).sum()
+
+    weeks = 26
+    future, _ = simulate_purchases(rng, rate, dropout, T, T + weeks)
+    engine = engine_for([x], [t_x], [T], PARAMS)
+    assert engine.probability_alive()[0] == pytest.approx(alive.sum() / total, rel=0.02)
+    assert engine.expected_purchases(weeks)[0] == pytest.approx((alive * future).sum() / total, rel=0.03)
@@ -0,0 +1,68 @@
+"""Balances and timelines after recording new sales incrementally against a full recalculation"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from loyalty_engine import LoyaltyPointsEngine
+from points_history import PointsHistoryBuilder
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def engine_until(split):
+    """Engine with balances calculated from the tickets up to split only"""
+    engine = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert engine.load_loyalty_data()
+    engine.sales_header_df = engine.sales_header_df[engine.sales_header_df['Ticket_ID'] <= split]
+    engine.sales_line_items_df = engine.sales_line_items_df[engine.sales_line_items_df['Ticket_ID'] <= split]
+    engine.points_history_df = None
+    engine.history_builder = PointsHistoryBuilder()
+    engine.calculate_customer_balances()
+    return engine
+
+
+def test_recorded_sales_match_full_recalculation():
+    full = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert full.load_loyalty_data()
+    header, lines = full.sales_header_df, full.sales_line_items_df
+
+    # A first-time buyer among the new tickets
+    split = header['Ticket_ID'].quantile(0.6)
+    first_buyers = set(header.loc[header['Ticket_ID'] > split, 'Cust_ID']) - set(header.loc[header['Ticket_ID'] <= split, 'Cust_ID'])
+    assert first_buyers
+
+    engine = engine_until(split)
+    for start, end in [(split, split + 40), (split + 40, header['Ticket_ID'].max())]:
+        new = (header['Ticket_ID'] > start) & (header['Ticket_ID'] <= end)
+        new_lines = (lines['Ticket_ID'] > start) & (lines['Ticket_ID'] <= end)
+        engine.record_sales(header[new], lines[new_lines])
+
+    actual = engine.customer_balances_df.sort_values('Cust_ID').reset_index(drop=True)
+    expected = full.calculate_customer_balances().sort_values('Cust_ID').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected[actual.columns], check_dtype=False, atol=0.011)
+
+    top = [cust_id for cust_id, _ in engine.balance_leaderboard.top(10)]
+    expected_top = expected.nlargest(10, 'Current_Balance')
+    np.testing.assert_allclose(
+        expected.set_index('Cust_ID').loc[top, 'Current_Balance'], expected_top['Current_Balance'], atol=0.011
+    )
+
+
+def test_recorded_sales_merge_into_customer_timelines():
+    full = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert full.load_loyalty_data()
+    header, lines = full.sales_header_df, full.sales_line_items_df
+    split = header['Ticket_ID'].quantile(0.5)
+
+    engine = engine_until(split)
+    engine.get_customer_timelines()
+    engine.record_sales(header[header['Ticket_ID'] > split], lines[lines['Ticket_ID'] > split])
+
+    cust_ids = header['Cust_ID'].unique()
+    actual = engine.get_customer_timelines_batch(cust_ids)
+    expected = full.get_customer_timelines_batch(cust_ids)
+    assert actual['Cust_ID'].tolist() == expected['Cust_ID'].tolist()
+    np.testing.assert_array_equal(actual['Date'], expected['Date'])
+    np.testing.assert_allclose(actual['Cumulative_Points'], expected['Cumulative_Points'], atol=0.011)
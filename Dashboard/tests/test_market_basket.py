@@ -0,0 +1,53 @@
+"""Chunked pair counts against a per-ticket brute force, and unsorted line items"""
+
+import os
+from itertools import combinations
+
+import pandas as pd
+import pytest
+
+from market_basket_engine import MarketBasketEngine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def brute_force_pairs(lines, item_of):
+    """Ticket counts of every item and item pair, one ticket at a time"""
+    counts = {}
+    for _, items in lines.groupby('Ticket_ID')['SKU']:
+        items = sorted(set(items.map(item_of)))
+        for item in items:
+            counts[item, item] = counts.get((item, item), 0) + 1
+        for first, second in combinations(items, 2):
+            counts[first, second] = counts.get((first, second), 0) + 1
+            counts[second, first] = counts.get((second, first), 0) + 1
+    return counts
+
+
+def counted_pairs(engine, level):
+    names = engine.skus if level == 'SKU' else engine.categories
+    matrix = engine.counts[level].tocoo()
+    return {(names[i], names[j]): int(n) for i, j, n in zip(matrix.row, matrix.col, matrix.data) if n}
+
+
+def test_chunked_counts_match_brute_force():
+    lines = pd.read_csv(os.path.join(DATA_PATH, 'sales_line_items.csv'))
+    engine = MarketBasketEngine(data_path=DATA_PATH, output_path='unused', chunk_rows=7)
+    assert engine.count_pairs()
+    assert engine.ticket_count == lines['Ticket_ID'].nunique()
+
+    categories = pd.read_csv(os.path.join(DATA_PATH, 'products_master.csv')).set_index('SKU')['Category']
+    assert counted_pairs(engine, 'SKU') == brute_force_pairs(lines, lambda sku: sku)
+    assert counted_pairs(engine, 'Category') == brute_force_pairs(lines, lambda sku: categories.get(sku, 'Unknown'))
+
+
+def test_unsorted_line_items_are_rejected(tmp_path):
+    for name in ('products_master.csv', 'sales_line_items.csv'):
+        frame = pd.read_csv(os.path.join(DATA_PATH, name))
+        if name == 'sales_line_items.csv':
+            frame = frame.sample(frac=1, random_state=0)
+        frame.to_csv(tmp_path / name, index=False)
+
+    engine = MarketBasketEngine(data_path=str(tmp_path), output_path='unused', chunk_rows=7)
+    with pytest.raises(ValueError, match='sorted by Ticket_ID'):
+        engine.count_pairs()
@@ -0,0 +1,109 @@
+"""FIFO points expiry formula against a day-by-day bucket simulation"""
+
+import numpy as np
+import pandas as pd
+
+from points_expiry import PointsExpiry
+
+EXPIRY_MONTHS = 2
+START = pd.Timestamp('2026-01-01')
+
+
+def simulate(rng, customers=12, days=150):
+    """
+    Random earn/redeem events replayed through explicit FIFO buckets
+    Redemptions are capped at the available balance, so the recorded
+    redemptions are always honoured in full
+    Returns earns, redemptions and a function giving the brute-force
+    position of every customer at the end of a day
+    """
+    earns, redemptions = [], []
+    for c in range(customers):
+        cust_id = f'CUST_{c:03d}'
+        earn_days = np.sort(rng.integers(0, days, rng.integers(3, 12)))
+        redeem_days = np.sort(rng.integers(0, days, rng.integers(0, 6)))
+        for day in earn_days:
+            earns.append((cust_id, START + pd.Timedelta(days=int(day)), float(rng.integers(10, 300))))
+        for day in redeem_days:
+            redemptions.append((cust_id, START + pd.Timedelta(days=int(day)), float(rng.integers(10, 400))))
+
+    earns = pd.DataFrame(earns, columns=['Cust_ID', 'Date', 'Points_Earned'])
+    redemptions = pd.DataFrame(redemptions, columns=['Cust_ID', 'Date', 'Points_Redeemed'])
+    redemptions['Points_Redeemed'] = [
+        _replay(earns, redemptions.iloc[:i + 1], row.Cust_ID, row.Date, cap_last=True)
+        for i, row in enumerate(redemptions.itertuples())
+    ]
+    return earns, redemptions
+
+
+def _replay(earns, redemptions, cust_id, as_of, cap_last=False, window_days=0):
+    """
+    FIFO replay of one customer up to the end of as_of
+    cap_last: return the last redemption capped at the balance available then
+    Otherwise returns (earned, redeemed, expired, expiring_within_window, next_expiry)
+    """
+    buckets = []  # [expiry date, remaining points]
+    earned = redeemed = expired = 0.0
+    events = [(d, 0, p) for d, p in earns.loc[earns['Cust_ID'] == cust_id, ['Date', 'Points_Earned']].itertuples(index=False)]
+    mine = redemptions[redemptions['Cust_ID'] == cust_id]
+    events += [(d, 1, p) for d, p in mine[['Date', 'Points_Redeemed']].itertuples(index=False)]
+    # Earns before redemptions on the same day; redemptions in recorded order
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    def expire_through(day):
+        nonlocal expired
+        total = 0.0
+        for bucket in buckets:
+            if bucket[0] <= day and bucket[1] > 0:
+                total += bucket[1]
+                bucket[1] = 0.0
+        expired += total
+        return total
+
+    capped = None
+    for day, kind, points in events:
+        if day > as_of:
+            break
+        expire_through(day)
+        if kind == 0:
+            earned += points
+            buckets.append([day + pd.DateOffset(months=EXPIRY_MONTHS), points])
+        else:
+            available = sum(b[1] for b in buckets)
+            points = min(points, available)
+            capped = points
+            redeemed += points
+            for bucket in buckets:
+                used = min(bucket[1], points)
+                bucket[1] -= used
+                points -= used
+    if cap_last:
+        return capped
+
+    expire_through(as_of)
+    next_expiry = min((b[0] for b in buckets if b[1] > 1e-9), default=pd.NaT)
+    expired_now = expired
+    expiring = expire_through(as_of + pd.Timedelta(days=window_days))
+    return earned, redeemed, expired_now, expiring, next_expiry
+
+
+def test_summary_matches_fifo_simulation():
+    rng = np.random.default_rng(21)
+    earns, redemptions = simulate(rng)
+    expiry = PointsExpiry.from_events(earns, redemptions, expiry_months=EXPIRY_MONTHS)
+
+    for as_of in [START + pd.Timedelta(days=d) for d in (20, 75, 130, 200)]:
+        summary = expiry.summary(as_of, window_days=30).set_index('Cust_ID')
+        for cust_id, row in summary.iterrows():
+            earned, redeemed, expired, expiring, next_expiry = _replay(
+                earns, redemptions, cust_id, as_of, window_days=30
+            )
+            assert abs(row['Earned'] - earned) < 0.01
+            assert abs(row['Redeemed'] - redeemed) < 0.01
+            assert abs(row['Expired'] - expired) < 0.01, (cust_id, as_of)
+            assert abs(row['Available_Balance'] - (earned - redeemed - expired)) < 0.01
+            assert abs(row['Expiring_Soon'] - expiring) < 0.01, (cust_id, as_of)
+            if pd.isna(next_expiry):
+                assert pd.isna(row['Next_Expiry_Date'])
+            else:
+                assert row['Next_Expiry_Date'] == next_expiry.normalize()
@@ -0,0 +1,104 @@
+"""Incremental points history against a full recomputation"""
+
+import numpy as np
+import pandas as pd
+
+from points_history import PointsHistoryBuilder, CustomerTimelines, HISTORY_COLUMNS
+
+
+def make_transactions(rng, n, first_ticket, customers=20, days=60):
+    return pd.DataFrame({
+        'Cust_ID': rng.choice([f'CUST_{i:03d}' for i in range(customers)], n),
+        'Ticket_ID': np.arange(first_ticket, first_ticket + n),
+        'Date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, days, n), unit='D'),
+        'Rule_Name': 'Base',
+        'Qty': 1,
+        'Line_Total': 1.0,
+        'Points_Earned': rng.integers(1, 100, n).astype('float64'),
+    })
+
+
+def full_history(transactions):
+    history = transactions.sort_values(['Cust_ID', 'Date', 'Ticket_ID'], kind='stable').reset_index(drop=True)
+    history['Cumulative_Points'] = history.groupby('Cust_ID')['Points_Earned'].cumsum()
+    return history[HISTORY_COLUMNS]
+
+
+def test_appends_match_full_history_with_back_dated_tickets():
+    rng = np.random.default_rng(7)
+    batches = [make_transactions(rng, 200, 0)]
+    builder = PointsHistoryBuilder()
+    builder.initialize(full_history(batches[0]))
+
+    first_ticket = 200
+    for _ in range(5):
+        # Dates span the whole range, so most batches include back-dated tickets
+        batch = make_transactions(rng, 30, first_ticket)
+        first_ticket += len(batch)
+        new_rows = builder.append(batch)
+        batches.append(batch)
+
+        assert sorted(new_rows['Ticket_ID']) == sorted(batch['Ticket_ID'])
+
+    expected = full_history(pd.concat(batches))
+    actual = CustomerTimelines(builder.history).frame.reset_index(drop=True)
+    assert (actual['Ticket_ID'].to_numpy() == expected['Ticket_ID'].to_numpy()).all()
+    np.testing.assert_allclose(actual['Cumulative_Points'], expected['Cumulative_Points'])
+
+    last = expected.groupby('Cust_ID')['Cumulative_Points'].last()
+    np.testing.assert_allclose(builder.cumulative_points(last.index), last)
+
+
+def test_in_order_append_continues_from_stored_totals():
+    rng = np.random.default_rng(3)
+    base = make_transactions(rng, 50, 0, days=10)
+    builder = PointsHistoryBuilder()
+    builder.initialize(full_history(base))
+
+    later = make_transactions(rng, 10, 50).assign(Date=pd.Timestamp('2026-03-01'))
+    new_rows = builder.append(later)
+
+    stored = full_history(base).groupby('Cust_ID')['Cumulative_Points'].last()
+    expected = stored.reindex(new_rows['Cust_ID']).fillna(0).to_numpy() + new_rows.groupby('Cust_ID')['Points_Earned'].cumsum().to_numpy()
+    np.testing.assert_allclose(new_rows['Cumulative_Points'], expected)
+
+
+def test_batch_timelines_follow_requested_customer_order():
+    rng = np.random.default_rng(3)
+    history = full_history(make_transactions(rng, 300, 0)).sample(frac=1, random_state=1)
+    timelines = CustomerTimelines(history)
+
+    cust_ids = ['CUST_007', 'CUST_999', 'CUST_002', 'CUST_007']
+    expected = pd.concat([
+        history[history['Cust_ID'] == cust_id].sort_values('Date', kind='stable') for cust_id in cust_ids
+    ])
+    actual = timelines.timelines(cust_ids)
+    assert actual['Cust_ID'].tolist() == expected['Cust_ID'].tolist()
+    for cust_id in ['CUST_007', 'CUST_002']:
+        timeline = timelines.timeline(cust_id)
+        assert timeline['Date'].is_monotonic_increasing
+        assert sorted(timeline['Ticket_ID']) == sorted(history.loc[history['Cust_ID'] == cust_id, 'Ticket_ID'])
+
+
+def test_merged_timelines_match_rebuilt_timelines():
+    rng = np.random.default_rng(11)
+    builder = PointsHistoryBuilder()
+    builder.initialize(full_history(make_transactions(rng, 200, 0, customers=15)))
+    timelines = CustomerTimelines(builder.history)
+
+    first_ticket = 200
+    for days in [60, 5, 60, 90]:
+        # New customers, in-order rows and back-dated rows across batches
+        batch = make_transactions(rng, 25, first_ticket, customers=25, days=days)
+        first_ticket += len(batch)
+        builder.append(batch)
+        timelines = timelines.merged(builder.last_batch, builder.last_replaced)
+
+        expected = CustomerTimelines(builder.history)
+        assert timelines.customers.equals(expected.customers)
+        np.testing.assert_array_equal(timelines.offsets, expected.offsets)
+        for cust_id in expected.customers:
+            np.testing.assert_array_equal(timelines.column(cust_id, 'Date'), expected.column(cust_id, 'Date'))
+            np.testing.assert_allclose(
+                timelines.column(cust_id, 'Cumulative_Points'), expected.column(cust_id, 'Cumulative_Points')
+            )
@@ -0,0 +1,60 @@
+"""Points ledger as-of lookups against brute-force sums over the events"""
+
+import numpy as np
+import pandas as pd
+
+from points_ledger import PointsLedger
+
+
+def make_events(rng, n=400, customers=25, days=90):
+    return pd.DataFrame({
+        'Cust_ID': rng.choice([f'CUST_{i:03d}' for i in range(customers)], n),
+        'Date': pd.Timestamp('2026-01-01') + pd.to_timedelta(rng.integers(0, days, n), unit='D'),
+        # Mostly earning, some redemptions (negative deltas)
+        'Points': np.where(rng.random(n) < 0.8, rng.uniform(1, 200, n), -rng.uniform(1, 100, n)).round(2),
+    })
+
+
+def brute_force_balance(events, cust_id, as_of):
+    rows = events[(events['Cust_ID'] == cust_id) & (events['Date'] <= pd.Timestamp(as_of))]
+    return rows['Points'].sum()
+
+
+def tiers(balances):
+    return np.where(np.asarray(balances) >= 1000, 'Gold', 'Bronze')
+
+
+def test_single_and_batch_as_of_match_brute_force():
+    rng = np.random.default_rng(11)
+    events = make_events(rng)
+    ledger = PointsLedger.from_history(events, points_col='Points', tier_assigner=tiers)
+
+    # Unknown customers and dates before/after the ledger's range included
+    cust_ids = np.append(rng.choice(events['Cust_ID'].unique(), 150), ['CUST_999'])
+    as_of = pd.Timestamp('2025-12-15') + pd.to_timedelta(rng.integers(0, 130, len(cust_ids)), unit='D')
+
+    expected = np.array([brute_force_balance(events, c, d) for c, d in zip(cust_ids, as_of)])
+    batch = ledger.balances_as_of(cust_ids, as_of)
+    single = np.array([ledger.balance_as_of(c, d) for c, d in zip(cust_ids, as_of)])
+
+    np.testing.assert_allclose(batch, expected, atol=1e-6)
+    np.testing.assert_allclose(single, expected, atol=1e-6)
+    assert (ledger.tiers_as_of(cust_ids, as_of) == tiers(expected)).all()
+
+
+def test_snapshot_and_timeline_match_brute_force():
+    rng = np.random.default_rng(5)
+    events = make_events(rng, n=200, customers=10)
+    ledger = PointsLedger.from_history(events, points_col='Points', tier_assigner=tiers)
+
+    as_of = pd.Timestamp('2026-02-10')
+    snapshot = ledger.snapshot(as_of).set_index('Cust_ID')
+    for cust_id, row in snapshot.iterrows():
+        assert abs(row['Balance'] - brute_force_balance(events, cust_id, as_of)) < 1e-6
+
+    cust_id = events['Cust_ID'].iloc[0]
+    timeline = ledger.timeline(cust_id)
+    # Same-day events share a date; the last one of the day carries the day's balance
+    final = timeline.groupby('Date')['Balance'].last()
+    for date, balance in final.items():
+        assert abs(balance - brute_force_balance(events, cust_id, date)) < 1e-6
@@ -0,0 +1,85 @@
+"""Promotion window totals against a filter over the tickets per promotion"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from promo_effectiveness_engine import PromoEffectivenessEngine, ALL_CUSTOMERS
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def random_calendar(rng, segments, stores, n=80):
+    start = pd.Timestamp('2026-01-05') + pd.to_timedelta(rng.integers(0, 20, n), unit='D')
+    return pd.DataFrame({
+        'Promotion_ID': [f'PROMO_{i:03d}' for i in range(n)],
+        'Promotion_Type': 'Test',
+        'Target_Segment': rng.choice(segments, n),
+        # Some promotions for a single store, the rest chain-wide
+        'Store_ID': np.where(rng.random(n) < 0.4, rng.choice(stores, n), np.nan),
+        'Start_Date': start,
+        # Windows before, across and after the sales range
+        'End_Date': start + pd.to_timedelta(rng.integers(0, 6, n), unit='D'),
+        'Bonus_Points_Offered': 500,
+    })
+
+
+def brute_force_sales(tickets, members, promo, first, last):
+    rows = tickets[(tickets['Date'] >= first) & (tickets['Date'] <= last)]
+    if promo['Target_Segment'] != ALL_CUSTOMERS:
+        rows = rows[rows['Cust_ID'].isin(members.get(promo['Target_Segment'], []))]
+    if pd.notna(promo['Store_ID']):
+        rows = rows[rows['Store_ID'] == promo['Store_ID']]
+    return rows['Sales'].sum(), len(rows)
+
+
+def test_window_totals_match_per_promotion_filters():
+    rng = np.random.default_rng(5)
+    customers = [f'CUST_{i:03d}' for i in range(1, 201)]
+    segments_df = pd.DataFrame({
+        'Cust_ID': rng.choice(customers, 300),
+        'Segment': rng.choice(['Risk Customers', 'Gold Customers'], 300),
+    }).drop_duplicates()
+    engine = PromoEffectivenessEngine(data_path=DATA_PATH)
+    stores = pd.read_csv(os.path.join(DATA_PATH, 'stores_master.csv'))['Store_ID'].tolist()
+    calendar = random_calendar(rng, ['Risk Customers', 'Gold Customers', ALL_CUSTOMERS, 'Unknown Customers'], stores)
+    assert engine.load_data(calendar_df=calendar, customer_segments_df=segments_df)
+
+    result = engine.calculate_effectiveness()
+    tickets = engine._ticket_measures()
+    members = segments_df.groupby('Segment')['Cust_ID'].apply(set).to_dict()
+
+    # Result dates are formatted; windows come from the calendar, row for row
+    for (_, promo), (_, row) in zip(calendar.iterrows(), result.iterrows()):
+        length = promo['End_Date'] - promo['Start_Date'] + pd.Timedelta(days=1)
+        before = brute_force_sales(tickets, members, promo, promo['Start_Date'] - length,
+                                   promo['Start_Date'] - pd.Timedelta(days=1))
+        after = brute_force_sales(tickets, members, promo, promo['Start_Date'], promo['End_Date'])
+        np.testing.assert_allclose(row['Before_Sales'], before[0], atol=0.006)
+        np.testing.assert_allclose(row['After_Sales'], after[0], atol=0.006)
+        assert row['Before_Transaction_Count'] == before[1]
+        assert row['After_Transaction_Count'] == after[1]
+
+
+def test_customer_segments_from_current_results():
+    rfm = pd.DataFrame({
+        'Customer_ID': ['CUST_001', 'CUST_002', 'CUST_003'],
+        'RFM_Segment': ['Risk Customers', 'Champions', 'Risk Customers'],
+        'Monetary': [50.0, 900.0, 20.0],
+        'Churn_Probability': [0.4, 0.1, 0.9],
+    })
+    balances = pd.DataFrame({'Cust_ID': ['CUST_001', 'CUST_002'], 'Loyalty_Tier': ['Gold', 'Bronze']})
+    PromoEffectivenessEngine.LEAST_ACTIVE_COUNT = 1
+    try:
+        with_scores = PromoEffectivenessEngine.customer_segments(rfm, balances, rfm)
+        without_scores = PromoEffectivenessEngine.customer_segments(
+            rfm, balances, rfm.drop(columns='Churn_Probability').iloc[:2])
+    finally:
+        PromoEffectivenessEngine.LEAST_ACTIVE_COUNT = 15
+
+    least_active = with_scores[with_scores['Segment'] == 'Least Active Customers']['Cust_ID'].tolist()
+    assert least_active == ['CUST_003']
+    least_active = without_scores[without_scores['Segment'] == 'Least Active Customers']['Cust_ID'].tolist()
+    assert least_active == ['CUST_001']
+    assert set(with_scores[with_scores['Cust_ID'] == 'CUST_001']['Segment']) == {'Risk Customers', 'Gold Customers'}
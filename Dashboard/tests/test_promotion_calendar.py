@@ -0,0 +1,49 @@
+"""Admin special day promotions with their bonus multipliers, and annual rules across years"""
+
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from promotion_calendar import load_promotion_calendar, rule_dates, PromotionCalendar, ADMIN_PROMOTIONS_FILENAME
+
+
+def test_admin_promotions_use_entered_multiplier(tmp_path):
+    config = tmp_path / 'promotion_calendar.json'
+    config.write_text(json.dumps({
+        'promotions': [],
+        'special_days': {
+            'Spring Sale': {'type': 'annual', 'start': '03-10', 'end': '03-12'},
+            'Summer Sale': {'type': 'annual', 'start': '06-01', 'end': '06-01'},
+        },
+    }))
+    # An older four-field row (no multiplier) next to a row written with one
+    (tmp_path / ADMIN_PROMOTIONS_FILENAME).write_text(
+        "Spring Sale,Apparel,10,2026-01-18 10:00:00\n"
+        "Summer Sale,Apparel,20,2026-01-19 10:00:00,3.0\n"
+        "Unknown Day,Apparel,5,2026-01-19 11:00:00,2.0\n"
+    )
+
+    calendar = load_promotion_calendar(str(tmp_path), str(config))
+    assert len(calendar.admin_definitions) == 2
+
+    dates = pd.to_datetime(['2026-03-11', '2026-06-01', '2026-06-01', '2026-07-01'])
+    multipliers = calendar.multipliers_for_dates(dates, ['Apparel', 'Apparel', 'Books', 'Apparel'])
+    np.testing.assert_allclose(multipliers, [1.0, 3.0, 1.0, 1.0])
+
+
+def test_annual_rules_across_new_year_and_leap_day():
+    holidays = {'type': 'annual', 'start': '12-26', 'end': '01-05'}
+    leap_day = {'type': 'annual', 'start': '02-29', 'end': '02-29'}
+    assert rule_dates(holidays, 2025) == (date(2025, 12, 26), date(2026, 1, 5))
+    assert rule_dates(leap_day, 2028) == (date(2028, 2, 29), date(2028, 2, 29))
+    assert rule_dates(leap_day, 2026) == (date(2026, 2, 28), date(2026, 2, 28))
+    assert rule_dates({'type': 'annual', 'start': '02-20', 'end': '02-29'}, 2026) == (date(2026, 2, 20), date(2026, 2, 28))
+
+    calendar = PromotionCalendar([
+        {'name': 'Holidays', 'rule': holidays, 'bonus_points_multiplier': 2.0},
+        {'name': 'Leap Day', 'rule': leap_day, 'bonus_points_multiplier': 3.0},
+    ])
+    dates = pd.to_datetime(['2025-12-25', '2025-12-31', '2026-01-03', '2026-01-06', '2026-02-28', '2028-02-29', '2028-02-28'])
+    np.testing.assert_allclose(calendar.multipliers_for_dates(dates), [1.0, 2.0, 2.0, 1.0, 3.0, 3.0, 1.0])
@@ -0,0 +1,56 @@
+"""Similarity pruning and top-N recommendations against dense brute-force rankings"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from recommendation_engine import ProductRecommendationEngine
+
+
+def make_engine(rng, customers=60, skus=40, rows=400):
+    engine = ProductRecommendationEngine(output_path='unused')
+    engine.set_interactions(
+        rng.choice([f'CUST_{i:03d}' for i in range(customers)], rows),
+        rng.choice([f'SKU_{i:03d}' for i in range(skus)], rows),
+        rng.integers(1, 5, rows)
+    )
+    return engine.fit()
+
+
+def test_prune_keeps_k_largest_per_row():
+    matrix = sparse.random(50, 80, density=0.3, format='csr', random_state=4)
+    pruned = ProductRecommendationEngine._prune(matrix, 5).toarray()
+
+    dense = matrix.toarray()
+    for row in range(dense.shape[0]):
+        nonzero = np.flatnonzero(dense[row])
+        expected = nonzero[np.argsort(-dense[row, nonzero], kind='stable')[:5]]
+        assert set(np.flatnonzero(pruned[row])) == set(expected)
+        np.testing.assert_array_equal(pruned[row, expected], dense[row, expected])
+
+
+def brute_force_top_n(engine, n):
+    """Dense scores with purchases removed, ranked by score then popularity"""
+    rows = engine.interactions.toarray()
+    scores = rows @ engine.similarity.toarray()
+    tiebreak = engine.popularity / max(engine.popularity.max(), 1) * engine.POPULARITY_WEIGHT
+    records = []
+    for row, cust_id in enumerate(engine.customers):
+        available = rows[row] == 0
+        ranked = np.flatnonzero(available)
+        ranked = ranked[np.lexsort((ranked, -(scores[row, ranked] + tiebreak[ranked])))]
+        for rank, sku in enumerate(ranked[:n], start=1):
+            records.append((cust_id, rank, engine.skus[sku], round(scores[row, sku], 4)))
+    return pd.DataFrame(records, columns=['Cust_ID', 'Rank', 'SKU', 'Score'])
+
+
+def test_recommend_all_matches_dense_ranking():
+    engine = make_engine(np.random.default_rng(9))
+    expected = brute_force_top_n(engine, 6)
+    actual = engine.recommend_all(n=6, block_size=7)
+    actual = actual.sort_values(['Cust_ID', 'Rank']).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(
+        actual[['Cust_ID', 'Rank', 'SKU']], expected[['Cust_ID', 'Rank', 'SKU']], check_dtype=False
+    )
+    np.testing.assert_allclose(actual['Score'], expected['Score'], atol=1e-4)
@@ -0,0 +1,70 @@
+"""Redemption IDs after gaps, and back-dated redemptions against the balance from their date on"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loyalty_engine import LoyaltyPointsEngine
+from points_events import load_redemptions
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def engine_with_redemptions(tmp_path, keep=lambda redemptions: redemptions):
+    """Engine whose redemptions file is a (filtered) copy in tmp_path"""
+    path = str(tmp_path / 'points_redemptions.csv')
+    keep(pd.read_csv(os.path.join(DATA_PATH, 'points_redemptions.csv'))).to_csv(path, index=False)
+    engine = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert engine.load_loyalty_data()
+    engine.redemptions_df = load_redemptions(path)
+    engine.calculate_customer_balances()
+    return engine, path
+
+
+def test_new_ids_follow_the_highest_id_on_file(tmp_path):
+    # A removed row and a row written by another session since this one loaded
+    engine, path = engine_with_redemptions(tmp_path, lambda redemptions: redemptions.drop(index=1))
+    other = pd.read_csv(path)
+    other.loc[len(other)] = ['RED_000900', 'CUST_001', '2026-01-18', 1]
+    other.to_csv(path, index=False)
+
+    customers = engine.customer_balances_df.nlargest(2, 'Current_Balance')['Cust_ID'].tolist()
+    engine.append_redemptions(pd.DataFrame({'Cust_ID': customers, 'Date': ['2026-01-18'] * 2, 'Points_Redeemed': [10.0, 20.0]}), path)
+
+    on_file = pd.read_csv(path)
+    assert on_file['Redemption_ID'].is_unique
+    assert on_file['Redemption_ID'].tail(2).tolist() == ['RED_000901', 'RED_000902']
+    assert engine.redemptions_df['Redemption_ID'].tail(2).tolist() == ['RED_000901', 'RED_000902']
+    assert sorted(os.listdir(tmp_path)) == ['points_redemptions.csv', 'points_redemptions.csv.lock']
+
+
+def test_back_dated_redemptions_are_limited_to_the_later_minimum(tmp_path):
+    engine, path = engine_with_redemptions(tmp_path)
+    events = engine.get_point_events()
+
+    # Brute force: the lowest running balance from the end of each date on
+    for cust_id, customer in list(events.groupby('Cust_ID'))[:40]:
+        for date in pd.date_range('2026-01-11', '2026-01-19'):
+            opening = customer.loc[customer['Date'] <= date, 'Balance']
+            later = customer.loc[customer['Date'] > date, 'Balance']
+            expected = min([opening.iloc[-1] if len(opening) else 0.0] + later.tolist())
+            assert engine.redeemable_points(cust_id, date) == pytest.approx(max(expected, 0.0), abs=0.011)
+
+    # A customer whose balance was lower earlier in the week than it is now
+    balances = engine.customer_balances_df.set_index('Cust_ID')['Current_Balance']
+    first_day = pd.Timestamp('2026-01-12')
+    lower_then = [c for c in balances.index if 0 < engine.redeemable_points(c, first_day) < balances[c] - 1]
+    cust_id = lower_then[0]
+    redeemable = engine.redeemable_points(cust_id, first_day)
+    before = open(path).read()
+
+    with pytest.raises(ValueError, match='can redeem at most'):
+        engine.append_redemptions(pd.DataFrame([{'Cust_ID': cust_id, 'Date': first_day, 'Points_Redeemed': redeemable + 1}]), path)
+    assert open(path).read() == before
+    assert balances[cust_id] == engine.customer_balances_df.set_index('Cust_ID').loc[cust_id, 'Current_Balance']
+
+    engine.append_redemptions(pd.DataFrame([{'Cust_ID': cust_id, 'Date': first_day, 'Points_Redeemed': np.floor(redeemable)}]), path)
+    customer = engine.get_point_events().query('Cust_ID == @cust_id')
+    assert (customer['Balance'] >= -0.011).all()
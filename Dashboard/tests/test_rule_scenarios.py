@@ -0,0 +1,68 @@
+"""What-if rule scenarios against re-scoring the history with each modified rule set"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from loyalty_engine import LoyaltyPointsEngine
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+SCENARIOS = [
+    {'name': 'Health Boost', 'category_multipliers': {'Health': 3.0, 'Unknown': 9.0}},
+    {'name': 'Rule Overrides', 'rule_multipliers': {'Standard Earn': 1.5, 3: 0.5}},
+    {'name': 'Bulk Bonus', 'quantity_bonuses': [(2, 1.2), (4, 2.0)], 'promo_multiplier': 1.1},
+]
+
+
+def brute_force_points(engine, scenario):
+    """Points per customer and per item category with the scenario applied to the rules frame"""
+    rules = engine.loyalty_rules_df.copy()
+    for category, multiplier in scenario.get('category_multipliers', {}).items():
+        rules.loc[rules['Trigger_Category'] == category, 'Multiplier'] = multiplier
+    for rule, multiplier in scenario.get('rule_multipliers', {}).items():
+        rules.loc[(rules['Rule_ID'] == rule) | (rules['Rule_Name'] == rule), 'Multiplier'] = multiplier
+
+    transactions = engine._join_sales_header(['Ticket_ID', 'Cust_ID']).merge(
+        rules[['Rule_ID', 'Multiplier', 'Trigger_Category']], on='Rule_ID'
+    )
+    quantity = engine.quantity_multipliers(
+        transactions['Qty'].to_numpy(), scenario.get('quantity_bonuses', engine.quantity_bonuses)
+    )
+    transactions['Points'] = np.round(
+        transactions['Line_Total'].to_numpy() * transactions['Multiplier'].to_numpy()
+        * scenario.get('promo_multiplier', 1.0) * quantity, 2
+    )
+    products = pd.read_csv(os.path.join(DATA_PATH, 'products_master.csv')).set_index('SKU')['Category']
+    transactions['Category'] = transactions['SKU'].map(products).fillna(transactions['Trigger_Category'])
+    return transactions.groupby('Cust_ID')['Points'].sum(), transactions.groupby('Category')['Points'].sum()
+
+
+def test_scenarios_match_rescoring_with_modified_rules():
+    engine = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert engine.load_loyalty_data()
+    results = engine.simulate_rule_scenarios(SCENARIOS, chunk_rows=300)
+
+    summary = results['summary'].set_index('Scenario')
+    category_costs = results['category_costs'].set_index(['Scenario', 'Category'])['Points']
+    for scenario in [{'name': 'Baseline'}] + SCENARIOS:
+        customer_points, category_points = brute_force_points(engine, scenario)
+        np.testing.assert_allclose(summary.loc[scenario['name'], 'Total_Points_Earned'], customer_points.sum(), atol=0.01)
+        np.testing.assert_allclose(
+            category_costs.loc[scenario['name']].reindex(category_points.index).to_numpy(),
+            category_points.to_numpy(), atol=0.01
+        )
+
+
+def test_rule_id_override_wins_over_category_and_name():
+    engine = LoyaltyPointsEngine(data_path=DATA_PATH)
+    assert engine.load_loyalty_data()
+    multipliers = engine._scenario_rule_multipliers({
+        'category_multipliers': {'Health': 3.0},
+        'rule_multipliers': {'Health Bonus (2x)': 4.0, 2: 5.0, 'Standard Earn': 1.25},
+    })
+    expected = engine.loyalty_rules_df['Multiplier'].to_numpy(dtype='float64').copy()
+    expected[engine.loyalty_rules_df['Rule_ID'].to_numpy() == 2] = 5.0
+    expected[engine.loyalty_rules_df['Rule_Name'].to_numpy() == 'Standard Earn'] = 1.25
+    np.testing.assert_allclose(multipliers, expected)
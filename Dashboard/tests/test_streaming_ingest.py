@@ -0,0 +1,88 @@
+"""Streamed chunk aggregates against in-memory groupbys, merging partials and unsorted files"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from streaming_ingest import (
+    MergeableAggregate, StreamingIngestor, rfm_aggregate, store_spend_aggregate, sku_sales_aggregate,
+    interaction_aggregate,
+)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def sales():
+    header = pd.read_csv(os.path.join(DATA_PATH, 'sales_header.csv'), parse_dates=['Date'])
+    lines = pd.read_csv(os.path.join(DATA_PATH, 'sales_line_items.csv'))
+    return header, lines
+
+
+def assert_same(actual, expected, keys):
+    actual = actual.sort_values(keys).reset_index(drop=True)
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected[actual.columns], check_dtype=False)
+
+
+@pytest.mark.parametrize('chunk_rows', [7, 100, 5000])
+def test_streamed_aggregates_match_in_memory(chunk_rows):
+    header, lines = sales()
+    results = StreamingIngestor(DATA_PATH, chunk_rows=chunk_rows).run(
+        header_aggregates={'rfm': rfm_aggregate(), 'store_spend': store_spend_aggregate()},
+        line_aggregates={'sku_sales': sku_sales_aggregate(), 'pairs': interaction_aggregate()}
+    )
+
+    rfm = header.groupby('Cust_ID').agg(
+        Last_Purchase_Date=('Date', 'max'), Frequency=('Ticket_ID', 'count'), Monetary=('Total_Value', 'sum')
+    ).reset_index()
+    assert_same(results['rfm'], rfm, ['Cust_ID'])
+    store_spend = header.groupby(['Store_ID', 'Cust_ID'])['Total_Value'].sum().reset_index()
+    assert_same(results['store_spend'], store_spend, ['Store_ID', 'Cust_ID'])
+    sku_sales = lines.groupby('SKU').agg(Units_Sold=('Qty', 'sum'), Revenue=('Line_Total', 'sum')).reset_index()
+    assert_same(results['sku_sales'], sku_sales, ['SKU'])
+
+    joined = lines.merge(header[['Ticket_ID', 'Cust_ID', 'Date']], on='Ticket_ID')
+    pairs = joined.groupby(['Cust_ID', 'SKU']).agg(
+        Qty=('Qty', 'sum'), Spend=('Line_Total', 'sum'),
+        Last_Purchase_Date=('Date', 'max'), Last_Ticket_ID=('Ticket_ID', 'max')
+    ).reset_index()
+    assert_same(results['pairs'], pairs, ['Cust_ID', 'SKU'])
+
+
+def test_merged_partials_and_buffered_combines():
+    rng = np.random.default_rng(5)
+    rows = pd.DataFrame({'Key': rng.integers(0, 1000, 5000), 'Value': rng.uniform(0, 10, 5000)})
+    spec = {'Total': ('Value', 'sum'), 'Count': ('Value', 'count'), 'Largest': ('Value', 'max')}
+    expected = rows.groupby('Key').agg(Total=('Value', 'sum'), Count=('Value', 'count'), Largest=('Value', 'max'))
+
+    first, second = MergeableAggregate('Key', spec), MergeableAggregate('Key', spec)
+    for start in range(0, 2500, 10):
+        first.update(rows.iloc[start:start + 10])
+    second.update(rows.iloc[2500:])
+    assert_same(first.merge(second).result(), expected.reset_index(), ['Key'])
+
+    # Small chunks into a large state are buffered instead of regrouped one by one
+    aggregate = MergeableAggregate('Key', spec).update(rows)
+    combines = 0
+    combine = aggregate._combine
+
+    def counting(partials):
+        nonlocal combines
+        combines += 1
+        return combine(partials)
+
+    aggregate._combine = counting
+    for start in range(0, 2000, 10):
+        aggregate.update(rows.iloc[start:start + 10])
+    assert combines < 10
+    assert aggregate.result()['Count'].sum() == 7000
+
+
+def test_unsorted_files_are_rejected(tmp_path):
+    header, lines = sales()
+    header.to_csv(tmp_path / 'sales_header.csv', index=False)
+    lines.iloc[::-1].to_csv(tmp_path / 'sales_line_items.csv', index=False)
+    with pytest.raises(ValueError, match='sorted by Ticket_ID'):
+        StreamingIngestor(str(tmp_path), chunk_rows=50).run(line_aggregates={'sku_sales': sku_sales_aggregate()})
@@ -0,0 +1,53 @@
+"""Positional ticket joins against pandas merges, overlapping columns and in-place header edits"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ticket_join import TicketIndex
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def sales():
+    header = pd.read_csv(os.path.join(DATA_PATH, 'sales_header.csv'), parse_dates=['Date'])
+    lines = pd.read_csv(os.path.join(DATA_PATH, 'sales_line_items.csv'))
+    return header, lines
+
+
+@pytest.mark.parametrize('how', ['inner', 'left'])
+def test_attach_matches_merge(how):
+    header, lines = sales()
+    rng = np.random.default_rng(4)
+    # Dense sorted keys, shuffled keys, and sparse keys with tickets missing from the header
+    for variant in (header, header.sample(frac=1, random_state=1), header.sample(frac=0.7, random_state=2)):
+        index = TicketIndex(variant)
+        shuffled = lines.iloc[rng.permutation(len(lines))].reset_index(drop=True)
+        expected = shuffled.merge(variant[['Ticket_ID', 'Cust_ID', 'Date']], on='Ticket_ID', how=how)
+        pd.testing.assert_frame_equal(index.attach(shuffled, ['Ticket_ID', 'Cust_ID', 'Date'], how=how), expected)
+
+
+def test_overlapping_columns_are_rejected():
+    header, lines = sales()
+    with pytest.raises(ValueError, match='Date'):
+        TicketIndex(header).attach(lines.assign(Date=pd.Timestamp('2026-01-01')), ['Cust_ID', 'Date'])
+
+
+def test_in_place_key_edits_make_the_index_stale():
+    header, lines = sales()
+    index = TicketIndex(header)
+    assert index.is_current(header)
+
+    # Other columns are read when attaching, so editing them keeps the index
+    header.loc[0, 'Date'] = pd.Timestamp('2025-12-31')
+    assert index.is_current(header)
+    assert index.attach(lines, ['Date'])['Date'].iloc[0] == pd.Timestamp('2025-12-31')
+
+    header.loc[0, 'Ticket_ID'] = header['Ticket_ID'].max() + 1
+    assert not index.is_current(header)
+
+    index = TicketIndex(header)
+    header.sort_values('Ticket_ID', inplace=True)
+    assert not index.is_current(header)